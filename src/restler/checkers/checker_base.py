@@ -56,6 +56,29 @@ class CheckerBase:
     def enabled(self, enable):
         self._enabled = enable
 
+    def get_state(self):
+        """ Returns the state that the checker keeps across sequences, e.g.
+        the requests it already checked.  A worker process of the fuzzing run
+        returns it to the main process, which merges it into its own checker.
+
+        @return: The state of the checker
+        @rtype : Dict
+
+        """
+        return {}
+
+    def merge_state(self, state):
+        """ Merges the state of the same checker in a worker process.
+
+        @param state: The state returned by get_state in the worker process
+        @type  state: Dict
+
+        @return: None
+        @rtype : None
+
+        """
+        pass
+
     @abstractmethod
     def apply(self, rendered_sequence, lock):
         """ Required to be implemented by all checkers. This is the function
@@ -26,6 +26,12 @@ class ExamplesChecker(CheckerBase):
         # list of requests that have already been tested
         self._tested_requests: set = set()
 
+    def get_state(self):
+        return {'tested_requests': self._tested_requests}
+
+    def merge_state(self, state):
+        self._tested_requests.update(state['tested_requests'])
+
     def apply(self, rendered_sequence, lock):
         """ Applies check for fuzzing request payload body
 
@@ -13,6 +13,7 @@ import restler.engine.dependencies as dependencies
 import restler.engine.primitives as primitives
 from restler.engine.core.request_utilities import NO_TOKEN_SPECIFIED
 from restler.engine.core.request_utilities import NO_SHADOW_TOKEN_SPECIFIED
+from restler.engine.core.request_utilities import get_latest_tokens
 
 STATIC_OAUTH_TOKEN = 'static_oauth_token'
 
@@ -260,8 +261,7 @@ class NameSpaceRuleChecker(CheckerBase):
         except Exception:
             pass
 
-        from restler.engine.core.request_utilities import latest_token_value as token1
-        from restler.engine.core.request_utilities import latest_shadow_token_value as token2
+        token1, token2 = get_latest_tokens()
         if token1 is not NO_TOKEN_SPECIFIED and token2 is not NO_SHADOW_TOKEN_SPECIFIED:
             return primitives.REFRESHABLE_AUTHENTICATION_TOKEN
 
@@ -280,10 +280,7 @@ class NameSpaceRuleChecker(CheckerBase):
         """
         # print(repr(data))
         if self._authentication_method == primitives.REFRESHABLE_AUTHENTICATION_TOKEN:
-            from restler.engine.core.request_utilities import latest_token_value
-            from restler.engine.core.request_utilities import latest_shadow_token_value
-            token1 = latest_token_value
-            token2 = latest_shadow_token_value
+            token1, token2 = get_latest_tokens()
             data = data.replace(token1, token2)
         else:
             shadow_values = self._custom_mutations[primitives.SHADOW_VALUES]
@@ -47,6 +47,29 @@ class PayloadBodyBuckets():
                 return (error_str, new_body)
         return None
 
+    def get_state(self):
+        """ Returns the error strings logged for each request, see merge_state
+
+        @return: The error strings logged for each request
+        @rtype : Dict(str, Set(str))
+
+        """
+        return self._buckets
+
+    def merge_state(self, buckets):
+        """ Merges the error strings logged for each request by a worker
+        process of the fuzzing run, which wrote them to the same log.
+
+        @param buckets: The error strings logged for each request
+        @type  buckets: Dict(str, Set(str))
+
+        @return: None
+        @rtype : None
+
+        """
+        for request_hex, error_strs in buckets.items():
+            self._buckets.setdefault(request_hex, set()).update(error_strs)
+
     def _get_error_str(self, request, new_body):
         """ Gets the error string associated with this bug
 
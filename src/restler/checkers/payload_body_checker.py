@@ -93,6 +93,14 @@ class PayloadBodyChecker(CheckerBase):
             self.friendly_name, 'recipe_file'
         )
 
+    def get_state(self):
+        return {'fuzzed_requests': self._fuzzed_requests,
+                'buckets': self._buckets.get_state()}
+
+    def merge_state(self, state):
+        self._fuzzed_requests.update(state['fuzzed_requests'])
+        self._buckets.merge_state(state['buckets'])
+
     def apply(self, rendered_sequence, lock):
         """ Applies check for fuzzing request payload body
 
@@ -398,7 +406,7 @@ class PayloadBodyChecker(CheckerBase):
         # (e.g. strings provided in custom payloads).
         # As a workaround, if the candidate values are not provided in a static list,
         # return an empty list.
-        if not isinstance(string_group, list):
+        if not isinstance(string_group, (list, tuple)):
             string_group = []
         ignore = set(string_group)
         return ignore
@@ -946,9 +954,8 @@ class PayloadBodyChecker(CheckerBase):
             return {}
 
         # get the body (JSON)
-        try:
-            body = json.loads(response.json_body)
-        except (json.JSONDecodeError, TypeError):
+        body = response.json_object
+        if body is None:
             return {}
 
         flat_body = flatten_json_object(body)
@@ -1076,8 +1083,8 @@ class PayloadBodyChecker(CheckerBase):
                 primitives.CUSTOM_PAYLOAD
             )
             current_fuzzable_values = custom_payload_values[current_fuzzable_tag]
-            if isinstance(current_fuzzable_values, list):
-                return current_fuzzable_values
+            if isinstance(current_fuzzable_values, (list, tuple)):
+                return list(current_fuzzable_values)
             else:
                 return [current_fuzzable_values]
         except Exception:
@@ -1,9 +1,12 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
+import copy
+import functools
 import itertools
 from collections import OrderedDict
 import restler.utils.restler_logger as logger
+from restler.engine.core import fuzzing_monitor
 from restler.engine.transport_layer.response import CONNECTION_CLOSED_CODE
 from restler.engine.transport_layer.response import TIMEOUT_CODE
 from restler.engine.core.request_utilities import str_to_hex_def
@@ -48,6 +51,8 @@ class BugBuckets(object):
             raise NewSingletonError("Attempting to create a new singleton instance.")
 
         self._bug_buckets = dict()
+        # The updates recorded, instead of applied, by a worker process
+        self._deferred_updates = None
         BugBuckets.__instance = self
 
     def _ending_request_exists(self, sequence, bug_buckets):
@@ -215,6 +220,20 @@ class BugBuckets(object):
 
         """
         logger.write_to_main("update_bug_buckets", LogSettings().bug_bucketing)
+        if self._deferred_updates is not None:
+            self._deferred_updates.append(dict(sequence=sequence, bug_code=bug_code, origin=origin,
+                                               reproduce=reproduce, additional_log_str=additional_log_str,
+                                               checker_str=checker_str, hash_full_request=hash_full_request))
+            return
+        deferred_updates = fuzzing_monitor.get_deferred_updates()
+        if deferred_updates is not None:
+            # The sequence is rendered again, so the bucket keeps a copy of this rendering
+            deferred_updates.append(functools.partial(
+                self.update_bug_buckets, copy.deepcopy(sequence), bug_code, origin=origin, reproduce=reproduce,
+                additional_log_str=additional_log_str, checker_str=checker_str,
+                hash_full_request=hash_full_request, lock=lock))
+            return
+
         if lock is not None:
             lock.acquire()
 
@@ -247,6 +266,30 @@ class BugBuckets(object):
             if lock is not None:
                 lock.release()
 
+    def defer_updates(self):
+        """ Records the updates of the bug buckets instead of applying them,
+        so that a worker process of the fuzzing run leaves the bucketing and
+        logging of its bugs to the main process.
+
+        @return: None
+        @rtype : None
+
+        """
+        self._deferred_updates = []
+
+    def pop_deferred_updates(self):
+        """ Returns the updates recorded since the last call, to be applied
+        with update_bug_buckets.
+
+        @return: The arguments of each update
+        @rtype : List[Dict]
+
+        """
+        updates = self._deferred_updates or []
+        if self._deferred_updates is not None:
+            self._deferred_updates = []
+        return updates
+
     def num_bug_buckets(self, lock=None):
         """ Calculates the total number of bug buckets per bucket class.
 
@@ -1,11 +1,16 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
+import concurrent.futures
+import heapq
+import threading
 import time
-import json
+from collections import OrderedDict
 
 import restler.engine.core.request_utilities as request_utilities
 from restler.restler_settings import Settings
+from restler.engine.transport_layer.rate_limiter import get_endpoint
+from restler.engine.transport_layer.rate_limiter import get_retry_after
 
 
 def get_polling_request(response):
@@ -131,7 +136,467 @@ def try_parse_GET_request(request_data):
     return None
 
 
-def try_async_poll(request_data, response, max_async_wait_time, poll_delete_status=False):
+class AsyncPollingStats(object):
+    """ Per-resource-type latency of the async resource operations that were polled """
+    __instance = None
+    __instance_lock = threading.Lock()
+
+    @staticmethod
+    def Instance():
+        """ Singleton's instance accessor
+
+        @return AsyncPollingStats instance
+        @rtype  AsyncPollingStats
+
+        """
+        if AsyncPollingStats.__instance is None:
+            with AsyncPollingStats.__instance_lock:
+                if AsyncPollingStats.__instance is None:
+                    AsyncPollingStats.__instance = AsyncPollingStats()
+        return AsyncPollingStats.__instance
+
+    @staticmethod
+    def DetachInstance():
+        """ Drops the instance inherited by a worker process, whose lock may
+        have been held by another thread of the main process when the worker
+        was forked.
+
+        @return: None
+        @rtype : None
+
+        """
+        AsyncPollingStats.__instance = None
+        AsyncPollingStats.__instance_lock = threading.Lock()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # resource type -> OrderedDict of counters
+        self._resource_types = {}
+
+    def record(self, resource_type, outcome, latency_sec, num_polls):
+        """ Records a completed polling operation
+
+        @param resource_type: The type of the polled resource
+        @type  resource_type: Str
+        @param outcome: 'succeeded', 'failed' or 'timed_out'
+        @type  outcome: Str
+        @param latency_sec: The time, in seconds, from the first poll to the outcome
+        @type  latency_sec: Float
+        @param num_polls: The number of polling requests sent
+        @type  num_polls: Int
+
+        @return: None
+        @rtype : None
+
+        """
+        with self._lock:
+            stats = self._resource_types.get(resource_type)
+            if stats is None:
+                stats = self._resource_types[resource_type] = OrderedDict(
+                    [('operations', 0), ('succeeded', 0), ('failed', 0), ('timed_out', 0),
+                     ('polls', 0), ('total_sec', 0.0), ('max_sec', 0.0)])
+            stats['operations'] += 1
+            stats[outcome] += 1
+            stats['polls'] += num_polls
+            stats['total_sec'] += latency_sec
+            stats['max_sec'] = max(stats['max_sec'], latency_sec)
+
+    def pop_counts(self):
+        """ Returns the stats recorded so far, and resets them.  Used by the
+        worker processes of the fuzzing run to return their stats.
+
+        @return: The counters of each resource type
+        @rtype : Dict(Str, OrderedDict)
+
+        """
+        with self._lock:
+            counts, self._resource_types = self._resource_types, {}
+        return counts
+
+    def merge(self, counts):
+        """ Adds the stats of a worker process of the fuzzing run
+
+        @param counts: The stats, see pop_counts
+        @type  counts: Dict(Str, OrderedDict)
+
+        @return: None
+        @rtype : None
+
+        """
+        with self._lock:
+            for resource_type, counters in counts.items():
+                stats = self._resource_types.get(resource_type)
+                if stats is None:
+                    self._resource_types[resource_type] = counters
+                    continue
+                for name, value in counters.items():
+                    if name == 'max_sec':
+                        stats[name] = max(stats[name], value)
+                    else:
+                        stats[name] += value
+
+    def to_dict(self):
+        """ Returns the stats in the format of the testing summary
+
+        @return: The stats of each resource type
+        @rtype : OrderedDict
+
+        """
+        result = OrderedDict()
+        with self._lock:
+            for resource_type in sorted(self._resource_types):
+                stats = self._resource_types[resource_type]
+                summary = OrderedDict()
+                for name in ['operations', 'succeeded', 'failed', 'timed_out', 'polls']:
+                    summary[name] = stats[name]
+                summary['avg_sec'] = round(stats['total_sec'] / stats['operations'], 3)
+                summary['max_sec'] = round(stats['max_sec'], 3)
+                result[resource_type] = summary
+        return result
+
+
+class ResourcePollingOperation(object):
+    """ Polls the status of one async resource operation.
+
+    The operation is advanced one polling request at a time by poll(), which
+    returns the time to wait before the next poll, so that it can either be
+    run to completion on the calling thread (run) or be multiplexed with other
+    operations by the AsyncResourcePoller.
+
+    """
+    def __init__(self, request_data, response, polling_data, data_in_poll_response,
+                 max_async_wait_time, poll_delete_status, resource_type):
+        """ Initializes a polling operation.
+
+        @param request_data: The request that was sent's data string
+        @type  request_data: Str
+        @param response: The response returned after @request was sent
+        @type  response: HttpResponse
+        @param polling_data: The request used for polling the resource availability
+        @type  polling_data: Str
+        @param data_in_poll_response: Whether the polling response contains the resource
+        @type  data_in_poll_response: Bool
+        @param max_async_wait_time: The maximum amount of time we will wait (in
+                                    seconds) for the resource to become available
+        @type  max_async_wait_time: Int
+        @param poll_delete_status: Whether the status of a DELETE is polled
+        @type  poll_delete_status: Bool
+        @param resource_type: The type of the resource, used for the latency stats
+        @type  resource_type: Str
+
+        @return: None
+        @rtype : None
+
+        """
+        self.request_data = request_data
+        self.response = response
+        self.polling_data = polling_data
+        self.data_in_poll_response = data_in_poll_response
+        self.max_async_wait_time = max_async_wait_time
+        self.poll_delete_status = poll_delete_status
+        self.resource_type = resource_type
+        self.responses_to_parse = []
+        self.resource_error = False
+        self.start_time = time.time()
+        self.deadline = self.start_time + max_async_wait_time
+        self.num_polls = 0
+        self._outcome = 'failed'
+        self._interval = Settings().async_poll_initial_interval_sec
+        # A Retry-After header in the response that started the operation
+        # tells how long to wait before polling it for the first time.
+        retry_after = get_retry_after(response)
+        self.next_delay = 0 if retry_after is None else min(retry_after, self.max_poll_interval)
+
+    @property
+    def max_poll_interval(self):
+        return max(Settings().async_poll_max_interval_sec, Settings().async_poll_initial_interval_sec)
+
+    def _get_next_delay(self, poll_response):
+        """ Returns the time to wait before the next poll: the delay requested
+        by the server in a Retry-After header if any, and otherwise the
+        current interval, which grows exponentially with each poll.
+
+        @param poll_response: The last polling response
+        @type  poll_response: HttpResponse
+
+        @return: The time, in seconds, to wait
+        @rtype : Float
+
+        """
+        retry_after = get_retry_after(poll_response)
+        if retry_after is not None:
+            return min(retry_after, self.max_poll_interval)
+        delay = self._interval
+        self._interval = min(self.max_poll_interval, self._interval * Settings().async_poll_backoff_factor)
+        return delay
+
+    def poll(self):
+        """ Sends one polling request and processes its response.
+
+        @return: The time, in seconds, to wait before the next poll, or None if
+                 the operation is finished
+        @rtype : Float or None
+
+        """
+        from restler.utils.restler_logger import print_async_results as LOG_RESULTS
+        from restler.utils.restler_logger import raw_network_logging as RAW_LOGGING
+
+        request_data = self.request_data
+        try:
+            # Send the polling request
+            poll_response = request_utilities.send_request_data(self.polling_data)
+            self.num_polls += 1
+            time_str = str(round((time.time() - self.start_time), 2))
+            if self.data_in_poll_response:
+                if poll_response.status_code in ['200', '201']:
+                    # If this returned a '200' or '201' status code, the response should contain the parsable data.
+                    # Otherwise, continue to poll as the resource has not yet been created. These types will
+                    # return a '202 - Accepted' while the resource is still being created.
+
+                    self.responses_to_parse.append(poll_response)
+                    self._outcome = 'succeeded'
+                    if not self.poll_delete_status:
+                        LOG_RESULTS(request_data,
+                                    f"Resource creation succeeded after {time_str} seconds.")
+                        # Also, attempt to execute a GET request corresponding to this resource and
+                        # return the response.  This is used in case all of the expected properties are
+                        # not present in the async response.
+                        RAW_LOGGING("Attempting to get resources from GET request...")
+                        get_response = try_parse_GET_request(request_data)
+                        if get_response:
+                            # Use response from the GET request for parsing. If the GET request failed,
+                            # the caller will know to try and use the original PUT response for parsing
+                            self.responses_to_parse.insert(0, get_response)
+                    # Return the responses to be parsed
+                    return None
+                elif int(poll_response.status_code) >= 300:
+                    # Error obtaining the polling response.
+                    # It may still be possible to extract the relevant ID out of the original response,
+                    # which will be added before exiting the function
+                    return None
+                else:
+                    # Continue polling
+                    pass
+            else:
+                # There is no data in the polling response.
+                # In such cases, try to execute a corresponding GET request and obtain
+                # information from the response
+                # This comes from Azure-Async responses that do not contain a Location: field
+                # Check for the status of the resource
+                response_body = poll_response.json_object
+                if response_body is None:
+                    LOG_RESULTS(request_data, "Failed to parse body of async response, retrying.")
+                    # This may have been due to a connection failure. Retry until max_async_wait_time.
+                    return self._get_next_delay(poll_response)
+                done = str(response_body["status"]).lower()
+                if done == "succeeded":
+                    LOG_RESULTS(request_data,
+                                f"Resource creation succeeded after {time_str} seconds.")
+                    self._outcome = 'succeeded'
+                    get_response = try_parse_GET_request(request_data)
+                    if get_response:
+                        self.responses_to_parse.append(get_response)
+                    return None
+                elif done in ["failed", "canceled"]:
+                    LOG_RESULTS(request_data,
+                                f"The server reported that the resource creation Failed after {time_str} seconds.")
+                    self.resource_error = True
+                    return None
+                # Otherwise, the operation is still in progress: continue polling
+        except Exception as err:
+            LOG_RESULTS(request_data,
+                        f"An exception occurred while parsing the poll message: {err!s}")
+            return None
+
+        try:
+            if not poll_response.status_code.startswith('2'):
+                LOG_RESULTS(request_data, f"Resource creation failed after {time_str} seconds"
+                                          f" because status code '{poll_response.status_code}' was received.")
+                # When an error is received in a polling response, the resource may still be created -
+                # This should be checked with a GET request.
+                return None
+        except Exception as err:
+            LOG_RESULTS(request_data,
+                        f"An exception occurred while parsing the poll message: {err!s}")
+            return None
+        return self._get_next_delay(poll_response)
+
+    def time_out(self):
+        """ Finishes an operation that did not complete in max_async_wait_time.
+
+        @return: None
+        @rtype : None
+
+        """
+        from restler.utils.restler_logger import print_async_results as LOG_RESULTS
+        from restler.utils.restler_logger import raw_network_logging as RAW_LOGGING
+
+        self._outcome = 'timed_out'
+        RAW_LOGGING("Resource polling timed out before the resource was available.")
+        LOG_RESULTS(self.request_data,
+                    f"Failed to create resource in {self.max_async_wait_time} seconds.")
+        RAW_LOGGING("Attempting to get resources from GET request...")
+        # Do not use a GET to obtain the status for a DELETE request.
+        # A resource with the same ID may have been re-created.
+        if not self.request_data.startswith("DELETE"):
+            get_response = try_parse_GET_request(self.request_data)
+            if get_response:
+                # Use response from the GET request for parsing. If the GET request failed,
+                # the caller will know to try and use the original PUT response for parsing
+                self.responses_to_parse.append(get_response)
+
+    def result(self):
+        """ Records the latency of the finished operation and returns its result.
+
+        @return: The same values as try_async_poll
+        @rtype : Tuple(List[HttpResponse], Bool, Bool)
+
+        """
+        AsyncPollingStats.Instance().record(self.resource_type, self._outcome,
+                                            time.time() - self.start_time, self.num_polls)
+        if len(self.responses_to_parse) == 0:
+            self.responses_to_parse.append(self.response)
+        return self.responses_to_parse, self.resource_error, True
+
+    def run(self):
+        """ Polls on the calling thread until the operation is finished.
+
+        @return: The same values as try_async_poll
+        @rtype : Tuple(List[HttpResponse], Bool, Bool)
+
+        """
+        delay = self.next_delay
+        while True:
+            if delay:
+                time.sleep(min(delay, max(0, self.deadline - time.time())))
+            if time.time() >= self.deadline:
+                self.time_out()
+                break
+            delay = self.poll()
+            if delay is None:
+                break
+        return self.result()
+
+
+class AsyncResourcePoller(object):
+    """ Background thread that multiplexes the polling of many outstanding
+    async resource operations, so that the callers can do other work (or
+    start other operations) while the resources are being created or deleted.
+
+    """
+    __instance = None
+    __instance_lock = threading.Lock()
+
+    @staticmethod
+    def Instance():
+        """ Singleton's instance accessor.  The polling thread is started on first use.
+
+        @return AsyncResourcePoller instance
+        @rtype  AsyncResourcePoller
+
+        """
+        if AsyncResourcePoller.__instance is None:
+            with AsyncResourcePoller.__instance_lock:
+                if AsyncResourcePoller.__instance is None:
+                    AsyncResourcePoller.__instance = AsyncResourcePoller()
+        return AsyncResourcePoller.__instance
+
+    @staticmethod
+    def DetachInstance():
+        """ Drops the instance inherited by a worker process, whose polling
+        thread only runs in the main process.  The worker starts its own
+        polling thread on first use.
+
+        @return: None
+        @rtype : None
+
+        """
+        AsyncResourcePoller.__instance = None
+        AsyncResourcePoller.__instance_lock = threading.Lock()
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        # Heap of (time of the next poll, submission number, operation, future)
+        self._scheduled = []
+        self._num_submitted = 0
+        self._thread = threading.Thread(target=self._run, name="AsyncResourcePoller", daemon=True)
+        self._thread.start()
+
+    def submit(self, operation):
+        """ Schedules an operation to be polled by the background thread.
+
+        @param operation: The operation
+        @type  operation: ResourcePollingOperation
+
+        @return: A future whose result is the result of the operation
+        @rtype : concurrent.futures.Future
+
+        """
+        future = concurrent.futures.Future()
+        self._schedule(time.time() + operation.next_delay, operation, future)
+        return future
+
+    def _schedule(self, due_time, operation, future):
+        with self._condition:
+            heapq.heappush(self._scheduled, (min(due_time, operation.deadline), self._num_submitted,
+                                             operation, future))
+            self._num_submitted += 1
+            self._condition.notify()
+
+    def _run(self):
+        from restler.utils.restler_logger import create_network_log
+        from restler.utils.restler_logger import write_to_main
+        from restler.utils.restler_logger import LOG_TYPE_POLLING
+        try:
+            create_network_log(LOG_TYPE_POLLING)
+        except Exception as error:
+            write_to_main(f"Failed to create the network log of the async resource poller: {error!s}", True)
+
+        while True:
+            with self._condition:
+                while not self._scheduled or self._scheduled[0][0] > time.time():
+                    self._condition.wait(self._scheduled[0][0] - time.time() if self._scheduled else None)
+                _, _, operation, future = heapq.heappop(self._scheduled)
+            try:
+                if time.time() >= operation.deadline:
+                    operation.time_out()
+                    delay = None
+                else:
+                    delay = operation.poll()
+                if delay is None:
+                    future.set_result(operation.result())
+                else:
+                    self._schedule(time.time() + delay, operation, future)
+            except Exception as error:
+                future.set_exception(error)
+
+
+def _get_polling_operation(request_data, response, max_async_wait_time, poll_delete_status, resource_type):
+    """ Returns the operation that polls the resource created (or deleted) by
+    a request, or None if the request does not require polling.
+
+    @return: The polling operation
+    @rtype : ResourcePollingOperation or None
+
+    """
+    from restler.utils.restler_logger import raw_network_logging as RAW_LOGGING
+
+    if Settings().wait_for_async_resource_creation and max_async_wait_time > 0 \
+            and (request_data.startswith("PUT") or request_data.startswith("POST") or (
+            poll_delete_status and request_data.startswith("DELETE"))):
+        # Get the request used for polling the resource availability
+        data, data_in_poll_response = get_polling_request(response)
+        if data:
+            RAW_LOGGING(f"Waiting for resource to be available... max_async_wait_time: {max_async_wait_time} seconds.")
+            if resource_type is None:
+                endpoint = get_endpoint(request_data)
+                resource_type = ' '.join(endpoint) if endpoint else ''
+            return ResourcePollingOperation(request_data, response, data, data_in_poll_response,
+                                            max_async_wait_time, poll_delete_status, resource_type)
+    return None
+
+
+def try_async_poll(request_data, response, max_async_wait_time, poll_delete_status=False, resource_type=None):
     """ Helper that will poll the server until a certain resource
     becomes available.
 
@@ -140,6 +605,9 @@ def try_async_poll(request_data, response, max_async_wait_time, poll_delete_stat
     if so, will poll the URL specified in the response until the resource is
     said to be available or a max timeout has been reached.
 
+    Polls are spaced out by the Retry-After header of the responses if present,
+    and otherwise by an exponentially growing interval (see async_polling_settings).
+
     @param request_data: The request that was sent's data string
     @type  request_data: Str
     @param response: The response returned after @request was sent
@@ -147,6 +615,9 @@ def try_async_poll(request_data, response, max_async_wait_time, poll_delete_stat
     @param max_async_wait_time: The maximum amount of time we will wait (in
                                 seconds) for the resource to become available
     @type  max_async_wait_time: Int
+    @param resource_type: The type of the resource, used for the latency stats
+                          (the method and path of the request by default)
+    @type  resource_type: Str
 
     @return: A tuple containing:
              - The list of responses for parsing, which will either contain the @response
@@ -163,113 +634,26 @@ def try_async_poll(request_data, response, max_async_wait_time, poll_delete_stat
     @rtype : Tuple(HttpResponse, boolean, boolean)
 
     """
-    from restler.utils.restler_logger import raw_network_logging as RAW_LOGGING
-    from restler.utils.restler_logger import print_async_results as LOG_RESULTS
+    operation = _get_polling_operation(request_data, response, max_async_wait_time,
+                                       poll_delete_status, resource_type)
+    if operation is None:
+        return [response], False, False
+    return operation.run()
 
-    responses_to_parse = []
-    resource_error = False
-    async_waited = False
-    if Settings().wait_for_async_resource_creation and max_async_wait_time > 0 \
-            and (request_data.startswith("PUT") or request_data.startswith("POST") or (
-            poll_delete_status and request_data.startswith("DELETE"))):
-        # Get the request used for polling the resource availability
-        data, data_in_poll_response = get_polling_request(response)
-        if data:
-            RAW_LOGGING(f"Waiting for resource to be available... max_async_wait_time: {max_async_wait_time} seconds.")
-            async_waited = True
-            poll_wait_seconds = 1
-            start_time = time.time()
-            while (time.time() - start_time) < max_async_wait_time:
-                try:
-                    # Send the polling request
-                    poll_response = request_utilities.send_request_data(data)
-                    time_str = str(round((time.time() - start_time), 2))
-                    if data_in_poll_response:
-                        if poll_response.status_code in ['200', '201']:
-                            # If this returned a '200' or '201' status code, the response should contain the parsable data.
-                            # Otherwise, continue to poll as the resource has not yet been created. These types will
-                            # return a '202 - Accepted' while the resource is still being created.
-
-                            responses_to_parse.append(poll_response)
-                            if not poll_delete_status:
-                                LOG_RESULTS(request_data,
-                                            f"Resource creation succeeded after {time_str} seconds.")
-                                # Also, attempt to execute a GET request corresponding to this resource and
-                                # return the response.  This is used in case all of the expected properties are
-                                # not present in the async response.
-                                RAW_LOGGING("Attempting to get resources from GET request...")
-                                get_response = try_parse_GET_request(request_data)
-                                if get_response:
-                                    # Use response from the GET request for parsing. If the GET request failed,
-                                    # the caller will know to try and use the original PUT response for parsing
-                                    responses_to_parse.insert(0, get_response)
-                            # Break and return the responses to be parsed
-                            break
-                        elif int(poll_response.status_code) >= 300:
-                            # Error obtaining the polling response.
-                            # It may still be possible to extract the relevant ID out of the original response,
-                            # which will be added before exiting the function
-                            break
-                        else:
-                            # Continue polling
-                            pass
-                    else:
-                        # There is no data in the polling response.
-                        # In such cases, try to execute a corresponding GET request and obtain
-                        # information from the response
-                        # This comes from Azure-Async responses that do not contain a Location: field
-                        # Check for the status of the resource
-                        response_body = json.loads(poll_response.json_body)
-                        done = str(response_body["status"]).lower()
-                        if done == "succeeded":
-                            LOG_RESULTS(request_data,
-                                        f"Resource creation succeeded after {time_str} seconds.")
-                            get_response = try_parse_GET_request(request_data)
-                            if get_response:
-                                responses_to_parse.append(get_response)
-                        elif done == "failed":
-                            LOG_RESULTS(request_data,
-                                        f"The server reported that the resource creation Failed after {time_str} seconds.")
-                            resource_error = True
-
-                        # Break and return the responses to be parsed
-                        break
-                except json.JSONDecodeError as err:
-                    LOG_RESULTS(request_data, "Failed to parse body of async response, retrying.")
-                    # This may have been due to a connection failure. Retry until max_async_wait_time.
-                    time.sleep(poll_wait_seconds)
-                    continue
-                except Exception as err:
-                    LOG_RESULTS(request_data,
-                                f"An exception occurred while parsing the poll message: {err!s}")
-                    break
-
-                try:
-                    if not poll_response.status_code.startswith('2'):
-                        LOG_RESULTS(request_data, f"Resource creation failed after {time_str} seconds"
-                                                  f" because status code '{poll_response.status_code}' was received.")
-                        # When an error is received in a polling response, the resource may still be created -
-                        # This should be checked with a GET request.
-                        break
-                except Exception as err:
-                    LOG_RESULTS(request_data,
-                                f"An exception occurred while parsing the poll message: {err!s}")
-                    break
-                time.sleep(poll_wait_seconds)
-            else:
-                RAW_LOGGING("Resource polling timed out before the resource was available.")
-                LOG_RESULTS(request_data,
-                            f"Failed to create resource in {max_async_wait_time} seconds.")
-                RAW_LOGGING("Attempting to get resources from GET request...")
-                # Do not use a GET to obtain the status for a DELETE request.
-                # A resource with the same ID may have been re-created.
-                if not request_data.startswith("DELETE"):
-                    get_response = try_parse_GET_request(request_data)
-                    if get_response:
-                        # Use response from the GET request for parsing. If the GET request failed,
-                        # the caller will know to try and use the original PUT response for parsing
-                        responses_to_parse.append(get_response)
 
-    if len(responses_to_parse) == 0:
-        responses_to_parse.append(response)
-    return responses_to_parse, resource_error, async_waited
+def submit_async_poll(request_data, response, max_async_wait_time, poll_delete_status=False, resource_type=None):
+    """ Same as try_async_poll, except that the resource is polled by the shared
+    AsyncResourcePoller, so that the caller can submit other operations or do
+    other work before waiting for the result.
+
+    @return: A future whose result is the result of try_async_poll
+    @rtype : concurrent.futures.Future
+
+    """
+    operation = _get_polling_operation(request_data, response, max_async_wait_time,
+                                       poll_delete_status, resource_type)
+    if operation is None:
+        future = concurrent.futures.Future()
+        future.set_result(([response], False, False))
+        return future
+    return AsyncResourcePoller.Instance().submit(operation)
@@ -8,7 +8,6 @@ import time
 import itertools
 import functools
 import multiprocessing
-from multiprocessing.dummy import Pool as ThreadPool
 from random import Random
 
 from restler.restler_settings import Settings, LogSettings
@@ -26,6 +25,9 @@ from restler.engine.core.requests import GrammarRequestCollection
 from restler.engine.core.request_utilities import execute_token_refresh_cmd
 from restler.engine.core.request_utilities import get_hostname_from_line
 from restler.engine.core.fuzzing_monitor import Monitor
+from restler.engine.core.sequence_scheduler import SequenceScheduler
+from restler.engine.core.sequence_scheduler import is_rendering_ahead
+from restler.engine.core.worker_pool import WorkerPool
 from restler.engine.errors import TimeOutException
 from restler.engine.errors import ExhaustSeqCollectionException
 from restler.utils.restler_logger import raw_network_logging as RAW_LOGGING
@@ -51,6 +53,50 @@ def validate_dependencies(consumer_req, producer_seq):
     return consumer_req.consumes <= set(producer_requests)
 
 
+def extend_with(seq, req):
+    """ Returns a new sequence, made of a sequence followed by a request.
+
+    @param seq: The sequence to extend.
+    @type  seq: Sequence class object.
+    @param req: The request to append.
+    @type  req: Request class object.
+
+    @return: The extended sequence.
+    @rtype : Sequence
+
+    """
+    # The copy only holds the state of the request in this sequence
+    req_copy = requests.SharedRequest(req)
+    if seq.is_empty_sequence():
+        return sequences.Sequence(req_copy)
+    return seq + sequences.Sequence(req_copy)
+
+
+def extend_sequence(seq, position, fuzzing_requests):
+    """ Extends a single sequence of the collection as "extend" does, in the
+    bfs fuzzing modes.
+
+    @param seq: The sequence to extend.
+    @type  seq: Sequence class object.
+    @param position: The position of the sequence in the sequence collection.
+    @type  position: Int
+    @param fuzzing_requests: The collection of requests to fuzz.
+    @type  fuzzing_requests: FuzzingRequestCollection.
+
+    @return: The extended sequences, with keys that sort them in the order
+             in which "extend" returns them.
+    @rtype : List[Tuple(Tuple(int, int), Sequence)]
+
+    """
+    extended = []
+    for req_idx, req in enumerate(fuzzing_requests):
+        if not validate_dependencies(req, seq) \
+                and not Settings().ignore_dependencies:
+            continue
+        extended.append(((req_idx, position), extend_with(seq, req)))
+    return extended
+
+
 def extend(seq_collection, fuzzing_requests, lock, random_gen):
     """ Extends each sequence currently present in collection by any request
     from request collection whose dependencies can be resolved if appended at
@@ -95,14 +141,7 @@ def extend(seq_collection, fuzzing_requests, lock, random_gen):
                 continue
 
             extended_requests.append(req)
-            req_copy = copy.copy(req)
-            req_copy._current_combination_id = 0
-            if seq.is_empty_sequence():
-                new_seq = sequences.Sequence(req_copy)
-            else:
-                new_seq = seq + sequences.Sequence(req_copy)
-
-            seq_collection.append(new_seq)
+            seq_collection.append(extend_with(seq, req))
 
             # In 'quick' modes, append each request to exactly one sequence
             if Settings().fuzzing_mode in \
@@ -139,6 +178,9 @@ def apply_checkers(checkers, renderings, global_lock):
     @rtype : None
 
     """
+    # The state of the checkers would be kept if the sequence is cancelled
+    if is_rendering_ahead():
+        return
     for checker in checkers:
         if checker.enabled:
             logger.write_to_main(
@@ -297,21 +339,49 @@ def render_one(seq_to_render, ith, checkers, generation, global_lock, garbage_co
 
 def render_parallel(seq_collection, fuzzing_pool, checkers, generation, global_lock, garbage_collector):
     """ Does rendering work in parallel by invoking "render_one" multiple
-    times using a pool of python workers. For brevity we skip arguments and
-    return types, since they are similar with "render_one".
+    times using a pool of python workers, which take the next sequence to
+    render from a shared queue. For brevity we skip arguments and return
+    types, since they are similar with "render_one".
 
     Additional arguments:
 
+    @param fuzzing_pool: The scheduler of the workers
+    @type  fuzzing_pool: SequenceScheduler
+
     @param : A dictionary of sequences already tested, indexed by last request hex definition.  This
              dictionary contains whether or not this sequence was valid when rendered.
     @type  checkers: Dict[str, (int, Sequence)]
     """
-    prev_len = len(seq_collection)
-    result = fuzzing_pool.starmap(render_one,
-                                  [(seq_collection[ith], ith,
-                                    checkers, generation, global_lock, garbage_collector
-                                    ) \
-                                   for ith in range(prev_len)])
+    render = functools.partial(render_one, checkers=checkers, global_lock=global_lock,
+                               garbage_collector=garbage_collector)
+    result = fuzzing_pool.render(render, seq_collection, generation)
+    seq_collection = list(itertools.chain(*result))
+
+    # Increase internal fuzzing generations' counter. Since the
+    # constructor of RequestCollection starts this counter from zero,
+    # the counter will be equal to lenght + 1 after the following line.
+    Monitor().current_fuzzing_generation += 1
+
+    return seq_collection
+
+
+def render_parallel_processes(seq_collection, fuzzing_pool, checkers, generation, global_lock, garbage_collector):
+    """ Does rendering work in parallel by invoking "render_one" multiple
+    times in worker processes. For brevity we skip arguments and return
+    types, since they are similar with "render_parallel".
+
+    @param fuzzing_pool: The pool of worker processes
+    @type  fuzzing_pool: WorkerPool
+    """
+    # The workers are forked for each generation, so the rendering caches of
+    # the requests are generated before, by the main process
+    candidate_values_pool = GrammarRequestCollection().candidate_values_pool
+    for seq in seq_collection:
+        seq.last_request.prepare_render_caches(candidate_values_pool)
+
+    render = functools.partial(render_one, checkers=checkers, generation=generation,
+                               global_lock=global_lock, garbage_collector=garbage_collector)
+    result = fuzzing_pool.render(render, seq_collection, global_lock, checkers)
     seq_collection = list(itertools.chain(*result))
 
     # Increase internal fuzzing generations' counter. Since the
@@ -446,9 +516,9 @@ def render_with_cache(seq_collection, fuzzing_pool, checkers, generation, global
                 values = list(values)
 
                 prefix_seq = functools.reduce(lambda x, y: x + y, values)
-                suffix_seq = sequences.Sequence(current_seq.requests[prefix_seq.length:])
-                # This must be deep copied to preserve multiple renderings for the entire sequence.
-                suffix_seq = copy.deepcopy(suffix_seq)
+                # The requests must be copied to preserve multiple renderings for the entire sequence.
+                suffix_seq = sequences.Sequence([requests.SharedRequest(req)
+                                                 for req in current_seq.requests[prefix_seq.length:]])
 
                 sequence_to_render = prefix_seq + suffix_seq
                 sequences_to_render.append((sequence_to_render, prefix_seq.length))
@@ -687,10 +757,14 @@ def generate_sequences(fuzzing_requests, checkers, fuzzing_jobs=1, garbage_colle
     max_len = Settings().max_sequence_length
     random_gen = Random(Settings().random_seed)
 
-    if fuzzing_jobs > 1:
+    if fuzzing_jobs > 1 and Settings().fuzzing_jobs_mode == 'processes':
+        render = render_parallel_processes
+        global_lock = multiprocessing.Lock()
+        fuzzing_pool = WorkerPool(fuzzing_jobs)
+    elif fuzzing_jobs > 1:
         render = render_parallel
         global_lock = multiprocessing.Lock()
-        fuzzing_pool = ThreadPool(fuzzing_jobs)
+        fuzzing_pool = SequenceScheduler(fuzzing_jobs)
     else:
         global_lock = None
         fuzzing_pool = None
@@ -808,6 +882,13 @@ def generate_sequences(fuzzing_requests, checkers, fuzzing_jobs=1, garbage_colle
                         seq.requests[-1].stats.request_order = req_order
                         req_order = req_order + 1
 
+        # Without a barrier between the generations, the workers render the
+        # extensions of each valid rendering as soon as it is found.
+        if isinstance(fuzzing_pool, SequenceScheduler) and specific_target_sequences is None and \
+                fuzzing_mode in ['bfs', 'bfs-cheap'] and Settings().fuzzing_jobs_render_ahead:
+            fuzzing_pool.enable_rendering_ahead(
+                functools.partial(extend_sequence, fuzzing_requests=fuzzing_requests), max_len)
+
         generation = 0
         all_extended_requests = []
         seq_rendering_cache = sequences.RenderedSequenceCache()
@@ -836,6 +917,7 @@ def generate_sequences(fuzzing_requests, checkers, fuzzing_jobs=1, garbage_colle
                 seq_collection, extended_requests = extend(seq_collection,
                                                            fuzzing_requests,
                                                            global_lock, random_gen)
+            sequences.SequenceMemoryStats.Instance().record(generation, seq_collection)
 
             logger.write_to_main(f"{formatting.timestamp()}: Generation: {generation} ", LogSettings().driver)
             logger.write_to_main(
@@ -919,7 +1001,7 @@ def generate_sequences(fuzzing_requests, checkers, fuzzing_jobs=1, garbage_colle
         # Generate the summary spec coverage file now that all of the combinations have been logged
         logger.generate_summary_speccov()
 
-    if fuzzing_pool is not None:
+    if isinstance(fuzzing_pool, SequenceScheduler):
         fuzzing_pool.close()
         fuzzing_pool.join()
 
@@ -2,11 +2,43 @@
 # Licensed under the MIT License.
 
 """ Global monitor for the fuzzing run """
+import copy
+import functools
+import threading
 import time
 
 from restler.engine.core.status_codes_monitor import StatusCodesMonitor
 from restler.engine.core.renderings_monitor import RenderingsMonitor
 
+# The updates deferred by the current thread, see defer_updates
+_thread_state = threading.local()
+
+
+def defer_updates(updates):
+    """ Makes the current thread record its updates of the monitor and of the
+    bug buckets, instead of applying them, e.g. while it renders a sequence
+    that may be discarded.  Each update is recorded as a function applying it.
+
+    @param updates: The list in which to record the updates, or None to apply them
+    @type  updates: List[Func] or None
+
+    @return: None
+    @rtype : None
+
+    """
+    _thread_state.updates = updates
+
+
+def get_deferred_updates():
+    """ Returns the list set by defer_updates for the current thread.
+
+    @return: The list of the deferred updates, or None if the updates are applied
+    @rtype : List[Func] or None
+
+    """
+    return getattr(_thread_state, 'updates', None)
+
+
 def Monitor():
     """ Accessor for the FuzzingMonitor singleton """
     return FuzzingMonitor.Instance()
@@ -123,6 +155,11 @@ class FuzzingMonitor(object):
         @rtype : None
 
         """
+        deferred_updates = get_deferred_updates()
+        if deferred_updates is not None:
+            # The combination id of the request changes with its next rendering
+            deferred_updates.append(functools.partial(self.renderings_monitor.update, copy.copy(request), is_valid))
+            return
         self.renderings_monitor.update(request, is_valid)
 
     def reset_renderings_monitor(self):
@@ -215,6 +252,10 @@ class FuzzingMonitor(object):
         @rtype : None
 
         """
+        deferred_updates = get_deferred_updates()
+        if deferred_updates is not None:
+            deferred_updates.append(functools.partial(self.status_codes_monitor.increment_requests_count, type))
+            return
         self.status_codes_monitor.increment_requests_count(type)
 
     def num_requests_sent(self):
@@ -279,6 +320,14 @@ class FuzzingMonitor(object):
         @rtype : None
 
         """
+        deferred_updates = get_deferred_updates()
+        if deferred_updates is not None:
+            # The sequence is rendered again, so its executed requests count changes
+            sequence_copy = copy.copy(sequence)
+            sequence_copy.executed_requests_count = sequence.executed_requests_count
+            deferred_updates.append(functools.partial(self.status_codes_monitor.update, sequence_copy,
+                                                      list(status_codes), lock))
+            return
         self.status_codes_monitor.update(sequence, status_codes, lock)
 
     @property
@@ -290,3 +339,43 @@ class FuzzingMonitor(object):
 
         """
         return self.status_codes_monitor.sequence_statuses
+
+    def checkpoint(self):
+        """ Returns the current state of the monitor, to later get the updates
+        made since then with get_updates_since.
+
+        @return: The checkpoint of the status codes monitor
+        @rtype : Tuple
+
+        """
+        return self.status_codes_monitor.checkpoint()
+
+    def get_updates_since(self, checkpoint):
+        """ Returns the updates made to the monitor since a checkpoint, e.g.
+        by a worker process of the fuzzing run.
+
+        @param checkpoint: The value returned by checkpoint
+        @type  checkpoint: Tuple
+
+        @return: The updates of the status codes and renderings monitors
+        @rtype : Tuple
+
+        """
+        return (self.status_codes_monitor.get_updates_since(checkpoint),
+                self.renderings_monitor.get_updates())
+
+    def merge_updates(self, updates, lock=None):
+        """ Merges the updates made to the monitor of a worker process.
+
+        @param updates: The value returned by get_updates_since
+        @type  updates: Tuple
+        @param lock: Lock object used for sync of more than one fuzzing jobs.
+        @type  lock: thread.Lock object
+
+        @return: None
+        @rtype : None
+
+        """
+        status_codes_updates, renderings_updates = updates
+        self.status_codes_monitor.merge_updates(status_codes_updates, lock)
+        self.renderings_monitor.merge_updates(renderings_updates)
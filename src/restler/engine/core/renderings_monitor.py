@@ -2,6 +2,36 @@
 # Licensed under the MIT License.
 
 """ Tracks each request rendering with information on whether it is valid or invalid """
+import threading
+
+# The generation of the renderings registered by the current thread, when it
+# renders sequences ahead of the current fuzzing generation
+_thread_state = threading.local()
+
+
+def set_rendering_generation(generation):
+    """ Sets the generation in which the current thread registers renderings.
+
+    @param generation: The generation, or None for the current fuzzing generation
+    @type  generation: Int or None
+
+    @return: None
+    @rtype : None
+
+    """
+    _thread_state.generation = generation
+
+
+def get_rendering_generation():
+    """ Returns the generation set by set_rendering_generation for the current thread.
+
+    @return: The generation, or None for the current fuzzing generation
+    @rtype : Int or None
+
+    """
+    return getattr(_thread_state, 'generation', None)
+
+
 class RenderingsMonitor(object):
     def __init__(self):
        # Keeps track of the current generation being fuzzed by the driver.
@@ -29,10 +59,13 @@ class RenderingsMonitor(object):
         Note: The "minus one" rendering because the counter has been increased
             before invoking this routine.
         """
-        if self._current_fuzzing_generation not in self._rendering_ids:
-            self._rendering_ids[self._current_fuzzing_generation] = {}
+        generation = get_rendering_generation()
+        if generation is None:
+            generation = self._current_fuzzing_generation
+        if generation not in self._rendering_ids:
+            self._rendering_ids[generation] = {}
 
-        renderings = self._rendering_ids[self._current_fuzzing_generation]
+        renderings = self._rendering_ids[generation]
         if request.hex_definition not in renderings:
             renderings[request.hex_definition] = {'valid': set(),
                                                   'invalid': set()}
@@ -75,6 +108,12 @@ class RenderingsMonitor(object):
         if not self._memoize_invalid_past_renderings:
             return False
 
+        # If the request is rendered ahead of its generation, the previous
+        # generation is not complete, so do not skip
+        generation = get_rendering_generation()
+        if generation is not None and generation != self._current_fuzzing_generation:
+            return False
+
         # If request has not completed a whole round of the previous generation,
         # do not skip
         if self._current_fuzzing_generation - 1 not in self._rendering_ids:
@@ -142,6 +181,40 @@ class RenderingsMonitor(object):
                 counter += 1
         return counter
 
+    def get_updates(self):
+        """ Returns the renderings registered in the current generation, to
+        be merged into another monitor with merge_updates.
+
+        @return: The valid and invalid rendering ids of each request
+        @rtype : Dict(int, Dict(str, Set(int)))
+
+        """
+        return self._rendering_ids.get(self._current_fuzzing_generation, {})
+
+    def merge_updates(self, updates):
+        """ Merges the renderings registered by another monitor, e.g. the
+        monitor of a worker process, in the current generation.
+
+        @param updates: The value returned by get_updates
+        @type  updates: Dict(int, Dict(str, Set(int)))
+
+        @return: None
+        @rtype : None
+
+        """
+        if not updates:
+            return
+        if self._current_fuzzing_generation not in self._rendering_ids:
+            self._rendering_ids[self._current_fuzzing_generation] = {}
+
+        renderings = self._rendering_ids[self._current_fuzzing_generation]
+        for req_hex, rendering_ids in updates.items():
+            if req_hex not in renderings:
+                renderings[req_hex] = {'valid': set(),
+                                       'invalid': set()}
+            renderings[req_hex]['valid'].update(rendering_ids['valid'])
+            renderings[req_hex]['invalid'].update(rendering_ids['invalid'])
+
     def set_memoize_invalid_past_renderings_on(self):
         """ Internal sets feature for skipping known invalid past renderings.
 
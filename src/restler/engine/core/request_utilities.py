@@ -2,6 +2,7 @@
 # Licensed under the MIT License.
 
 """ Collection of Request utility functions """
+import asyncio
 import hashlib
 import time
 import subprocess
@@ -21,14 +22,23 @@ from restler.engine.transport_layer.response import HttpResponse
 from restler.engine.transport_layer.response import RESTLER_BUG_CODES
 from restler.engine.transport_layer.messaging import UTF8
 from restler.engine.transport_layer.messaging import HttpSock
+from restler.engine.transport_layer.messaging import detach_ssl_contexts
+from restler.engine.transport_layer.rate_limiter import RateLimiter
+from restler.engine.transport_layer.rate_limiter import RequestRateLimiter
+from restler.engine.transport_layer.rate_limiter import get_endpoint
+from restler.engine.transport_layer.rate_limiter import get_retry_after
 from restler.engine.core.retry_handler import RetryHandler
+from restler.engine.core.retry_handler import RetryStats
+from restler.engine.core.retry_handler import RetryStrategy
+from restler.engine.core.token_manager import TokenManager
 from restler.utils import import_utilities
 
-last_refresh = 0
 NO_TOKEN_SPECIFIED = 'NO-TOKEN-SPECIFIED\r\n'
 latest_token_value = NO_TOKEN_SPECIFIED
 NO_SHADOW_TOKEN_SPECIFIED = 'NO-SHADOW-TOKEN-SPECIFIED\r\n'
 latest_shadow_token_value = NO_SHADOW_TOKEN_SPECIFIED
+# The token and shadow token, published together so that they are always read as a pair
+latest_tokens = (latest_token_value, latest_shadow_token_value)
 
 HOST_PREFIX = 'Host: '
 
@@ -48,6 +58,33 @@ def get_latest_token_value():
     return latest_token_value
 
 
+def get_latest_tokens():
+    """ Returns the latest token and shadow token, which were refreshed together.
+
+    @return: The token and shadow token values
+    @rtype : Tuple(Str, Str)
+
+    """
+    return latest_tokens
+
+
+def publish_tokens(token_value, shadow_token_value):
+    """ Sets the latest token and shadow token values.
+
+    @param token_value: The token value
+    @type  token_value: Str
+    @param shadow_token_value: The shadow token value
+    @type  shadow_token_value: Str
+
+    @return: None
+    @rtype : None
+
+    """
+    global latest_token_value, latest_shadow_token_value, latest_tokens
+    latest_tokens = (token_value, shadow_token_value)
+    latest_token_value, latest_shadow_token_value = latest_tokens
+
+
 def str_to_hex_def(val_str):
     """ Creates a hex definition from a specified string
 
@@ -69,7 +106,6 @@ def execute_token_refresh(token_dict):
     @return: None. Updates global latest_token_value and latest_shadow_token_value
     @type: None
     """
-    global latest_token_value, latest_shadow_token_value
     ERROR_VAL_STR = 'ERROR\r\n'
     result = None
     token_auth_method = token_dict["token_auth_method"]
@@ -90,8 +126,8 @@ def execute_token_refresh(token_dict):
                     token_dict["token_module_function"],
                     token_dict["token_module_data"])
 
-            _, latest_token_value, latest_shadow_token_value = parse_authentication_tokens(
-                result)
+            _, token_value, shadow_token_value = parse_authentication_tokens(result)
+            publish_tokens(token_value, shadow_token_value)
             break
         except EmptyTokenException:
             error_str = "Error: Authentication token was empty."
@@ -106,8 +142,7 @@ def execute_token_refresh(token_dict):
         except Exception as error:
             error_str = f"Authentication failed when refreshing token:\n\nUsing Token authentication method: \n{token_auth_method} \n with error {error}"
             print(f'\n{error_str}')
-            latest_token_value = ERROR_VAL_STR
-            latest_shadow_token_value = ERROR_VAL_STR
+            publish_tokens(ERROR_VAL_STR, ERROR_VAL_STR)
             _RAW_LOGGING(error_str)
             retry_handler.wait_for_next_retry()
 
@@ -249,7 +284,7 @@ def replace_auth_token(data, replace_str):
     return data
 
 
-def resolve_dynamic_primitives(values, candidate_values_pool):
+def resolve_dynamic_primitives(values, candidate_values_pool, indexes=None):
     """ Dynamic primitives (i.e., uuid4) must be filled with a new value
         each time the request is rendered.
 
@@ -260,6 +295,9 @@ def resolve_dynamic_primitives(values, candidate_values_pool):
     @type values: List
     @param candidate_values_pool: The pool of values for primitive types.
     @type  candidate_values_pool: Dict
+    @param indexes: The indexes of the values that may be dynamic primitives,
+                    or None to check all the values
+    @type  indexes: List[Int] or None
 
     @return: List of string of primitive type payloads for which any dynamic
                 primitive (e.g., uuid4) with be substituted with a fresh and
@@ -268,10 +306,9 @@ def resolve_dynamic_primitives(values, candidate_values_pool):
     @rtype : List
 
     """
-    global last_refresh, latest_token_value, latest_shadow_token_value
     # There should only be one uuid4_suffix in the request for a given name
     current_uuid_suffixes = {}
-    for i in range(len(values)):
+    for i in (range(len(values)) if indexes is None else indexes):
         # Look for function pointers assigned to dynamic primitives
         if isinstance(values[i], tuple) \
                 and values[i][0] == primitives.restler_fuzzable_uuid4:
@@ -323,12 +360,8 @@ def resolve_dynamic_primitives(values, candidate_values_pool):
             if not isinstance(token_dict, dict):
                 raise Exception("Refreshable token was not specified as a setting, but a request was expecting it.")
             if "token_auth_method" in token_dict and token_dict["token_auth_method"]:
-                token_refresh_interval = token_dict['token_refresh_interval']
-                if int(time.time()) - last_refresh > token_refresh_interval:
-                    execute_token_refresh(token_dict)
-                    last_refresh = int(time.time())
-                    # print("-{}-\n-{}-".format(repr(latest_token_value),
-                    #                          repr(latest_shadow_token_value)))
+                # The token is refreshed in the background once it was first obtained
+                TokenManager.Instance().ensure_token(token_dict, execute_token_refresh)
                 values[i] = latest_token_value
             else:
                 # If the dictionary is empty, there is no authentication specified.
@@ -414,21 +447,94 @@ def get_replay_blocks(req_definition, rendered_values):
     return req_definition_copy
 
 
-#def send_request_data(rendered_data, req_timeout_sec=None):
-def send_request_data(rendered_data, req_timeout_sec=None, reconnect=None, http_sock=None):
-    MAX_RETRIES = 5
+def _get_retry_settings():
+    """ Returns the settings that control when sent requests are re-tried.
+
+    @return: The status codes and the response text for which requests are re-tried
+    @rtype : Tuple(List[Str], List[Str])
+
+    """
     custom_retry_codes = Settings().custom_retry_codes
     custom_retry_text = Settings().custom_retry_text
-    custom_retry_interval_sec = Settings().custom_retry_interval_sec
 
-    RETRY_SLEEP_SEC = 5 if custom_retry_interval_sec is None else custom_retry_interval_sec
     RETRY_CODES = ['429'] if custom_retry_codes is None else custom_retry_codes
     # Note: the default text below is specific to Azure cloud services
     # Because 409s were previously unconditionally re-tries, it is being added here
     # as a constant for backwards compatibility.  In the future, this should move into
     # a separate settings file.
     RETRY_TEXT = ['AnotherOperationInProgress'] if custom_retry_text is None else custom_retry_text
-    num_retries = 0
+    return RETRY_CODES, RETRY_TEXT
+
+
+def _create_retry_handler():
+    """ Creates the RetryHandler that schedules the retries of a request
+    according to custom_retry_settings.
+
+    @return: The retry handler
+    @rtype : RetryHandler
+
+    """
+    custom_retry_interval_sec = Settings().custom_retry_interval_sec
+    RETRY_SLEEP_SEC = 5 if custom_retry_interval_sec is None else custom_retry_interval_sec
+    strategy = RetryStrategy.EXPONENTIAL if Settings().custom_retry_strategy == 'exponential'\
+        else RetryStrategy.LINEAR
+    return RetryHandler(strategy,
+                        max_retries=Settings().custom_retry_max_retries,
+                        delay=RETRY_SLEEP_SEC,
+                        max_delay=Settings().custom_retry_max_interval_sec)
+
+
+def _get_retry_delay(retry_handler, rendered_data, response):
+    """ Returns the time to wait before re-trying a request, honoring the
+    response's Retry-After header, and counts the retry for the request's
+    endpoint.
+
+    @param retry_handler: The retry handler of the request
+    @type  retry_handler: RetryHandler
+    @param rendered_data: The rendered request
+    @type  rendered_data: Str
+    @param response: The response that triggered the retry
+    @type  response: HttpResponse
+
+    @return: The time, in seconds, to wait, or None if the retry limit was reached
+    @rtype : Float or None
+
+    """
+    if not retry_handler.can_retry():
+        return None
+    delay = retry_handler.next_delay(get_retry_after(response))
+    endpoint = get_endpoint(rendered_data)
+    RetryStats.Instance().record(' '.join(endpoint) if endpoint else '', delay)
+    return delay
+
+
+def _should_retry(response, retry_codes, retry_text):
+    """ Returns whether a request should be re-tried given its response.
+
+    @param response: The response received
+    @type  response: HttpResponse
+    @param retry_codes: The status codes for which requests are re-tried
+    @type  retry_codes: List[Str]
+    @param retry_text: The response text for which requests are re-tried
+    @type  retry_text: List[Str]
+
+    @return: True if the request should be re-tried
+    @rtype : Bool
+
+    """
+    if response.status_code in retry_codes:
+        return True
+    # Check whether a custom re-try text was provided.
+    for text in retry_text:
+        if text in response.to_str:
+            return True
+    return False
+
+
+#def send_request_data(rendered_data, req_timeout_sec=None):
+def send_request_data(rendered_data, req_timeout_sec=None, reconnect=None, http_sock=None):
+    RETRY_CODES, RETRY_TEXT = _get_retry_settings()
+    retry_handler = _create_retry_handler()
     try:
         main_sock = threadLocal.main_sock
     except AttributeError:
@@ -436,17 +542,28 @@ def send_request_data(rendered_data, req_timeout_sec=None, reconnect=None, http_
         threadLocal.main_sock = HttpSock(Settings().connection_settings)
         main_sock = threadLocal.main_sock
 
-    while num_retries < MAX_RETRIES:
+    while True:
         # Send the request and receive the response
         reconnect = Settings().reconnect_on_every_request if reconnect is None else reconnect
         # The connection may have been closed as part of throttling, so re-connect when re-trying.
-        if num_retries > 0:
+        if retry_handler.num_retries > 0:
             reconnect = True
         req_timeout_sec = Settings().max_request_execution_time if req_timeout_sec is None else req_timeout_sec
-        success, response = main_sock.sendRecv(rendered_data,
-                                               req_timeout_sec, reconnect=reconnect)
+        concurrency_slot = RateLimiter().concurrency_slot(rendered_data)
+        if concurrency_slot is not None:
+            concurrency_slot.acquire()
+        try:
+            success, response = main_sock.sendRecv(rendered_data,
+                                                   req_timeout_sec, reconnect=reconnect)
+        finally:
+            if concurrency_slot is not None:
+                concurrency_slot.release()
+        RateLimiter().on_response(rendered_data, response)
 
         status_code = response.status_code
+        if status_code == '401':
+            # Refresh the token early if the service keeps rejecting it
+            TokenManager.Instance().on_unauthorized()
 
         if status_code and status_code in RESTLER_BUG_CODES:
             return response
@@ -455,25 +572,125 @@ def send_request_data(rendered_data, req_timeout_sec=None, reconnect=None, http_
             _RAW_LOGGING(f"Failed to receive response.  Success: {success}, status: {status_code}, Response: {response.to_str}")
             return HttpResponse()
 
-        # Check whether a custom re-try text was provided.
-        response_contains_retry_text = False
-        for text in RETRY_TEXT:
-            if text in response.to_str:
-                response_contains_retry_text = True
-                break
-
-        if status_code in RETRY_CODES or response_contains_retry_text:
-            num_retries += 1
-            if num_retries < MAX_RETRIES:
-                time.sleep(RETRY_SLEEP_SEC)
+        if _should_retry(response, RETRY_CODES, RETRY_TEXT):
+            delay = _get_retry_delay(retry_handler, rendered_data, response)
+            if delay is not None:
+                time.sleep(delay)
                 _RAW_LOGGING("Retrying request")
                 continue
-            else:
-                return response
 
         return response
 
 
+async def async_send_request_data(rendered_data, http_sock, req_timeout_sec=None):
+    """ Asynchronous variant of send_request_data, which sends the request
+    over the specified AsyncHttpSock.
+
+    @param rendered_data: The rendered request to send
+    @type  rendered_data: Str
+    @param http_sock: The socket to send the request over
+    @type  http_sock: AsyncHttpSock
+    @param req_timeout_sec: The time, in seconds, to wait for request to complete
+    @type  req_timeout_sec: Int
+
+    @return: The response received
+    @rtype : HttpResponse
+
+    """
+    RETRY_CODES, RETRY_TEXT = _get_retry_settings()
+    retry_handler = _create_retry_handler()
+    req_timeout_sec = Settings().max_request_execution_time if req_timeout_sec is None else req_timeout_sec
+
+    while True:
+        success, response = await http_sock.sendRecv(rendered_data, req_timeout_sec,
+                                                     reconnect=retry_handler.num_retries > 0 or
+                                                     Settings().reconnect_on_every_request)
+        RateLimiter().on_response(rendered_data, response)
+        status_code = response.status_code
+        if status_code == '401':
+            # Refresh the token early if the service keeps rejecting it
+            TokenManager.Instance().on_unauthorized()
+
+        if status_code and status_code in RESTLER_BUG_CODES:
+            return response
+
+        if not success or (status_code is None):
+            _RAW_LOGGING(f"Failed to receive response.  Success: {success}, status: {status_code}, Response: {response.to_str}")
+            return HttpResponse()
+
+        if _should_retry(response, RETRY_CODES, RETRY_TEXT):
+            delay = _get_retry_delay(retry_handler, rendered_data, response)
+            if delay is not None:
+                # The retry is deferred on the event loop, so the other requests
+                # in flight keep being sent and received while this one waits.
+                await asyncio.sleep(delay)
+                _RAW_LOGGING("Retrying request")
+                continue
+        return response
+
+
+def send_inflight_request_data(rendered_data_list, req_timeout_sec=None):
+    """ Sends independent requests concurrently, with at most
+    max_inflight_requests requests in flight at once, over this thread's
+    asyncio event loop.
+
+    @param rendered_data_list: The rendered requests to send
+    @type  rendered_data_list: List[Str]
+    @param req_timeout_sec: The time, in seconds, to wait for each request to complete
+    @type  req_timeout_sec: Int
+
+    @return: The responses, in the order of @param rendered_data_list
+    @rtype : List[HttpResponse]
+
+    """
+    from restler.engine.transport_layer.async_messaging import AsyncHttpSock
+    try:
+        event_loop = threadLocal.event_loop
+        async_socks = threadLocal.async_socks
+    except AttributeError:
+        event_loop = threadLocal.event_loop = asyncio.new_event_loop()
+        async_socks = threadLocal.async_socks = []
+
+    max_inflight = min(Settings().max_inflight_requests, len(rendered_data_list))
+    while len(async_socks) < max_inflight:
+        async_socks.append(AsyncHttpSock(Settings().connection_settings))
+
+    async def send_all():
+        idle_socks = asyncio.Queue()
+        for http_sock in async_socks[:max_inflight]:
+            idle_socks.put_nowait(http_sock)
+
+        async def send_one(rendered_data):
+            http_sock = await idle_socks.get()
+            try:
+                return await async_send_request_data(rendered_data, http_sock, req_timeout_sec)
+            finally:
+                idle_socks.put_nowait(http_sock)
+
+        return await asyncio.gather(*[send_one(rendered_data) for rendered_data in rendered_data_list])
+
+    return event_loop.run_until_complete(send_all())
+
+
+def detach_transport():
+    """ Drops the connections, SSL contexts, rate limiter and token refresh
+    thread inherited by a worker process of the fuzzing run, so that the
+    worker creates its own.  The inherited connections are not shut down,
+    since they still belong to the main process.
+
+    @return: None
+    @rtype : None
+
+    """
+    from restler.engine.transport_layer.connection_pool import HttpConnectionPool
+    for name in ['main_sock', 'event_loop', 'async_socks']:
+        threadLocal.__dict__.pop(name, None)
+    HttpConnectionPool.DetachInstance()
+    TokenManager.DetachInstance()
+    RequestRateLimiter.DetachInstance()
+    detach_ssl_contexts()
+
+
 def call_response_parser(parser, response, request=None, responses=None):
     """ Calls a specified parser on a response
 
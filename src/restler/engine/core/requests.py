@@ -3,10 +3,16 @@
 
 """ Primitives for definition and manipulation of restler request sequences. """
 from __future__ import print_function
+import copy
 import itertools
 import functools, operator
+import sys
+import threading
+import weakref
+from collections import OrderedDict
 
 from restler.restler_settings import Settings, LogSettings
+from restler.restler_settings import parse_combination_strategy
 from random import Random
 
 import restler.engine.core.request_utilities as request_utilities
@@ -269,8 +275,608 @@ class RenderedValuesCache(object):
         return self._cache[combination_id]
 
 
-class Request(object):
-    """ Request Class. """
+class CombinationSpace(object):
+    """ The value combinations of the fuzzable lists of one request schema.
+
+    Combinations are numbered in the order of itertools.product (the last list
+    varies fastest), so a combination id is decoded directly into its values
+    as a mixed-radix number whose digits are indexes into the lists.
+    """
+
+    def __init__(self, fuzzable, max_combinations, cycle=False):
+        """ Initializes the combination space.
+
+        @param fuzzable: The candidate values of each request block
+        @type  fuzzable: List[List]
+        @param max_combinations: The maximum number of combinations
+        @type  max_combinations: Int
+        @param cycle: If set, the combinations are repeated until
+                      @max_combinations is reached (used when dynamic value
+                      generators supply fresh values for every combination)
+        @type  cycle: Bool
+
+        @return: None
+        @rtype : None
+
+        """
+        self._fuzzable = fuzzable
+        self._radixes = [len(values) for values in fuzzable]
+        self._product_len = functools.reduce(operator.mul, self._radixes, 1)
+        if cycle and self._product_len > 0:
+            self._size = max_combinations
+        else:
+            self._size = min(self._product_len, max_combinations)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def product_len(self):
+        """ The number of distinct combinations of the fuzzable lists """
+        return self._product_len
+
+    def _decode(self, combination_id):
+        """ Returns the list indexes of a combination, most significant first """
+        remainder = combination_id % self._product_len
+        digits = [0] * len(self._radixes)
+        for pos in range(len(self._radixes) - 1, -1, -1):
+            remainder, digits[pos] = divmod(remainder, self._radixes[pos])
+        return digits
+
+    def __getitem__(self, combination_id):
+        """ Returns the values of a combination.
+
+        @param combination_id: The combination id, in [0, len(self))
+        @type  combination_id: Int
+
+        @return: The value of each request block
+        @rtype : Tuple
+
+        """
+        if combination_id < 0 or combination_id >= self._size:
+            raise IndexError(f"Combination {combination_id} out of range")
+        return tuple(values[digit] for values, digit in zip(self._fuzzable, self._decode(combination_id)))
+
+    def iter_from(self, start):
+        """ Lazily iterates over the combinations, starting at @start.
+
+        @param start: The id of the first combination
+        @type  start: Int
+
+        @return: A generator of the value tuples
+        @rtype : Generator
+
+        """
+        if start >= self._size:
+            return iter(())
+        if start == 0:
+            combinations = itertools.product(*self._fuzzable)
+            if self._size > self._product_len:
+                combinations = itertools.cycle(combinations)
+            return itertools.islice(combinations, self._size)
+        return self._iter_digits(start)
+
+    def _iter_digits(self, start):
+        digits = self._decode(start)
+        values = [values[digit] for values, digit in zip(self._fuzzable, digits)]
+        for _ in range(self._size - start):
+            yield tuple(values)
+            # Increment the mixed-radix number, wrapping around at the end
+            pos = len(digits) - 1
+            while pos >= 0:
+                digits[pos] += 1
+                if digits[pos] < self._radixes[pos]:
+                    values[pos] = self._fuzzable[pos][digits[pos]]
+                    break
+                digits[pos] = 0
+                values[pos] = self._fuzzable[pos][0]
+                pos -= 1
+
+
+@functools.lru_cache(maxsize=256)
+def get_covering_array(radixes, strength, seed=None, max_rows=None):
+    """ Greedily builds a covering array: rows of list indexes in which every
+    combination of values of any @strength lists appears at least once.
+
+    Each row is started from the first combination that is not covered yet,
+    and the remaining lists are filled in one at a time with the value that
+    covers the most new combinations.
+
+    @param radixes: The number of values of each list
+    @type  radixes: Tuple(Int)
+    @param strength: The number of lists whose value combinations are covered
+    @type  strength: Int
+    @param seed: If set, the order of the lists and values tried for each row
+                 is randomized with this seed
+    @type  seed: Int or None
+    @param max_rows: The maximum number of rows
+    @type  max_rows: Int or None
+
+    @return: The rows of the covering array
+    @rtype : Tuple(Tuple(Int))
+
+    """
+    if 0 in radixes:
+        return ()
+    random = Random(seed) if seed is not None else None
+    # Lists with a single value are the same in every row
+    active = [dim for dim, radix in enumerate(radixes) if radix > 1]
+    strength = min(strength, len(active))
+    dim_sets = list(itertools.combinations(active, strength))
+    # The value combinations covered so far, and the number of combinations
+    # not covered yet, for each set of lists.  The combinations are not
+    # enumerated up front, so that the cost scales with the rows built.
+    covered = {dims: set() for dims in dim_sets}
+    remaining = {dims: functools.reduce(operator.mul, (radixes[dim] for dim in dims), 1) for dims in dim_sets}
+
+    def get_uncovered():
+        """ Yields the combinations not covered yet, in order """
+        for dims in dim_sets:
+            for values in itertools.product(*[range(radixes[dim]) for dim in dims]):
+                if dims not in remaining:
+                    break
+                if values not in covered[dims]:
+                    yield dims, values
+
+    uncovered = get_uncovered()
+    dim_sets_by_dim = {dim: [dims for dims in dim_sets if dim in dims] for dim in active}
+    rows = []
+    while (remaining or not rows) and (max_rows is None or len(rows) < max_rows):
+        row = [0] * len(radixes)
+        fixed = set()
+        if remaining:
+            dims, values = next(uncovered)
+            for dim, value in zip(dims, values):
+                row[dim] = value
+            fixed.update(dims)
+        remaining_dims = [dim for dim in active if dim not in fixed]
+        if random:
+            random.shuffle(remaining_dims)
+        for dim in remaining_dims:
+            fixed.add(dim)
+            candidates = list(range(radixes[dim]))
+            if random:
+                random.shuffle(candidates)
+            # The sets of lists in which this value can complete a combination
+            live = [(dims, covered[dims]) for dims in dim_sets_by_dim[dim]
+                    if dims in remaining and fixed.issuperset(dims)]
+            best_value, best_gain = candidates[0], 0
+            for value in candidates if live else ():
+                row[dim] = value
+                gain = sum(1 for dims, values in live if tuple(row[d] for d in dims) not in values)
+                if gain > best_gain:
+                    best_value, best_gain = value, gain
+            row[dim] = best_value
+        for dims in list(remaining):
+            values = tuple(row[dim] for dim in dims)
+            if values not in covered[dims]:
+                covered[dims].add(values)
+                remaining[dims] -= 1
+                if not remaining[dims]:
+                    del remaining[dims]
+                    del covered[dims]
+        rows.append(tuple(row))
+    return tuple(rows)
+
+
+class CoveringArraySpace(CombinationSpace):
+    """ The value combinations of a request schema chosen from the rows of a
+    covering array, which covers every combination of values of any N
+    parameters with far fewer combinations than the product.
+
+    Combinations are numbered in the order of the rows.
+    """
+
+    def __init__(self, fuzzable, max_combinations, strength, seed=None, cycle=False):
+        """ Initializes the combination space.
+
+        @param fuzzable: The candidate values of each request block
+        @type  fuzzable: List[List]
+        @param max_combinations: The maximum number of combinations
+        @type  max_combinations: Int
+        @param strength: The number of parameters whose value combinations are covered
+        @type  strength: Int
+        @param seed: The seed used to randomize the covering array, if any
+        @type  seed: Int or None
+        @param cycle: If set, the combinations are repeated until
+                      @max_combinations is reached
+        @type  cycle: Bool
+
+        @return: None
+        @rtype : None
+
+        """
+        super().__init__(fuzzable, max_combinations, cycle=cycle)
+        self._rows = get_covering_array(tuple(self._radixes), strength, seed, max_combinations)
+        if cycle and self._rows:
+            self._size = max_combinations
+        else:
+            self._size = min(len(self._rows), max_combinations)
+
+    @property
+    def product_len(self):
+        """ The number of distinct combinations, i.e. rows of the covering array """
+        return len(self._rows)
+
+    def _decode(self, combination_id):
+        return self._rows[combination_id % len(self._rows)]
+
+    def iter_from(self, start):
+        return (self[combination_id] for combination_id in range(start, self._size))
+
+
+@functools.lru_cache(maxsize=256)
+def get_sampled_combination_ids(num_combinations, num_samples, seed):
+    """ Draws distinct combination ids uniformly at random.
+
+    @param num_combinations: The number of combinations to draw from
+    @type  num_combinations: Int
+    @param num_samples: The number of ids to draw
+    @type  num_samples: Int
+    @param seed: The seed of the random number generator
+    @type  seed: Int
+
+    @return: The ids, in the order they were drawn
+    @rtype : Tuple(Int)
+
+    """
+    num_samples = min(num_samples, num_combinations)
+    random = Random(seed)
+    if num_combinations <= 2 * num_samples:
+        # Most of the combinations are drawn, so shuffle them instead
+        return tuple(random.sample(range(num_combinations), num_samples))
+    # The space may be too large for a bitmap of the drawn ids, but there are few of them
+    drawn = set()
+    ids = []
+    while len(ids) < num_samples:
+        combination_id = random.randrange(num_combinations)
+        if combination_id not in drawn:
+            drawn.add(combination_id)
+            ids.append(combination_id)
+    return tuple(ids)
+
+
+class SampledCombinationSpace(CombinationSpace):
+    """ Combinations of a request schema drawn uniformly from the product of
+    its fuzzable lists, so that a small max_combinations still tests values
+    from the whole space instead of its first lexicographic combinations.
+
+    Combinations are numbered in the order they were drawn.
+    """
+
+    def __init__(self, fuzzable, max_combinations, seed, cycle=False):
+        """ Initializes the combination space.
+
+        @param fuzzable: The candidate values of each request block
+        @type  fuzzable: List[List]
+        @param max_combinations: The maximum number of combinations
+        @type  max_combinations: Int
+        @param seed: The seed used to draw the combinations
+        @type  seed: Int
+        @param cycle: If set, the combinations are repeated until
+                      @max_combinations is reached
+        @type  cycle: Bool
+
+        @return: None
+        @rtype : None
+
+        """
+        super().__init__(fuzzable, max_combinations, cycle=cycle)
+        self._ids = get_sampled_combination_ids(self._product_len, max_combinations, seed)
+        if cycle and self._ids:
+            self._size = max_combinations
+        else:
+            self._size = len(self._ids)
+
+    @property
+    def product_len(self):
+        """ The number of distinct combinations that were drawn """
+        return len(self._ids)
+
+    def _decode(self, combination_id):
+        return super()._decode(self._ids[combination_id % len(self._ids)])
+
+    def iter_from(self, start):
+        return (self[combination_id] for combination_id in range(start, self._size))
+
+
+def get_combination_space(fuzzable, max_combinations, cycle=False):
+    """ Returns the combination space of a request schema for the
+    combination_strategy setting.
+
+    @param fuzzable: The candidate values of each request block
+    @type  fuzzable: List[List]
+    @param max_combinations: The maximum number of combinations
+    @type  max_combinations: Int
+    @param cycle: If set, the combinations are repeated until @max_combinations is reached
+    @type  cycle: Bool
+
+    @return: The combination space
+    @rtype : CombinationSpace
+
+    """
+    strategy, arg = parse_combination_strategy(Settings().combination_strategy)
+    if strategy == 't-wise':
+        return CoveringArraySpace(fuzzable, max_combinations, arg, cycle=cycle)
+    if strategy == 'random':
+        return CoveringArraySpace(fuzzable, max_combinations, 2, seed=arg, cycle=cycle)
+    if strategy == 'sample':
+        return SampledCombinationSpace(fuzzable, max_combinations, Settings().random_seed, cycle=cycle)
+    return CombinationSpace(fuzzable, max_combinations, cycle=cycle)
+
+
+class RenderPlan(object):
+    """ The per-template work of rendering a request schema, computed once so
+    that rendering each combination only touches the blocks that need it.
+    """
+
+    # Dynamic primitives that get a fresh value every time they are rendered
+    DYNAMIC_PRIMITIVES = [primitives.FUZZABLE_UUID4,
+                          primitives.CUSTOM_PAYLOAD_UUID4_SUFFIX,
+                          primitives.REFRESHABLE_AUTHENTICATION_TOKEN]
+    # Primitives whose values are used as-is in the path and query
+    NOT_URL_ENCODED = [primitives.STATIC_STRING,
+                       primitives.REFRESHABLE_AUTHENTICATION_TOKEN,
+                       primitives.CUSTOM_PAYLOAD,
+                       primitives.CUSTOM_PAYLOAD_HEADER,
+                       primitives.CUSTOM_PAYLOAD_QUERY,
+                       primitives.CUSTOM_PAYLOAD_UUID4_SUFFIX]
+
+    def __init__(self, req, writer_variables):
+        """ Compiles the rendering plan of a request schema.
+
+        @param req: The request schema
+        @type  req: Request
+        @param writer_variables: The (writer variable, is quoted) pair of each
+                                 request block, as returned by init_fuzzable_values
+        @type  writer_variables: List[Tuple(Str, Bool)]
+
+        @return: None
+        @rtype : None
+
+        """
+        definition = req.definition
+        # The plan is only valid for this exact definition
+        self.definition = req._definition
+        self.fuzzable_blocks = []
+        self.dynamic_blocks = []
+        for idx, request_block in enumerate(definition):
+            if primitives.CandidateValuesPool.is_custom_fuzzable(request_block[0]):
+                self.fuzzable_blocks.append(idx)
+            if request_block[0] in RenderPlan.DYNAMIC_PRIMITIVES:
+                self.dynamic_blocks.append(idx)
+
+        self.writer_blocks = [(idx, writer_variable, writer_is_quoted)
+                              for idx, (writer_variable, writer_is_quoted) in enumerate(writer_variables)
+                              if writer_variable is not None]
+
+        # Encode the path and query parameters, except custom payloads which are expected
+        # to be used exactly as-is
+        url_encode_start, url_encode_end = req.get_path_and_query_start_end()
+        self.url_encoded_blocks = [idx for idx in range(url_encode_start, url_encode_end)
+                                   if definition[idx][0] not in RenderPlan.NOT_URL_ENCODED]
+
+    def encode_url_values(self, fuzzable, precompute=True):
+        """ Returns the URL-encoded form of the candidate values of the
+        path and query blocks.
+
+        @param fuzzable: The candidate values of each request block
+        @type  fuzzable: List[List]
+        @param precompute: If False, no values are encoded ahead of time
+        @type  precompute: Bool
+
+        @return: For each URL-encoded block, the encoded form of each candidate value.
+                 Values that are only known at render time, e.g. from dynamic
+                 primitives and value generators, are not included.
+        @rtype : Dict[Int, Dict[Str, Str]]
+
+        """
+        return {idx: {value: url_quote_plus(value, safe="/") for value in fuzzable[idx]
+                      if precompute and isinstance(value, str)}
+                for idx in self.url_encoded_blocks}
+
+    @staticmethod
+    def get(req, writer_variables):
+        """ Returns the rendering plan of a request schema, compiling it if the
+        schema does not have an up-to-date one.
+
+        @param req: The request schema
+        @type  req: Request
+        @param writer_variables: The writer variables of the request blocks
+        @type  writer_variables: List[Tuple(Str, Bool)]
+
+        @return: The rendering plan
+        @rtype : RenderPlan
+
+        """
+        plan = req._render_plan
+        if plan is None or plan.definition is not req._definition:
+            plan = RenderPlan(req, writer_variables)
+            req._render_plan = plan
+        return plan
+
+
+class SchemaCombination(object):
+    """ One schema combination of a request, with the fuzzable values that
+    were last initialized from it.
+    """
+    __slots__ = ['request', 'is_example', 'fuzzable_values']
+
+    def __init__(self, request, is_example):
+        # None if the schema is the rendered request itself
+        self.request = request
+        self.is_example = is_example
+        # (values key, (fuzzable, writer_variables, tracked_parameters, placeholder_blocks, url_encodings))
+        self.fuzzable_values = None
+
+
+class SchemaCombinations(object):
+    """ The schema combinations of a request.
+
+    Schema combinations are generated lazily, the first time they are
+    rendered, and kept for later renderings of the request and its copies.
+    The number of schema combinations cached across all requests is bounded:
+    when it exceeds max_cached_schema_combinations, the caches of the least
+    recently rendered requests are cleared.
+    """
+    # SchemaCombinations -> number of cached schema combinations, least recently used first
+    __lru = OrderedDict()
+    __lru_size = 0
+    __lru_lock = threading.Lock()
+    # All the schema combinations caches, whose locks are re-created in worker processes
+    __instances = weakref.WeakSet()
+
+    def __init__(self, request):
+        """ Initializes the (empty) schema combinations cache of a request.
+
+        @param request: The request
+        @type  request: Request
+
+        @return: None
+        @rtype : None
+
+        """
+        self._request = request
+        # The combinations are only valid for this definition
+        self.definition = request._definition
+        self._settings = Settings()
+        self._lock = threading.Lock()
+        self._schemas = []
+        self._generator = None
+        self._exhausted = False
+        SchemaCombinations.__instances.add(self)
+
+    def __deepcopy__(self, memo):
+        # Copies of a request share its schema combinations while their definitions are equal
+        return self
+
+    def __getstate__(self):
+        # Do not pickle the schema combinations, they are generated again when needed
+        return {}
+
+    def __setstate__(self, state):
+        self._request = None
+        self.definition = None
+        self._lock = threading.Lock()
+
+    def is_valid_for(self, request):
+        """ Returns whether the schema combinations can be used to render a request
+
+        @param request: The request to render
+        @type  request: Request
+
+        @return: True if the request's definition and the settings did not change
+        @rtype : Bool
+
+        """
+        if self.definition is None or self._settings is not Settings():
+            return False
+        return self.definition is request._definition or self.definition == request._definition
+
+    def invalidate(self):
+        """ Invalidates the schema combinations after the request's definition
+        was modified in place.
+
+        @return: None
+        @rtype : None
+
+        """
+        self.definition = None
+        self.clear()
+
+    def clear(self):
+        """ Drops the cached schema combinations.
+
+        @return: None
+        @rtype : None
+
+        """
+        with self._lock:
+            self._schemas = []
+            self._generator = None
+            self._exhausted = False
+
+    def get(self, schema_idx):
+        """ Returns a schema combination, generating it if needed.
+
+        @param schema_idx: The index of the schema combination
+        @type  schema_idx: Int
+
+        @return: The schema combination, or None if there are fewer combinations
+        @rtype : SchemaCombination or None
+
+        """
+        with self._lock:
+            if schema_idx < len(self._schemas):
+                return self._schemas[schema_idx]
+            if self._exhausted:
+                return None
+            if self._generator is None:
+                self._generator = itertools.islice(
+                    self._request.get_schema_combinations(
+                        use_grammar_py_schema=Settings().allow_grammar_py_user_update),
+                    Settings().max_schema_combinations)
+            while schema_idx >= len(self._schemas):
+                next_schema = next(self._generator, None)
+                if next_schema is None:
+                    self._exhausted = True
+                    break
+                (req, is_example) = next_schema
+                self._schemas.append(SchemaCombination(None if req is self._request else req, is_example))
+            schema = self._schemas[schema_idx] if schema_idx < len(self._schemas) else None
+            num_schemas = len(self._schemas)
+        SchemaCombinations._update_lru(self, num_schemas)
+        return schema
+
+    @staticmethod
+    def touch(schema_combinations):
+        """ Marks the schema combinations of a request as the most recently used """
+        with SchemaCombinations.__lru_lock:
+            if schema_combinations in SchemaCombinations.__lru:
+                SchemaCombinations.__lru.move_to_end(schema_combinations)
+
+    @staticmethod
+    def _update_lru(schema_combinations, num_schemas):
+        to_clear = []
+        with SchemaCombinations.__lru_lock:
+            lru = SchemaCombinations.__lru
+            SchemaCombinations.__lru_size += num_schemas - lru.pop(schema_combinations, 0)
+            lru[schema_combinations] = num_schemas
+            while SchemaCombinations.__lru_size > Settings().max_cached_schema_combinations and len(lru) > 1:
+                evicted, evicted_size = lru.popitem(last=False)
+                SchemaCombinations.__lru_size -= evicted_size
+                to_clear.append(evicted)
+        for evicted in to_clear:
+            evicted.clear()
+
+    @staticmethod
+    def DetachLocks():
+        """ Re-creates the locks inherited by a worker process, which may have
+        been held by another thread of the main process, e.g. the garbage
+        collector rendering a destructor, when the worker was forked.  The
+        caches that were being generated at that time are dropped.
+
+        @return: None
+        @rtype : None
+
+        """
+        SchemaCombinations.__lru_lock = threading.Lock()
+        for schema_combinations in list(SchemaCombinations.__instances):
+            if schema_combinations._lock.locked():
+                schema_combinations._lock = threading.Lock()
+                schema_combinations.clear()
+
+    @staticmethod
+    def TEST_ClearCache():
+        with SchemaCombinations.__lru_lock:
+            SchemaCombinations.__lru = OrderedDict()
+            SchemaCombinations.__lru_size = 0
+
+
+class BaseRequest(object):
+    """ The behavior of a request, shared by Request and SharedRequest.  It
+    declares no attributes, so that SharedRequest can be slotted. """
+    __slots__ = ()
 
     def __init__(self, definition=[], requestId=None):
         """ Initialize a request object by assigning a definition and
@@ -306,6 +912,8 @@ class Request(object):
         self._rendered_values_cache = RenderedValuesCache()
         self._last_rendered_schema_request = None
         self._is_resource_generator = None
+        self._render_plan = None
+        self._schema_combinations = None
 
         self._random = Random(Settings().random_seed)
 
@@ -691,6 +1299,7 @@ class Request(object):
                 # been removed from the definition.
                 if var_name in self._consumes:
                     self._consumes.remove(var_name)
+        self._invalidate_render_caches()
         self._create_once_requests += rendered_sequence.sequence.sent_request_data_list
 
     def get_host_index(self):
@@ -725,6 +1334,96 @@ class Request(object):
                 pass
         return -1
 
+    def _invalidate_render_caches(self):
+        """ Invalidates the rendering caches that are derived from the request's
+        definition, after the definition was modified in place.  Copies of the
+        request that share the definition see the invalidation as well.
+
+        @return: None
+        @rtype : None
+
+        """
+        if self._render_plan is not None:
+            self._render_plan.definition = None
+            self._render_plan = None
+        if self._schema_combinations is not None:
+            self._schema_combinations.invalidate()
+            self._schema_combinations = None
+
+    def _get_schema_combinations(self):
+        """ Lazily iterates over the cached schema combinations of the request.
+
+        @return: A generator of the schema combinations
+        @rtype : Generator(SchemaCombination)
+
+        """
+        schema_combinations = self._schema_combinations
+        if schema_combinations is None or not schema_combinations.is_valid_for(self):
+            schema_combinations = SchemaCombinations(self)
+            self._schema_combinations = schema_combinations
+        else:
+            SchemaCombinations.touch(schema_combinations)
+        for schema_idx in itertools.count():
+            schema = schema_combinations.get(schema_idx)
+            if schema is None:
+                return
+            yield schema
+
+    def _init_schema_fuzzable_values(self, schema, req, candidate_values_pool, preprocessing):
+        """ Returns the fuzzable values of a schema combination, which are cached
+        until the candidate values or the settings change.
+
+        @param schema: The schema combination
+        @type  schema: SchemaCombination
+        @param req: The request of the schema combination
+        @type  req: Request
+        @param candidate_values_pool: The pool of values for primitive types.
+        @type  candidate_values_pool: CandidateValuesPool
+        @param preprocessing: Set to True if this rendering is happening during preprocessing
+        @type  preprocessing: Bool
+
+        @return: The fuzzable values, writer variables and tracked parameters (see init_fuzzable_values),
+                 the indexes of the blocks that may render dependency placeholders
+                 and the URL-encoded candidate values (see RenderPlan.encode_url_values)
+        @rtype : Tuple(List, List, Dict, List[Int], Dict)
+
+        """
+        def init_values(cached=True):
+            fuzzable, writer_variables, tracked_parameters = \
+                self.init_fuzzable_values(req.definition, candidate_values_pool, preprocessing)
+            plan = RenderPlan.get(req, writer_variables)
+            return (fuzzable, writer_variables, tracked_parameters,
+                    dependencies.get_placeholder_blocks(fuzzable),
+                    plan.encode_url_values(fuzzable, precompute=cached))
+
+        if Settings().fuzzing_mode == 'random-walk' and not preprocessing:
+            # The values are shuffled differently every time, and only a few
+            # of them are rendered, so they are encoded as they are rendered
+            return init_values(cached=False)
+        values_key = (candidate_values_pool, candidate_values_pool.values_version, Settings())
+        if schema.fuzzable_values is None or schema.fuzzable_values[0] != values_key:
+            schema.fuzzable_values = (values_key, init_values())
+        return schema.fuzzable_values[1]
+
+    def prepare_render_caches(self, candidate_values_pool):
+        """ Generates the cached schema combinations of the request, with their
+        fuzzable values and rendering plans, before the request is rendered.
+        Worker processes forked afterwards inherit the caches, instead of
+        each generating them again.
+
+        @param candidate_values_pool: The pool of values for primitive types.
+        @type  candidate_values_pool: CandidateValuesPool
+
+        @return: None
+        @rtype : None
+
+        """
+        if Settings().in_scenario_replay_mode() or Settings().fuzzing_mode == 'random-walk':
+            # The fuzzable values are not cached, and few combinations are rendered
+            return
+        for schema in self._get_schema_combinations():
+            self._init_schema_fuzzable_values(schema, schema.request or self, candidate_values_pool, False)
+
     def update_host(self):
         """ Updates the Host field for every request with the one specified in Settings
 
@@ -742,6 +1441,7 @@ class Request(object):
             if header_idx < 0:
                 raise InvalidGrammarException
             self._definition.insert(header_idx, new_host_line)
+        self._invalidate_render_caches()
 
     def update_basepath(self):
         """ Updates the basepath custom payload for every request with the one specified in Settings
@@ -760,6 +1460,7 @@ class Request(object):
             if basepath.endswith("/"):
                 basepath = basepath[:-1]
             self._definition[basepath_idx] = primitives.restler_static_string(basepath)
+            self._invalidate_render_caches()
 
         else:
             # No basepath custom payload in the grammar - this is possible for older grammar versions.
@@ -995,7 +1696,7 @@ class Request(object):
                         get_candidate_values(primitive_type, request_id=self._request_id, tag=field_name, quoted=quoted,
                                              examples=examples)
                     # handle case where custom payload have more than one values
-                    if isinstance(current_fuzzable_values, list):
+                    if isinstance(current_fuzzable_values, (list, tuple)):
                         values = current_fuzzable_values
                     elif primitives.is_value_generator(current_fuzzable_values):
                         values = [(current_fuzzable_values, quoted, writer_variable)]
@@ -1037,6 +1738,8 @@ class Request(object):
                     values = [(values, quoted, writer_variable)]
 
             if Settings().fuzzing_mode == 'random-walk' and not preprocessing:
+                # The candidate values may be shared, so shuffle a copy
+                values = list(values)
                 self._random.shuffle(values)
 
             if len(values) == 0:
@@ -1138,40 +1841,34 @@ class Request(object):
         schema_idx = -1
         if Settings().in_scenario_replay_mode():
             # Just testing the grammar.py schema with replayed payloads, example payloads are not applicable
-            schema_combinations = [(self, False)]
+            schema_combinations = [SchemaCombination(None, False)]
         else:
-
-            schema_combinations = itertools.islice(self.get_schema_combinations(
-                use_grammar_py_schema=Settings().allow_grammar_py_user_update),
-                Settings().max_schema_combinations)
-            logger.write_to_main(f"get_schema_combinations={schema_combinations}", LogSettings().requests)
+            # The schema combinations are generated once and cached
+            schema_combinations = self._get_schema_combinations()
 
         remaining_combinations_count = Settings().max_combinations - skip
 
-        for (req, is_example) in schema_combinations:
+        for schema in schema_combinations:
+            req = schema.request or self
+            is_example = schema.is_example
 
             schema_idx += 1
             parser = None
-            fuzzable_request_blocks = []
-            for idx, request_block in enumerate(req.definition):
-                if primitives.CandidateValuesPool.is_custom_fuzzable(request_block[0]):
-                    logger.write_to_main(f"request_block={request_block}", LogSettings().requests)
-                    fuzzable_request_blocks.append(idx)
-            logger.write_to_main(f"fuzzable_request_blocks={fuzzable_request_blocks}", LogSettings().requests)
             # If request had post_send metadata, register parsers etc.
             if bool(self.metadata) and 'post_send' in self.metadata \
                     and 'parser' in self.metadata['post_send']:
                 parser = self.metadata['post_send']['parser']
 
-            fuzzable, writer_variables, tracked_parameters = self.init_fuzzable_values(req.definition,
-                                                                                       candidate_values_pool,
-                                                                                       preprocessing)
-            # lazy generation of pool for candidate values
-            combinations_pool = itertools.product(*fuzzable)
-            logger.write_to_main(f"fuzzable={fuzzable},\n"
-                                 f"writer_variables={writer_variables},\n"
-                                 f"tracked_parameters={tracked_parameters}\n, combinations_pool={combinations_pool}",
-                                 LogSettings().requests)
+            fuzzable, writer_variables, tracked_parameters, placeholder_blocks, url_encodings = \
+                self._init_schema_fuzzable_values(schema, req, candidate_values_pool, preprocessing)
+            if LogSettings().requests:
+                logger.write_to_main(f"fuzzable={fuzzable},\n"
+                                     f"writer_variables={writer_variables},\n"
+                                     f"tracked_parameters={tracked_parameters}",
+                                     LogSettings().requests)
+            plan = RenderPlan.get(req, writer_variables)
+            fuzzable_request_blocks = plan.fuzzable_blocks
+            logger.write_to_main(f"fuzzable_request_blocks={fuzzable_request_blocks}", LogSettings().requests)
 
             # Because of the way 'render_iter' is implemented, dynamic value generators must
             # be cached and re-used.
@@ -1181,41 +1878,44 @@ class Request(object):
                                                                  value_gen_tracker)
                 self._rendered_values_cache.value_generators[schema_idx] = value_generators
             value_generators = self._rendered_values_cache.value_generators[schema_idx]
-
-            combinations_pool_len = None
-            if value_generators:
-                # Calculate the number of static combinations.  This is needed later to
-                # keep fetching dynamically generated values for every entry in the
-                # combination pool
-                combinations_pool_len = functools.reduce(operator.mul, map(len, fuzzable), 1)
-                # If there is at least one value generator, it may generate an
-                # infinite number of values.`
-                # Keep plugging in values from the static combinations pool while dynamic
-                # values are available.
-                combinations_pool = itertools.cycle(combinations_pool)
+            # The blocks whose values must be generated for every rendering
+            dynamic_blocks = sorted(set(plan.dynamic_blocks).union(value_generators))
+            # The blocks whose rendered values may contain dependency placeholders
+            placeholder_blocks = sorted(set(placeholder_blocks).union(dynamic_blocks))
+
+            # If there is at least one value generator, it may generate an
+            # infinite number of values.
+            # Keep plugging in values from the static combinations while dynamic
+            # values are available.
             # If this is an example payload, only use the first combination.  This contains the original example
             # values.
             max_combinations = 1 if is_example else Settings().max_combinations
-            combinations_pool = itertools.islice(combinations_pool, max_combinations)
+            if is_example:
+                combination_space = CombinationSpace(fuzzable, max_combinations)
+            else:
+                combination_space = get_combination_space(fuzzable, max_combinations, cycle=bool(value_generators))
+            # The number of static combinations.  This is needed later to
+            # keep fetching dynamically generated values for every entry in the
+            # combination pool
+            combinations_pool_len = combination_space.product_len
 
             # skip combinations, if asked to
-            while next_combination < skip:
-                try:
-                    next(combinations_pool)
-                    next_combination = next_combination + 1
-                except StopIteration:
-                    break
-                if next_combination == skip:
-                    break
-            if next_combination < skip:
+            if skip - next_combination >= len(combination_space):
+                next_combination += len(combination_space)
                 continue  # go to the next schema to find combination
+            combinations_pool = combination_space.iter_from(max(0, skip - next_combination))
+            next_combination = max(next_combination, skip)
+
+            # Only format the values for the log if it is enabled
+            log_requests = LogSettings().requests
 
             # for each combination's values render dynamic primitives and resolve
             # dependent variables
             for ind, values in enumerate(combinations_pool):
                 if remaining_combinations_count == 0:
                     break
-                logger.write_to_main(f"values={values}", LogSettings().requests)
+                if log_requests:
+                    logger.write_to_main(f"values={values}", log_requests)
                 values = list(values)
 
                 # Use saved value generators.
@@ -1229,7 +1929,8 @@ class Request(object):
                     for idx, val in prev_rendered_values.items():
                         values[idx] = val
 
-                values = request_utilities.resolve_dynamic_primitives(values, candidate_values_pool)
+                values = request_utilities.resolve_dynamic_primitives(values, candidate_values_pool,
+                                                                      indexes=dynamic_blocks)
                 # Get the replay blocks
 
                 # This must be done after resolving dynamic primitives, because concrete values generated
@@ -1245,48 +1946,40 @@ class Request(object):
                         break
 
                 dynamic_object_variables_to_update = {}
-                for val_idx, val in enumerate(values):
-                    (writer_variable, writer_is_quoted) = writer_variables[val_idx]
-                    if writer_variable is not None:
-                        # Save the unquoted value.
-                        # It will be quoted again at the time it is used, if needed
-                        if writer_is_quoted:
-                            val = val[1:-1]
-                        dynamic_object_variables_to_update[writer_variable] = val
+                for val_idx, writer_variable, writer_is_quoted in plan.writer_blocks:
+                    val = values[val_idx]
+                    # Save the unquoted value.
+                    # It will be quoted again at the time it is used, if needed
+                    if writer_is_quoted:
+                        val = val[1:-1]
+                    dynamic_object_variables_to_update[writer_variable] = val
 
                 tracked_parameter_values = {}
                 for (k, idx_list) in tracked_parameters.items():
-                    tracked_parameter_values[k] = []
-                    for idx in idx_list:
-                        tracked_parameter_values[k].append(values[idx])
+                    tracked_parameter_values[k] = [values[idx] for idx in idx_list]
 
                 # Cache the current rendering.
                 # Only fuzzable values need to be cached.
-                cached_values = {}
-                for idx in fuzzable_request_blocks:
-                    cached_values[idx] = values[idx]
-                if cached_values:
+                if fuzzable_request_blocks:
+                    cached_values = {idx: values[idx] for idx in fuzzable_request_blocks}
                     self._rendered_values_cache.add_fuzzable_values(next_combination, cached_values)
-                logger.write_to_main(f"values={values}", LogSettings().requests)
-                # Encode the path and query parameters, except custom payloads which are expected
-                # to be used exactly as-is
-                url_encode_start, url_encode_end = req.get_path_and_query_start_end()
-                for url_idx in range(url_encode_start, url_encode_end):
-                    # Only encode the parameter values, not static strings
-                    if req.definition[url_idx][0] not in [primitives.STATIC_STRING,
-                                                          primitives.REFRESHABLE_AUTHENTICATION_TOKEN,
-                                                          primitives.CUSTOM_PAYLOAD,
-                                                          primitives.CUSTOM_PAYLOAD_HEADER,
-                                                          primitives.CUSTOM_PAYLOAD_QUERY,
-                                                          primitives.CUSTOM_PAYLOAD_UUID4_SUFFIX]:
-                        values[url_idx] = url_quote_plus(values[url_idx], safe="/")
-                    logger.write_to_main(f"values[url_idx]={values[url_idx]}", LogSettings().requests)
+                if log_requests:
+                    logger.write_to_main(f"values={values}", log_requests)
+                # Encode the path and query parameters (but not static strings or custom payloads)
+                for url_idx in plan.url_encoded_blocks:
+                    value = values[url_idx]
+                    encoded_value = url_encodings[url_idx].get(value)
+                    if encoded_value is None:
+                        encoded_value = url_quote_plus(value, safe="/")
+                    values[url_idx] = encoded_value
 
                 if value_list:
                     rendered_data = values
                 else:
                     try:
-                        rendered_data = "".join(values)
+                        # Record the positions of the dependency placeholders, so that
+                        # they can be resolved without splitting the rendered request
+                        rendered_data = dependencies.split_rendered_values(values, placeholder_blocks)
                     except Exception as err:
                         debug_values = []
                         for v in values:
@@ -1812,6 +2505,170 @@ class Request(object):
         return -1, -1
 
 
+class Request(BaseRequest):
+    """ Request Class. """
+
+    @property
+    def memory_size(self):
+        """ The memory used by this request object, not including the objects
+        that it refers to, which are shared with its copies.
+
+        @return: The memory size, in bytes
+        @rtype : Int
+
+        """
+        return sys.getsizeof(self) + sys.getsizeof(self.__dict__)
+
+
+class SharedRequest(BaseRequest):
+    """ A copy of a request that shares the state of the original request,
+    and only holds its own combination id and the attributes that are set on
+    the copy.  Sequences extend the same requests many times, and these copies
+    are slotted, so they are much smaller than copying the whole request.
+
+    Unlike a shallow copy, attributes that are later set on the original
+    request are also seen by the copy, unless they were set on the copy.
+    The caches derived from the definition are kept by the original request,
+    so that all of its copies use them.
+
+    Deep copies and pickles of a copy refer to the same original request,
+    rather than copying it.  A pickled copy of a request of the grammar
+    refers to it by its position in the grammar's request collection.
+
+    """
+    # The attributes set on a copy while it is rendered.  Any other attribute
+    # set on the copy is kept in _attributes, which is only created then.
+    __slots__ = ('_template', '_attributes', '_current_combination_id',
+                 '_total_feasible_combinations', '_last_rendered_schema_request',
+                 '_rendered_values_cache')
+    # The caches that are set on the original request, unless the copy has its own definition
+    DEFINITION_CACHES = ('_schema_combinations', '_render_plan')
+
+    def __init__(self, template):
+        """ Creates a copy of a request, at its first combination.
+
+        @param template: The request to copy
+        @type  template: Request
+
+        @return: None
+        @rtype : None
+
+        """
+        self._template = template
+        self._attributes = None
+        self._current_combination_id = 0
+
+    @property
+    def memory_size(self):
+        """ The memory used by this copy, not including the objects that it
+        refers to, which are shared with the original request.
+
+        @return: The memory size, in bytes
+        @rtype : Int
+
+        """
+        size = sys.getsizeof(self)
+        if self._attributes is not None:
+            size += sys.getsizeof(self._attributes)
+        return size
+
+    def __getattr__(self, name):
+        # Only called for the attributes that were not set on the copy.
+        # Special attributes, such as __dict__, are not read from the original.
+        if name in ('_template', '_attributes') or name.startswith('__'):
+            raise AttributeError(name)
+        attributes = self._attributes
+        if attributes is not None and name in attributes:
+            return attributes[name]
+        return getattr(self._template, name)
+
+    def __setattr__(self, name, value):
+        if name in SharedRequest.__slots__:
+            object.__setattr__(self, name, value)
+        elif name in SharedRequest.DEFINITION_CACHES and \
+                (self._attributes is None or '_definition' not in self._attributes):
+            setattr(self._template, name, value)
+        else:
+            if self._attributes is None:
+                self._attributes = {}
+            self._attributes[name] = value
+
+    def __copy__(self):
+        """ The copy does not share the attributes set on this copy """
+        request_copy = SharedRequest(self._template)
+        for name in SharedRequest.__slots__[2:]:
+            try:
+                object.__setattr__(request_copy, name, object.__getattribute__(self, name))
+            except AttributeError:
+                # Not set on this copy
+                pass
+        if self._attributes is not None:
+            request_copy._attributes = dict(self._attributes)
+        return request_copy
+
+    def __deepcopy__(self, memo):
+        """ The copy refers to the same original request, and has deep copies
+        of the attributes set on this copy """
+        template, state = self._get_state()
+        request_copy = SharedRequest(template)
+        memo[id(self)] = request_copy
+        request_copy._set_state(copy.deepcopy(state, memo))
+        return request_copy
+
+    def __reduce__(self):
+        """ Pickles a request of the grammar by its position in the request
+        collection, which is the same in the worker processes of the fuzzing
+        run, instead of pickling the whole request """
+        template, state = self._get_state()
+        try:
+            template = GrammarRequestCollection()._requests.index(template)
+        except Exception:
+            # Not a request of the grammar, or the grammar is not loaded
+            pass
+        return _unpickle_shared_request, (template, state)
+
+    def _get_state(self):
+        """ Returns the original request and the attributes set on this copy,
+        including those set on the copies that it was made from.
+
+        @return: The original request, and the attributes set on the copy
+        @rtype : Tuple(Request, Dict)
+
+        """
+        state = {}
+        request = self
+        while isinstance(request, SharedRequest):
+            for name in SharedRequest.__slots__[2:]:
+                if name not in state:
+                    try:
+                        state[name] = object.__getattribute__(request, name)
+                    except AttributeError:
+                        pass
+            for name, value in (request._attributes or {}).items():
+                state.setdefault(name, value)
+            request = request._template
+        return request, state
+
+    def _set_state(self, state):
+        """ Sets the attributes of the copy, see _get_state """
+        for name, value in state.items():
+            if name in SharedRequest.__slots__:
+                object.__setattr__(self, name, value)
+            else:
+                if self._attributes is None:
+                    self._attributes = {}
+                self._attributes[name] = value
+
+
+def _unpickle_shared_request(template, state):
+    """ Re-creates a pickled SharedRequest, see SharedRequest.__reduce__ """
+    if isinstance(template, int):
+        template = GrammarRequestCollection()._requests[template]
+    request = SharedRequest(template)
+    request._set_state(state)
+    return request
+
+
 def GrammarRequestCollection():
     """ Accessor for the global request collection singleton """
     return GlobalRequestCollection.Instance()._req_collection
@@ -1,7 +1,9 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
+import threading
 import time
 
+from collections import OrderedDict
 from enum import Enum
 class RetryStrategy(Enum):
     """ Enum of retry strategies """
@@ -36,19 +38,136 @@ class RetryHandler:
         else:
             return False
 
-    def wait_for_next_retry(self):
-        """ Sleep until next retry should be attempted
-        @return: None
-        @rtype : None
+    @property
+    def num_retries(self):
+        return self.__num_retries
+
+    def next_delay(self, retry_after=None):
+        """ Counts the next retry and returns the time to wait before it,
+        without waiting.
+        @param retry_after: The delay requested by the server (e.g. in a
+                            Retry-After header), which replaces the delay of
+                            the strategy, up to max_delay
+        @type  retry_after: Float or None
+        @return: The time, in seconds, to wait before the next retry
+        @rtype : Float
         """
         if not self.can_retry():
             raise RetryLimitExceeded("Retry limit exceeded")
 
-        if self.strategy == RetryStrategy.LINEAR:
-            time.sleep(self.delay)
+        if retry_after is not None:
+            delay = min(self.max_delay, retry_after)
+        elif self.strategy == RetryStrategy.LINEAR:
+            delay = self.delay
         elif self.strategy == RetryStrategy.EXPONENTIAL:
-            sleep = min(self.max_delay, self.delay * 2 ** self.__num_retries)
-            time.sleep(sleep)
+            delay = min(self.max_delay, self.delay * 2 ** self.__num_retries)
         else:
             raise ValueError(f"Unknown retry strategy: {self.strategy}")
         self.__num_retries += 1
+        return delay
+
+    def wait_for_next_retry(self, retry_after=None):
+        """ Sleep until next retry should be attempted
+        @param retry_after: The delay requested by the server, if any
+        @type  retry_after: Float or None
+        @return: None
+        @rtype : None
+        """
+        time.sleep(self.next_delay(retry_after))
+
+
+class RetryStats(object):
+    """ Per-endpoint counts of the requests that were re-tried """
+    __instance = None
+    __instance_lock = threading.Lock()
+
+    @staticmethod
+    def Instance():
+        """ Singleton's instance accessor
+
+        @return RetryStats instance
+        @rtype  RetryStats
+
+        """
+        if RetryStats.__instance is None:
+            with RetryStats.__instance_lock:
+                if RetryStats.__instance is None:
+                    RetryStats.__instance = RetryStats()
+        return RetryStats.__instance
+
+    @staticmethod
+    def DetachInstance():
+        """ Drops the instance inherited by a worker process, whose lock may
+        have been held by another thread of the main process when the worker
+        was forked.
+
+        @return: None
+        @rtype : None
+
+        """
+        RetryStats.__instance = None
+        RetryStats.__instance_lock = threading.Lock()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # endpoint -> [number of retries, total wait time in seconds]
+        self._endpoints = {}
+
+    def record(self, endpoint, wait_sec):
+        """ Counts a retry of a request to the endpoint
+
+        @param endpoint: The endpoint of the request
+        @type  endpoint: Str
+        @param wait_sec: The time, in seconds, waited before the retry
+        @type  wait_sec: Float
+
+        @return: None
+        @rtype : None
+
+        """
+        with self._lock:
+            counts = self._endpoints.setdefault(endpoint, [0, 0.0])
+            counts[0] += 1
+            counts[1] += wait_sec
+
+    def pop_counts(self):
+        """ Returns the counts recorded so far, and resets them.  Used by the
+        worker processes of the fuzzing run to return their counts.
+
+        @return: The number of retries and total wait time of each endpoint
+        @rtype : Dict(Str, List)
+
+        """
+        with self._lock:
+            counts, self._endpoints = self._endpoints, {}
+        return counts
+
+    def merge(self, counts):
+        """ Adds the counts of a worker process of the fuzzing run
+
+        @param counts: The counts, see pop_counts
+        @type  counts: Dict(Str, List)
+
+        @return: None
+        @rtype : None
+
+        """
+        with self._lock:
+            for endpoint, (retries, wait_sec) in counts.items():
+                merged = self._endpoints.setdefault(endpoint, [0, 0.0])
+                merged[0] += retries
+                merged[1] += wait_sec
+
+    def to_dict(self):
+        """ Returns the counts in the format of the testing summary
+
+        @return: The retries and wait time of each endpoint
+        @rtype : OrderedDict
+
+        """
+        stats = OrderedDict()
+        with self._lock:
+            for endpoint in sorted(self._endpoints):
+                retries, wait_sec = self._endpoints[endpoint]
+                stats[endpoint] = OrderedDict([('retries', retries), ('wait_sec', round(wait_sec, 3))])
+        return stats
@@ -0,0 +1,349 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+""" Dynamic scheduling of the sequences rendered by parallel fuzzing jobs. """
+from __future__ import print_function
+import itertools
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from restler.engine.core import fuzzing_monitor
+from restler.engine.core import renderings_monitor
+from restler.engine.core.fuzzing_monitor import Monitor
+
+# Priority of the sentinel that stops a worker, after all the queued sequences
+STOP_PRIORITY = (float('inf'),)
+
+# The job rendered by the current worker thread, see is_rendering_ahead
+_thread_state = threading.local()
+
+
+def is_rendering_ahead():
+    """ Returns whether the current thread renders a sequence ahead of its
+    generation that is not committed to it yet.  The checkers are not applied
+    to such a sequence, since the state they keep across sequences (e.g. the
+    requests already checked) would not be dropped if it is cancelled.
+
+    @return: True if the sequence rendered by the current thread is not committed
+    @rtype : Bool
+
+    """
+    job = getattr(_thread_state, 'job', None)
+    return job is not None and not job.committed
+
+
+class SchedulerStats(object):
+    """ Busy and idle time of the fuzzing jobs """
+    __instance = None
+    __instance_lock = threading.Lock()
+
+    @staticmethod
+    def Instance():
+        """ Singleton's instance accessor
+
+        @return SchedulerStats instance
+        @rtype  SchedulerStats
+
+        """
+        if SchedulerStats.__instance is None:
+            with SchedulerStats.__instance_lock:
+                if SchedulerStats.__instance is None:
+                    SchedulerStats.__instance = SchedulerStats()
+        return SchedulerStats.__instance
+
+    @staticmethod
+    def TEST_DeleteInstance():
+        SchedulerStats.__instance = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.workers = 0
+        self.sequences = 0
+        self.rendered_ahead = 0
+        self.busy_sec = 0.0
+        self.idle_sec = 0.0
+
+    def record(self, busy_sec, idle_sec, rendered_ahead):
+        """ Records the rendering of a sequence by a worker
+
+        @param busy_sec: The time, in seconds, spent rendering the sequence
+        @type  busy_sec: Float
+        @param idle_sec: The time, in seconds, the worker waited for the sequence
+        @type  idle_sec: Float
+        @param rendered_ahead: Whether the sequence was rendered ahead of its generation
+        @type  rendered_ahead: Bool
+
+        @return: None
+        @rtype : None
+
+        """
+        with self._lock:
+            self.sequences += 1
+            if rendered_ahead:
+                self.rendered_ahead += 1
+            self.busy_sec += busy_sec
+            self.idle_sec += idle_sec
+
+    def to_dict(self):
+        """ Returns the stats in the format of the testing summary
+
+        @return: The stats
+        @rtype : OrderedDict
+
+        """
+        with self._lock:
+            stats = OrderedDict()
+            stats['workers'] = self.workers
+            stats['sequences'] = self.sequences
+            stats['rendered_ahead'] = self.rendered_ahead
+            stats['busy_sec'] = round(self.busy_sec, 3)
+            stats['idle_sec'] = round(self.idle_sec, 3)
+            total_sec = self.busy_sec + self.idle_sec
+            stats['idle_fraction'] = round(self.idle_sec / total_sec, 3) if total_sec else 0.0
+            return stats
+
+
+class _Job(object):
+    """ The rendering of a sequence by a worker """
+    def __init__(self, render, sequence, index, generation, key, rendering_generation=None):
+        self.render = render
+        self.sequence = sequence
+        self.index = index
+        self.generation = generation
+        self.key = key
+        # The generation of the renderings monitor in which the renderings are
+        # registered, if the sequence is rendered ahead of its generation
+        self.rendering_generation = rendering_generation
+        # A sequence rendered ahead is only committed to its generation if it
+        # matches the next generation.  Until then, the updates of the monitor
+        # and bug buckets made while rendering it are deferred.
+        self.committed = rendering_generation is None
+        self.deferred_updates = None if self.committed else []
+        self.valid_renderings = None
+        self.error = None
+        self.rendered = False
+        self.extended = False
+        self.cancelled = False
+        self.done = threading.Event()
+
+    def apply_updates(self, updates):
+        """ Applies the deferred updates of the job, once it is committed.
+
+        @param updates: The updates taken from the job
+        @type  updates: List[Func]
+
+        @return: None
+        @rtype : None
+
+        """
+        try:
+            for update in updates:
+                update()
+        except Exception as error:
+            self.error = self.error or error
+
+
+class SequenceScheduler(object):
+    """ Renders sequences on worker threads that take the next sequence from
+    a shared queue, so that slow sequences do not hold back the other workers.
+
+    When rendering ahead is enabled, the extensions of each valid rendering are
+    queued as soon as the rendering is found, behind the sequences of the
+    current generation, so that idle workers start on the next generation
+    while the last sequences of the current one are rendered.  The renderings
+    of these sequences are registered in their own generation of the renderings
+    monitor, and known invalid renderings are not skipped for them, since the
+    current generation is not complete yet.  Their updates of the monitor and
+    of the bug buckets are only applied if the next generation turns out to be
+    the sequences that were rendered ahead; otherwise they are cancelled.
+    The checkers are only applied once the sequences are committed (see
+    is_rendering_ahead).
+
+    """
+    def __init__(self, num_workers):
+        """ Initializes the scheduler and starts its workers.
+
+        @param num_workers: The number of worker threads
+        @type  num_workers: Int
+
+        @return: None
+        @rtype : None
+
+        """
+        self._queue = queue.PriorityQueue()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._generation = None
+        self._rendering_generation = None
+        self._extend_sequence = None
+        self._max_generation = 0
+        # The jobs of the next generation that were queued ahead, with their keys
+        self._ahead = []
+        self._ahead_index = itertools.count()
+        SchedulerStats.Instance().workers = num_workers
+        self._workers = [threading.Thread(target=self._run, daemon=True) for _ in range(num_workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def enable_rendering_ahead(self, extend_sequence, max_generation):
+        """ Renders the extensions of valid renderings ahead of their generation.
+
+        @param extend_sequence: Returns the extensions of a sequence, along with their
+                                keys, in the order of the next generation
+        @type  extend_sequence: Func(Sequence, int) -> List[Tuple(Tuple, Sequence)]
+        @param max_generation: The last generation of the fuzzing run
+        @type  max_generation: Int
+
+        @return: None
+        @rtype : None
+
+        """
+        self._extend_sequence = extend_sequence
+        self._max_generation = max_generation
+
+    def _submit(self, job):
+        self._queue.put(((job.generation,) + job.key, next(self._counter), job))
+
+    def _extend(self, job, position):
+        """ Queues the extensions of the valid renderings of a job.
+
+        @param job: A rendered job of the current generation
+        @type  job: _Job
+        @param position: The position of the job in the current generation
+        @type  position: Int
+
+        @return: None
+        @rtype : None
+
+        """
+        if self._extend_sequence is None or job.generation >= self._max_generation or job.valid_renderings is None:
+            return
+        for rendering_idx, rendering in enumerate(job.valid_renderings):
+            for key, new_seq in self._extend_sequence(rendering, position):
+                ahead = _Job(job.render, new_seq, next(self._ahead_index), job.generation + 1,
+                             key + (rendering_idx,), self._rendering_generation + 1)
+                with self._lock:
+                    self._ahead.append(ahead)
+                self._submit(ahead)
+
+    def _run(self):
+        while True:
+            wait_start = time.monotonic()
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            start = time.monotonic()
+            try:
+                if not self._closed and not job.cancelled:
+                    _thread_state.job = job
+                    renderings_monitor.set_rendering_generation(job.rendering_generation)
+                    fuzzing_monitor.defer_updates(job.deferred_updates)
+                    job.valid_renderings = job.render(job.sequence, job.index, generation=job.generation)
+            except Exception as error:
+                job.error = error
+            finally:
+                _thread_state.job = None
+                renderings_monitor.set_rendering_generation(None)
+                fuzzing_monitor.defer_updates(None)
+            SchedulerStats.Instance().record(time.monotonic() - start, start - wait_start,
+                                             job.rendering_generation is not None)
+
+            with self._lock:
+                job.rendered = True
+                extend = job.generation == self._generation and not job.extended
+                job.extended = job.extended or extend
+                # The job was committed to its generation while it was rendered
+                updates = job.deferred_updates if job.committed else None
+                if updates is not None:
+                    job.deferred_updates = None
+            if updates:
+                job.apply_updates(updates)
+            if extend and job.error is None:
+                self._extend(job, job.index)
+            job.done.set()
+
+    def render(self, render, seq_collection, generation):
+        """ Renders a generation of sequences.
+
+        @param render: Renders a sequence, given the sequence, its position and
+                       its generation
+        @type  render: Func(Sequence, int, generation=int)
+        @param seq_collection: The sequences of the generation
+        @type  seq_collection: List[Sequence]
+        @param generation: The generation
+        @type  generation: Int
+
+        @return: The valid renderings of each sequence, in the order of @param seq_collection
+        @rtype : List[List[Sequence]]
+
+        """
+        with self._lock:
+            self._generation = generation
+            self._rendering_generation = Monitor().current_fuzzing_generation
+            ahead = sorted(self._ahead, key=lambda job: job.key)
+            self._ahead = []
+            if len(ahead) != len(seq_collection) or \
+                    any(job.sequence.hex_definition != seq.hex_definition for job, seq in zip(ahead, seq_collection)):
+                # The sequences rendered ahead are not the ones of this generation,
+                # so their deferred updates are dropped
+                for job in ahead:
+                    job.cancelled = True
+                    job.deferred_updates = None
+                ahead = None
+            else:
+                committed_updates = []
+                for position, job in enumerate(ahead):
+                    job.index = position
+                    job.rendering_generation = None
+                    job.committed = True
+                    # The updates of the jobs still being rendered are applied by their worker
+                    if job.rendered:
+                        committed_updates.append((job, job.deferred_updates))
+                        job.deferred_updates = None
+
+        if ahead is None:
+            jobs = [_Job(render, seq, ith, generation, (ith,)) for ith, seq in enumerate(seq_collection)]
+            for job in jobs:
+                self._submit(job)
+        else:
+            jobs = ahead
+            for job, updates in committed_updates:
+                job.apply_updates(updates)
+            # Queue the extensions of the sequences that were rendered ahead
+            for position, job in enumerate(jobs):
+                with self._lock:
+                    extend = job.rendered and not job.extended
+                    job.extended = job.extended or extend
+                if extend and job.error is None:
+                    self._extend(job, position)
+
+        for job in jobs:
+            job.done.wait()
+            if job.error is not None:
+                raise job.error
+        return [job.valid_renderings for job in jobs]
+
+    def close(self):
+        """ Stops the workers once they are done with their current sequence.
+        The queued sequences are not rendered.
+
+        @return: None
+        @rtype : None
+
+        """
+        self._closed = True
+        for _ in self._workers:
+            self._queue.put((STOP_PRIORITY, next(self._counter), None))
+
+    def join(self):
+        """ Waits for the workers to stop.
+
+        @return: None
+        @rtype : None
+
+        """
+        for worker in self._workers:
+            worker.join()
@@ -4,9 +4,14 @@
 """ Defines restler Sequences. """
 from __future__ import print_function
 
+import collections
+from collections import OrderedDict
 import copy
 import time
 import datetime
+import hashlib
+import sys
+import threading
 from enum import Enum
 
 import restler.engine.core.async_request_utilities as async_request_utilities
@@ -15,9 +20,10 @@ import restler.engine.core.status_codes_monitor as status_codes_monitor
 
 from restler.engine.core.fuzzing_monitor import Monitor
 from restler.engine.core.requests import FailureInformation
+from restler.engine.core.requests import SharedRequest
 from restler.restler_settings import Settings, LogSettings
 from restler.engine.bug_bucketing import BugBuckets
-from restler.engine.core.request_utilities import str_to_hex_def
+from restler.engine.transport_layer.messaging import UTF8
 import restler.utils.restler_logger as logger
 import restler.engine.dependencies as dependencies
 from restler.engine.errors import TimeOutException
@@ -51,6 +57,29 @@ class SentRequestData(object):
         return None
 
 
+class InflightRendering(object):
+    """ A rendering of the last request of a sequence that was sent ahead of
+    its turn, together with the response it received """
+
+    def __init__(self, rendering, schema_request, rendered_data=None, response=None):
+        """ Initializes InflightRendering object
+
+        @param rendering: The rendering, as returned by render_iter
+        @type  rendering: Tuple
+        @param schema_request: The schema the rendering was created from
+        @type  schema_request: Tuple(Request, Bool)
+        @param rendered_data: The rendered data that was sent, after resolving dependencies
+        @type  rendered_data: Str
+        @param response: The response received, or None if the rendering was not sent yet
+        @type  response: HttpResponse
+
+        """
+        self.rendering = rendering
+        self.schema_request = schema_request
+        self.rendered_data = rendered_data
+        self.response = response
+
+
 class RenderedSequence(object):
     """ RenderedSequence class """
 
@@ -99,6 +128,8 @@ class Sequence(object):
         # The position of this sequence in a sequence collection.
         # This is used during logging.
         self.seq_i = 0
+        # The hashes of the sequence are derived from its requests
+        # and computed once (see the requests setter)
         self.requests = list(requests)
         # A list of all requests in this sequence that were sent;
         # as the exact data that was rendered and set to the server
@@ -118,6 +149,20 @@ class Sequence(object):
 
         self._used_cached_prefix = False
 
+        # Renderings of the last request that were sent ahead of their turn
+        # (see max_inflight_requests), in combination order.  Only created
+        # when renderings are sent ahead, since most sequences never do.
+        self._inflight_renderings = None
+
+    def __getstate__(self):
+        """ Renderings sent ahead of their turn belong to the ongoing
+        rendering of this object, so they are not copied. """
+        state = self.__dict__.copy()
+        state['_inflight_renderings'] = None
+        # Hash objects cannot be pickled, the hash is computed again if needed
+        state['_hash'] = None
+        return state
+
     def __iter__(self):
         """ Iterate over Sequences objects. """
         return iter(self.requests)
@@ -133,6 +178,12 @@ class Sequence(object):
         new_seq = Sequence(self.requests + other.requests)
         new_seq.seq_i = self.seq_i
         new_seq._sent_request_data_list = self._sent_request_data_list + other._sent_request_data_list
+        # Extend the hash of this sequence rather than hashing every request again
+        new_seq._hash = self._extended_hash(other.requests)
+        if self.requests and self._methods_endpoints_hex_definition is not None:
+            new_seq._methods_endpoints_hex_definition = "_".join(
+                [self._methods_endpoints_hex_definition] +
+                [f"{req.method_endpoint_hex_definition}" for req in other.requests])
         return new_seq
 
     def __copy__(self):
@@ -145,8 +196,63 @@ class Sequence(object):
         new_seq = Sequence(self.requests)
         new_seq.seq_i = self.seq_i
         new_seq._sent_request_data_list = list(self._sent_request_data_list)
+        new_seq._hash = self._hash
+        new_seq._hex_definition = self._hex_definition
+        new_seq._methods_endpoints_hex_definition = self._methods_endpoints_hex_definition
         return new_seq
 
+    @property
+    def requests(self):
+        """ The requests of the sequence
+
+        @return: The requests of the sequence
+        @rtype : List[Request]
+
+        """
+        return self._requests
+
+    @requests.setter
+    def requests(self, requests):
+        """ Sets the requests of the sequence.  The requests must not be
+        modified in place afterwards, since the hashes of the sequence are
+        cached.
+
+        @param requests: The requests of the sequence
+        @type  requests: List[Request]
+
+        @return: None
+        @rtype : None
+
+        """
+        self._requests = requests
+        # The state of the sha1 hash of the requests' hex definitions,
+        # which is copied to hash the sequences that extend this one
+        self._hash = None
+        self._hex_definition = None
+        self._methods_endpoints_hex_definition = None
+
+    def _extended_hash(self, requests):
+        """ Returns the hash of this sequence extended with the given requests
+
+        @param requests: The requests appended to this sequence
+        @type  requests: List[Request]
+
+        @return: The state of the hash of the extended sequence
+        @rtype : hashlib.sha1
+
+        """
+        if self._hash is None:
+            seq_hash = hashlib.sha1()
+            for request in self.requests:
+                seq_hash.update(request.hex_definition.encode(UTF8))
+            self._hash = seq_hash
+        if not requests:
+            return self._hash
+        seq_hash = self._hash.copy()
+        for request in requests:
+            seq_hash.update(request.hex_definition.encode(UTF8))
+        return seq_hash
+
     @property
     def consumes(self):
         """ Returns all of the dynamic objects consumed by the requests in this Sequence
@@ -188,11 +294,27 @@ class Sequence(object):
         @rtype : Str
 
         """
-        seq_hex_definition = []
-        for request in self.requests:
-            seq_hex_definition.append(request.hex_definition)
+        if self._hex_definition is None:
+            # Same as str_to_hex_def of the concatenated hex definitions
+            self._hex_definition = self._extended_hash([]).hexdigest()
+        return self._hex_definition
+
+    @property
+    def memory_size(self):
+        """ The memory used by this sequence, not including the requests of
+        its prefix, which are shared with the sequence that it extends.
+
+        @return: The memory size, in bytes
+        @rtype : Int
 
-        return str_to_hex_def("".join(seq_hex_definition))
+        """
+        size = sys.getsizeof(self) + sys.getsizeof(self.__dict__) + \
+            sys.getsizeof(self.requests) + sys.getsizeof(self._sent_request_data_list)
+        if self._inflight_renderings is not None:
+            size += sys.getsizeof(self._inflight_renderings)
+        if self.requests:
+            size += self.last_request.memory_size
+        return size
 
     @property
     def last_request(self):
@@ -241,8 +363,10 @@ class Sequence(object):
         @return: A string describing the unique ID by method and endpoint for this sequence
         @rtype : str
         """
-        hex_definition_ids = [f"{req.method_endpoint_hex_definition}" for req in self.requests]
-        return "_".join(hex_definition_ids)
+        if self._methods_endpoints_hex_definition is None:
+            hex_definition_ids = [f"{req.method_endpoint_hex_definition}" for req in self.requests]
+            self._methods_endpoints_hex_definition = "_".join(hex_definition_ids)
+        return self._methods_endpoints_hex_definition
 
     @property
     def current_combination_id(self):
@@ -332,7 +456,11 @@ class Sequence(object):
                         RAW_LOGGING(f'Dynamic object {var_name} is set to None!')
             return data
         else:
-            data = str(data).split(dependencies.RDELIM)
+            if isinstance(data, dependencies.RenderedData):
+                # The placeholders were located when the request was rendered
+                data = list(data.segments)
+            else:
+                data = str(data).split(dependencies.RDELIM)
             for i in range(1, len(data), 2):
                 var_name = data[i]
                 data[i] = dependencies.get_variable(var_name)
@@ -375,20 +503,47 @@ class Sequence(object):
             rendered_data = \
                 self.resolve_dependencies(rendered_data)
 
-        req_async_wait = Settings().get_max_async_resource_creation_time(request.request_id)
-        producer_timing_delay = Settings().get_producer_timing_delay(request.request_id)
-
         SequenceTracker.initialize_request_trace(combination_id=self.combination_id,
                                                  request_id=request.hex_definition,
                                                  replay_blocks=replay_blocks)
         logger.write_to_main(f"rendered_data={rendered_data}", LogSettings().sequences)
-        response = request_utilities.send_request_data(rendered_data, reconnect=True)
+        response = request_utilities.send_request_data(rendered_data)
+        return self.process_sent_request(request, rendered_data, response, parser,
+                                         updated_writer_variables, replay_blocks)
+
+    def process_sent_request(self, request, rendered_data, response, parser, updated_writer_variables,
+                             replay_blocks):
+        """ Processes the response of a request that was sent: updates the
+        dynamic objects, waits for asynchronous resource creation, parses the
+        response and records the sent request.
+
+        @param request: The request object corresponding to the rendered data that was sent
+        @type  request: Request
+        @param rendered_data: The rendered data that was sent
+        @type  rendered_data: Str
+        @param response: The response received
+        @type  response: HttpResponse
+        @param parser: The parser for the response
+        @type  parser: Func
+        @param updated_writer_variables: The updated writer variables for the request
+        @type  updated_writer_variables: Dict
+        @param replay_blocks: The replay blocks for the request
+        @type  replay_blocks: List
+
+        @return: The same values as send_rendered_request
+        @rtype : Tuple
+
+        """
+        req_async_wait = Settings().get_max_async_resource_creation_time(request.request_id)
+        producer_timing_delay = Settings().get_producer_timing_delay(request.request_id)
+
         if response.has_valid_code():
             for name, v in updated_writer_variables.items():
                 dependencies.set_variable(name, v)
 
         responses_to_parse, resource_error, async_waited = async_request_utilities.try_async_poll(
-            rendered_data, response, req_async_wait)
+            rendered_data, response, req_async_wait,
+            resource_type=f"{request.method} {request.endpoint_no_dynamic_objects}")
         parser_threw_exception = False
 
         # Record the time at which the response was received
@@ -583,23 +738,39 @@ class Sequence(object):
         response_datetime_str = None
         timestamp_micro = None
         logger.write_to_main("before render_iter", LogSettings().sequences)
-        for rendered_data, parser, tracked_parameters, updated_writer_variables, replay_blocks in \
-                request.render_iter(candidate_values_pool,
-                                    skip=request._current_combination_id,
-                                    preprocessing=preprocessing):
-
-            if Monitor().remaining_time_budget <= 0 and not postprocessing:
-                raise TimeOutException("Exceeded Timeout")
-
-            # Hold the lock (because other workers may be rendering the same
-            # request) and check whether the current rendering is known from the
-            # past to lead to invalid status codes. If so, skip the current
-            # rendering.
-            if lock is not None:
-                lock.acquire()
-            should_skip = Monitor().is_invalid_rendering(request)
-            if lock is not None:
-                lock.release()
+        renderings = None
+        while True:
+            # Renderings that were already sent ahead of their turn come first,
+            # followed by the remaining combinations.
+            if self._inflight_renderings:
+                inflight = self._inflight_renderings.popleft()
+                rendering = inflight.rendering
+                request._last_rendered_schema_request = inflight.schema_request
+            else:
+                inflight = None
+                if renderings is None:
+                    renderings = request.render_iter(candidate_values_pool,
+                                                     skip=request._current_combination_id,
+                                                     preprocessing=preprocessing)
+                rendering = next(renderings, None)
+                if rendering is None:
+                    break
+            rendered_data, parser, tracked_parameters, updated_writer_variables, replay_blocks = rendering
+            # The responses of the renderings that were already sent are
+            # always processed, so they are neither skipped nor timed out
+            already_sent = inflight is not None and inflight.response is not None
+
+            if Monitor().remaining_time_budget <= 0 and not postprocessing and not already_sent:
+                if not self._has_inflight_responses():
+                    raise TimeOutException("Exceeded Timeout")
+                # Process the responses of the renderings sent ahead of this
+                # one, without sending it
+                request._current_combination_id += 1
+                continue
+
+            # Check whether the current rendering is known from the past to
+            # lead to invalid status codes. If so, skip the current rendering.
+            should_skip = not already_sent and self._is_invalid_rendering(request, lock)
 
             # Skip the loop and don't forget to increase the counter.
             if should_skip:
@@ -642,9 +813,19 @@ class Sequence(object):
             # substitute reference placeholders with resolved values
             # for the last request
             logger.write_to_main("render.......", LogSettings().sequences)
-            response, resource_error, parser_exception_occurred, timing_delay, response_datetime_str, timestamp_micro = \
-                self.send_rendered_request(request, rendered_data, parser, tracked_parameters,
-                                           updated_writer_variables, replay_blocks, lock)
+            if inflight is None and self._can_send_ahead(parser, updated_writer_variables, preprocessing):
+                inflight = self._send_ahead(request, rendering, renderings, lock)
+            if inflight is not None and inflight.response is not None:
+                SequenceTracker.initialize_request_trace(combination_id=self.combination_id,
+                                                         request_id=request.hex_definition,
+                                                         replay_blocks=replay_blocks)
+                response, resource_error, parser_exception_occurred, timing_delay, response_datetime_str, timestamp_micro = \
+                    self.process_sent_request(request, inflight.rendered_data, inflight.response, parser,
+                                              updated_writer_variables, replay_blocks)
+            else:
+                response, resource_error, parser_exception_occurred, timing_delay, response_datetime_str, timestamp_micro = \
+                    self.send_rendered_request(request, rendered_data, parser, tracked_parameters,
+                                               updated_writer_variables, replay_blocks, lock)
             if response.has_bug_code():
                 logger.write_to_main(f"{self.__class__.__name__}", LogSettings().sequences)
                 BugBuckets.Instance().update_bug_buckets(
@@ -722,6 +903,124 @@ class Sequence(object):
 
         return RenderedSequence(None)
 
+    def _can_send_ahead(self, parser, updated_writer_variables, preprocessing):
+        """ Returns whether the next renderings of the last request may be
+        sent together with the current one.  This is only the case when the
+        renderings are independent of each other: the cached prefix is not
+        re-rendered in between, and the last request neither parses its
+        response nor writes dynamic objects.  The rendering modes that stop
+        after the first valid rendering are excluded, since they would not
+        use the responses of the renderings sent ahead.
+
+        @param parser: The parser for the response of the current rendering
+        @type  parser: Func
+        @param updated_writer_variables: The writer variables of the current rendering
+        @type  updated_writer_variables: Dict
+        @param preprocessing: Set to true if rendering during preprocessing
+        @type  preprocessing: Bool
+
+        @return: True if renderings may be sent ahead of their turn
+        @rtype : Bool
+
+        """
+        return Settings().max_inflight_requests > 1 \
+            and not preprocessing \
+            and self._used_cached_prefix \
+            and not self.re_render_prefix_on_success \
+            and Settings().fuzzing_mode in ['bfs', 'bfs-fast', 'test-all-combinations'] \
+            and not Settings().use_trace_database \
+            and parser is None \
+            and not updated_writer_variables
+
+    def _is_invalid_rendering(self, request, lock):
+        """ Returns whether the current rendering of the request is known from
+        the past to lead to invalid status codes, so it should be skipped.
+
+        @param request: The last request of the sequence
+        @type  request: Request
+        @param lock: Lock object used for sync of more than one fuzzing jobs.
+        @type  lock: thread.Lock object
+
+        @return: True if the rendering should be skipped
+        @rtype : Bool
+
+        """
+        # Hold the lock, because other workers may be rendering the same request
+        if lock is not None:
+            lock.acquire()
+        should_skip = Monitor().is_invalid_rendering(request)
+        if lock is not None:
+            lock.release()
+        return should_skip
+
+    def _has_inflight_responses(self):
+        """ Returns whether renderings sent ahead of their turn are waiting to
+        have their responses processed.
+
+        @return: True if the responses of sent renderings are queued
+        @rtype : Bool
+
+        """
+        return self._inflight_renderings is not None and \
+            any(inflight.response is not None for inflight in self._inflight_renderings)
+
+    def _send_ahead(self, request, rendering, renderings, lock):
+        """ Sends the current rendering of the last request together with the
+        following renderings, up to max_inflight_requests, concurrently.
+        The following renderings are queued, in order, to be processed by the
+        next calls to render.  The renderings that will be skipped (see
+        _is_invalid_rendering) are queued without being sent.
+
+        @param request: The last request of the sequence
+        @type  request: Request
+        @param rendering: The current rendering, as returned by render_iter
+        @type  rendering: Tuple
+        @param renderings: The render_iter generator the rendering came from
+        @type  renderings: Generator
+        @param lock: Lock object used for sync of more than one fuzzing jobs.
+        @type  lock: thread.Lock object
+
+        @return: The current rendering, with its response
+        @rtype : InflightRendering
+
+        """
+        # The combination id of the current rendering was already incremented,
+        # and is the one that the next rendering will be checked with
+        combination_id = request._current_combination_id
+        batch = [InflightRendering(rendering, request._last_rendered_schema_request)]
+        skipped = set()
+        while len(batch) < Settings().max_inflight_requests:
+            next_rendering = next(renderings, None)
+            if next_rendering is None:
+                break
+            request._current_combination_id = combination_id + len(batch) - 1
+            if self._is_invalid_rendering(request, lock):
+                skipped.add(len(batch))
+            batch.append(InflightRendering(next_rendering, request._last_rendered_schema_request))
+            _, parser, _, updated_writer_variables, _ = next_rendering
+            if parser is not None or updated_writer_variables:
+                # This rendering is queued without being sent; it will be
+                # sent when its turn comes.
+                break
+        request._current_combination_id = combination_id
+        request._last_rendered_schema_request = batch[0].schema_request
+
+        to_send = [item for idx, item in enumerate(batch)
+                   if idx not in skipped and item.rendering[1] is None and not item.rendering[3]]
+        for item in to_send:
+            item.rendered_data = item.rendering[0]
+            if not Settings().ignore_dependencies:
+                item.rendered_data = self.resolve_dependencies(item.rendered_data)
+            logger.write_to_main(f"rendered_data={item.rendered_data}", LogSettings().sequences)
+        responses = request_utilities.send_inflight_request_data([item.rendered_data for item in to_send])
+        for item, response in zip(to_send, responses):
+            item.response = response
+
+        if self._inflight_renderings is None:
+            self._inflight_renderings = collections.deque()
+        self._inflight_renderings.extend(batch[1:])
+        return batch[0]
+
     def append_data_to_sent_list(self, req_method_endpoint_hex_definition,
                                  rendered_data, parser, response, producer_timing_delay=0, max_async_wait_time=0,
                                  replay_blocks=None):
@@ -851,7 +1150,7 @@ class Sequence(object):
 
                 rendered_data = replay_sequence.get_request_data_with_token(request_data.rendered_data)
                 logger.write_to_main("rendered_data={}".format(rendered_data), True)
-                response = request_utilities.send_request_data(rendered_data, reconnect=True)
+                response = request_utilities.send_request_data(rendered_data)
                 responses_to_parse, _, _ = async_request_utilities.try_async_poll(
                     rendered_data, response, request_data.max_async_wait_time)
                 if request_data.parser:
@@ -897,35 +1196,37 @@ class Sequence(object):
         return status_code
 
 
-class RenderedSequenceCache(object):
-    """ Implements a cache of rendered sequences. """
+class _RenderedSequenceNode(object):
+    """ A node of the rendered sequence cache.  The path from the root to
+    the node is made of the methods and endpoints of the sequence's requests. """
 
     def __init__(self):
-        """ Creates an empty cache
+        """ Creates a node without renderings
         @return: None
         @rtype : None
         """
-        self._cache = {}
-
-    def __get_req_cache(self, sequence):
-        last_request = sequence.last_request
-        generation = sequence.length
-        if generation not in self._cache:
-            self._cache[generation] = {}
-        generation_cache = self._cache[generation]
-        if last_request.method_endpoint_hex_definition not in generation_cache:
-            generation_cache[last_request.method_endpoint_hex_definition] = {}
+        self.children = {}
+        # The combination ids of the valid and invalid renderings of the sequence.
+        # The dicts are used as sets that keep the order in which they were added.
+        self.renderings = {True: {}, False: {}}
 
-        return generation_cache[last_request.method_endpoint_hex_definition]
 
-    def __get_seq_cache(self, sequence):
-        req_cache = self.__get_req_cache(sequence)
+class RenderedSequenceCache(object):
+    """ Implements a cache of rendered sequences, as a trie of the
+    methods and endpoints of their requests. """
 
-        seq_id = sequence.methods_endpoints_hex_definition
-        if seq_id not in req_cache:
-            req_cache[seq_id] = {True: [], False: []}
+    def __init__(self):
+        """ Creates an empty cache
+        @return: None
+        @rtype : None
+        """
+        self._root = _RenderedSequenceNode()
 
-        return req_cache[seq_id]
+    def __get_child(self, node, request):
+        key = request.method_endpoint_hex_definition
+        if key not in node.children:
+            node.children[key] = _RenderedSequenceNode()
+        return node.children[key]
 
     def add(self, sequence, valid):
         """ Adds sequence to the cache.
@@ -943,13 +1244,13 @@ class RenderedSequenceCache(object):
         if not isinstance(sequence, Sequence):
             raise Exception("Sequences must be used for this cache.")
 
-        seq_cache = self.__get_seq_cache(sequence)
+        node = self._root
+        for request in sequence.requests:
+            node = self.__get_child(node, request)
 
-        # only add the sequence if it's not already present
-        combination_ids = [req._current_combination_id for req in sequence.requests]
-
-        if combination_ids not in seq_cache[valid]:
-            seq_cache[valid].append(combination_ids)
+        # The sequence is only added once, since the renderings are sets
+        combination_ids = tuple(req._current_combination_id for req in sequence.requests)
+        node.renderings[valid][combination_ids] = None
 
     def add_valid_prefixes(self, sequence):
         """ Adds all the prefixes of the rendered sequence, if
@@ -965,11 +1266,12 @@ class RenderedSequenceCache(object):
         if not isinstance(sequence, Sequence):
             raise Exception("Sequences must be used for this cache.")
 
-        self.add(sequence, True)
-
-        for idx in range(len(sequence.requests[0:-1])):
-            prefix_seq = Sequence(sequence.requests[0:idx + 1])
-            self.add(prefix_seq, True)
+        node = self._root
+        combination_ids = ()
+        for request in sequence.requests:
+            node = self.__get_child(node, request)
+            combination_ids += (request._current_combination_id,)
+            node.renderings[True][combination_ids] = None
 
     def add_invalid_sequence(self, sequence):
         """ Adds a single invalid rendered sequence to the cache.
@@ -1001,22 +1303,26 @@ class RenderedSequenceCache(object):
         @return: The list of rendered sequences for the longest prefix found in the cache, and whether each is valid or invalid.
         @rtype : List[Sequence], bool
         """
-        found_prefix = False
-        for seq_len in range(len(req_list), 0, -1):
-            prefix_seq = Sequence(req_list[0:seq_len])
-            seq_cache = self.__get_seq_cache(prefix_seq)
+        # Find the nodes of all the cached prefixes in a single walk
+        prefix_nodes = []
+        node = self._root
+        for request in req_list:
+            node = node.children.get(request.method_endpoint_hex_definition)
+            if node is None:
+                break
+            prefix_nodes.append(node)
 
+        for node in reversed(prefix_nodes):
             for valid in [True, False]:
-                for rendered_sequence_id in seq_cache[valid]:
-                    found_prefix = True
-                    yield (rendered_sequence_id, valid)
-                    if found_prefix and not get_all_renderings:
-                        break
-                # Exit once the valid renderings of the longest prefix ending in this request are returned.
-                if found_prefix:
-                    break
-            if found_prefix:
-                break
+                if node.renderings[valid]:
+                    if get_all_renderings:
+                        rendered_sequence_ids = list(node.renderings[valid])
+                    else:
+                        rendered_sequence_ids = [next(iter(node.renderings[valid]))]
+                    for rendered_sequence_id in rendered_sequence_ids:
+                        yield (rendered_sequence_id, valid)
+                    # Exit once the renderings of the longest prefix are returned.
+                    return
 
     def get_renderings(self, req_list, get_all_renderings=False):
         """ This function takes a list of requests, and returns
@@ -1025,11 +1331,13 @@ class RenderedSequenceCache(object):
         renderings = {}
 
         for prev_combination, valid in self.get_prefix(req_list, get_all_renderings):
-            new_seq = Sequence(req_list[:len(prev_combination)])
-            new_seq = copy.deepcopy(new_seq)
-
-            for idx, req in enumerate(new_seq.requests):
-                req._current_combination_id = prev_combination[idx]
+            # The copies of the requests share the state of the requests,
+            # like the requests of the sequences built by the driver, and only
+            # differ in their combination ids.
+            requests = [SharedRequest(req) for req in req_list[:len(prev_combination)]]
+            for req, combination_id in zip(requests, prev_combination):
+                req._current_combination_id = combination_id
+            new_seq = Sequence(requests)
 
             if valid not in renderings:
                 renderings[valid] = []
@@ -1037,3 +1345,64 @@ class RenderedSequenceCache(object):
             renderings[valid].append(new_seq)
 
         return renderings
+
+
+class SequenceMemoryStats(object):
+    """ Memory used by the sequences of each generation """
+    __instance = None
+    __instance_lock = threading.Lock()
+
+    @staticmethod
+    def Instance():
+        """ Singleton's instance accessor
+
+        @return SequenceMemoryStats instance
+        @rtype  SequenceMemoryStats
+
+        """
+        if SequenceMemoryStats.__instance is None:
+            with SequenceMemoryStats.__instance_lock:
+                if SequenceMemoryStats.__instance is None:
+                    SequenceMemoryStats.__instance = SequenceMemoryStats()
+        return SequenceMemoryStats.__instance
+
+    @staticmethod
+    def TEST_DeleteInstance():
+        SequenceMemoryStats.__instance = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # The number of sequences and their total memory size, by generation
+        self._generations = OrderedDict()
+
+    def record(self, generation, seq_collection):
+        """ Records the memory used by the sequences of a generation
+
+        @param generation: The generation
+        @type  generation: Int
+        @param seq_collection: The sequences of the generation, before rendering
+        @type  seq_collection: List[Sequence]
+
+        @return: None
+        @rtype : None
+
+        """
+        memory_size = sum(seq.memory_size for seq in seq_collection)
+        with self._lock:
+            self._generations[generation] = (len(seq_collection), memory_size)
+
+    def to_dict(self):
+        """ Returns the stats in the format of the testing summary
+
+        @return: The number of sequences and the average memory size of a
+                 sequence, in bytes, for each generation
+        @rtype : OrderedDict
+
+        """
+        with self._lock:
+            stats = OrderedDict()
+            for generation, (num_sequences, memory_size) in self._generations.items():
+                stats[generation] = OrderedDict()
+                stats[generation]['sequences'] = num_sequences
+                stats[generation]['bytes_per_sequence'] = round(memory_size / num_sequences) if num_sequences else 0
+            return stats
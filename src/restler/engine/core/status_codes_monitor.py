@@ -180,7 +180,6 @@ class StatusCodesMonitor(object):
 
         seq_length = sequence.length
         self._requests_count['main_driver'] += sequence.executed_requests_count
-        seq_definition = sequence.definition
         seq_hash = sequence.hex_definition
 
         if seq_hash not in self._sequence_statuses:
@@ -206,3 +205,72 @@ class StatusCodesMonitor(object):
         if lock is not None:
             lock.release()
 
+
+    def checkpoint(self):
+        """ Returns the current size of the monitor, to later get the
+        updates made since then with get_updates_since.
+
+        @return: The request counts, and the number of statuses of each status code
+                 of each sequence
+        @rtype : Tuple(Dict, Dict(int, Dict(str, int)))
+
+        """
+        statuses = {}
+        for seq_hash, sequence_statuses in self._sequence_statuses.items():
+            statuses[seq_hash] = {code: len(request_statuses) for code, request_statuses
+                                  in sequence_statuses.request_statuses.items()}
+        return (dict(self._requests_count), statuses)
+
+    def get_updates_since(self, checkpoint):
+        """ Returns the updates made to the monitor since a checkpoint.
+
+        @param checkpoint: The value returned by checkpoint
+        @type  checkpoint: Tuple(Dict, Dict(int, Dict(str, int)))
+
+        @return: The updates, to be merged into another monitor with merge_updates
+        @rtype : Tuple(Dict, Dict(int, SequenceStatusCodes))
+
+        """
+        requests_count, statuses = checkpoint
+        requests_count_updates = {type: count - requests_count.get(type, 0)
+                                  for type, count in self._requests_count.items()
+                                  if count != requests_count.get(type, 0)}
+        sequence_updates = {}
+        for seq_hash, sequence_statuses in self._sequence_statuses.items():
+            previous = statuses.get(seq_hash, {})
+            updates = SequenceStatusCodes(sequence_statuses.length)
+            for code, request_statuses in sequence_statuses.request_statuses.items():
+                if len(request_statuses) > previous.get(code, 0):
+                    updates.request_statuses[code] = request_statuses[previous.get(code, 0):]
+            if updates.request_statuses:
+                sequence_updates[seq_hash] = updates
+        return (requests_count_updates, sequence_updates)
+
+    def merge_updates(self, updates, lock=None):
+        """ Merges the updates made to another monitor, e.g. the monitor of a
+        worker process, into this monitor.
+
+        @param updates: The value returned by get_updates_since
+        @type  updates: Tuple(Dict, Dict(int, SequenceStatusCodes))
+        @param lock: Lock object used for sync of more than one fuzzing jobs.
+        @type  lock: thread.Lock object
+
+        @return: None
+        @rtype : None
+
+        """
+        if lock is not None:
+            lock.acquire()
+
+        requests_count_updates, sequence_updates = updates
+        for type, count in requests_count_updates.items():
+            self._requests_count[type] = self._requests_count.get(type, 0) + count
+        for seq_hash, updates in sequence_updates.items():
+            if seq_hash not in self._sequence_statuses:
+                self._sequence_statuses[seq_hash] = SequenceStatusCodes(updates.length)
+            request_statuses = self._sequence_statuses[seq_hash].request_statuses
+            for code, statuses in updates.request_statuses.items():
+                request_statuses.setdefault(code, []).extend(statuses)
+
+        if lock is not None:
+            lock.release()
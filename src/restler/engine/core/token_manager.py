@@ -0,0 +1,261 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+""" Background refreshing of the authentication tokens. """
+from __future__ import print_function
+import collections
+import threading
+import time
+from collections import OrderedDict
+
+# Tokens are refreshed when this fraction of the refresh interval is left,
+# so that they are replaced before they expire
+REFRESH_LEAD_FRACTION = 0.1
+# Number of 401 responses, within the window below, after which the token is
+# refreshed before its refresh interval has elapsed
+UNAUTHORIZED_BURST_SIZE = 3
+UNAUTHORIZED_BURST_WINDOW_SEC = 10
+# Minimum time between two refreshes triggered by 401 responses
+MIN_OUT_OF_BAND_REFRESH_INTERVAL_SEC = 5
+
+
+class TokenRefreshStats(object):
+    """ Counters of the token refreshes """
+    def __init__(self):
+        self.refreshes = 0
+        self.out_of_band_refreshes = 0
+        self.total_refresh_latency_sec = 0.0
+        self.max_refresh_latency_sec = 0.0
+        self.last_refresh_latency_sec = 0.0
+
+    def record(self, latency_sec, out_of_band):
+        self.refreshes += 1
+        if out_of_band:
+            self.out_of_band_refreshes += 1
+        self.total_refresh_latency_sec += latency_sec
+        self.max_refresh_latency_sec = max(self.max_refresh_latency_sec, latency_sec)
+        self.last_refresh_latency_sec = latency_sec
+
+    def merge(self, other):
+        """ Adds the counters of the token refreshes of a worker process
+
+        @param other: The counters to add
+        @type  other: TokenRefreshStats
+
+        @return: None
+        @rtype : None
+
+        """
+        if not other.refreshes:
+            return
+        self.refreshes += other.refreshes
+        self.out_of_band_refreshes += other.out_of_band_refreshes
+        self.total_refresh_latency_sec += other.total_refresh_latency_sec
+        self.max_refresh_latency_sec = max(self.max_refresh_latency_sec, other.max_refresh_latency_sec)
+        self.last_refresh_latency_sec = other.last_refresh_latency_sec
+
+    def to_dict(self):
+        """ Returns the stats in the format of the testing summary
+
+        @return: The stats
+        @rtype : OrderedDict
+
+        """
+        stats = OrderedDict()
+        stats['refreshes'] = self.refreshes
+        stats['out_of_band_refreshes'] = self.out_of_band_refreshes
+        stats['average_refresh_latency_sec'] = \
+            round(self.total_refresh_latency_sec / self.refreshes, 3) if self.refreshes else 0.0
+        stats['max_refresh_latency_sec'] = round(self.max_refresh_latency_sec, 3)
+        stats['last_refresh_latency_sec'] = round(self.last_refresh_latency_sec, 3)
+        return stats
+
+
+class TokenManager(object):
+    """ Refreshes the authentication token in a background thread.
+
+    The first token is obtained by the first request that needs it.  After
+    that, a background thread refreshes the token shortly before its refresh
+    interval elapses, or earlier when the service rejects several requests as
+    unauthorized, so requests never wait for the token refresh command.
+
+    """
+    __instance = None
+    __instance_lock = threading.Lock()
+
+    @staticmethod
+    def Instance():
+        """ Singleton's instance accessor
+
+        @return TokenManager instance
+        @rtype  TokenManager
+
+        """
+        if TokenManager.__instance is None:
+            with TokenManager.__instance_lock:
+                if TokenManager.__instance is None:
+                    TokenManager.__instance = TokenManager()
+        return TokenManager.__instance
+
+    @staticmethod
+    def TEST_DeleteInstance():
+        if TokenManager.__instance is not None:
+            TokenManager.__instance.stop()
+        TokenManager.__instance = None
+
+    @staticmethod
+    def DetachInstance():
+        """ Drops the instance inherited by a worker process, whose refresh
+        thread only runs in the main process.
+
+        @return: None
+        @rtype : None
+
+        """
+        TokenManager.__instance = None
+        TokenManager.__instance_lock = threading.Lock()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._refresh_requested = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._token_dict = None
+        self._refresh = None
+        self._last_refresh = None
+        self._refresh_error = None
+        self._unauthorized_times = collections.deque()
+        self._stats = TokenRefreshStats()
+
+    @property
+    def last_refresh(self):
+        """ The time of the last refresh, or None if the token was never refreshed """
+        return self._last_refresh
+
+    def _refresh_interval(self):
+        return self._token_dict['token_refresh_interval']
+
+    def _do_refresh(self, out_of_band=False):
+        """ Refreshes the token and records the latency of the refresh.
+
+        @param out_of_band: Whether the refresh was triggered by 401 responses
+        @type  out_of_band: Bool
+
+        @return: None
+        @rtype : None
+
+        """
+        start_time = time.monotonic()
+        self._refresh(self._token_dict)
+        latency = time.monotonic() - start_time
+        with self._lock:
+            self._last_refresh = time.time()
+            self._stats.record(latency, out_of_band)
+
+    def ensure_token(self, token_dict, refresh):
+        """ Makes sure a token was obtained and that the background refresh
+        thread is running.  Only the first call waits for the token.
+
+        @param token_dict: The token refresh settings, as in the candidate values pool
+        @type  token_dict: Dict
+        @param refresh: Refreshes the token and publishes it
+        @type  refresh: Func(Dict)
+
+        @return: None
+        @rtype : None
+
+        """
+        if self._refresh_error is not None:
+            # The refresh failed in the background thread, e.g. the token was empty
+            raise self._refresh_error
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._token_dict = token_dict
+            self._refresh = refresh
+            self._do_refresh()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def on_unauthorized(self):
+        """ Records a 401 response, and asks the background thread to refresh
+        the token when several were received in a short time.
+
+        @return: None
+        @rtype : None
+
+        """
+        if self._thread is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._unauthorized_times.append(now)
+            while self._unauthorized_times[0] < now - UNAUTHORIZED_BURST_WINDOW_SEC:
+                self._unauthorized_times.popleft()
+            if len(self._unauthorized_times) < UNAUTHORIZED_BURST_SIZE or \
+                    now - self._last_refresh < MIN_OUT_OF_BAND_REFRESH_INTERVAL_SEC:
+                return
+            self._unauthorized_times.clear()
+        self._refresh_requested.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            next_refresh = self._last_refresh + self._refresh_interval() * (1 - REFRESH_LEAD_FRACTION)
+            out_of_band = self._refresh_requested.wait(max(0.0, next_refresh - time.time()))
+            if self._stopped.is_set():
+                return
+            self._refresh_requested.clear()
+            try:
+                self._do_refresh(out_of_band=out_of_band)
+            except BaseException as error:
+                # Fail the next request that needs the token, as if it had refreshed it
+                self._refresh_error = error
+                return
+
+    def stop(self):
+        """ Stops the background refresh thread.
+
+        @return: None
+        @rtype : None
+
+        """
+        self._stopped.set()
+        self._refresh_requested.set()
+
+    def stats(self):
+        """ Returns the token refresh stats.
+
+        @return: The stats
+        @rtype : OrderedDict
+
+        """
+        with self._lock:
+            return self._stats.to_dict()
+
+    def pop_stats(self):
+        """ Returns the token refresh counters, and resets them.  Used by the
+        worker processes of the fuzzing run to return their counters.
+
+        @return: The counters
+        @rtype : TokenRefreshStats
+
+        """
+        with self._lock:
+            stats, self._stats = self._stats, TokenRefreshStats()
+        return stats
+
+    def merge_stats(self, stats):
+        """ Adds the counters of a worker process of the fuzzing run
+
+        @param stats: The counters, see pop_stats
+        @type  stats: TokenRefreshStats
+
+        @return: None
+        @rtype : None
+
+        """
+        with self._lock:
+            self._stats.merge(stats)
@@ -0,0 +1,295 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+""" Renders the sequences of a generation in worker processes. """
+from __future__ import print_function
+import multiprocessing
+import threading
+
+import restler.utils.restler_logger as logger
+import restler.engine.dependencies as dependencies
+from restler.engine.bug_bucketing import BugBuckets
+from restler.engine.core.async_request_utilities import AsyncPollingStats
+from restler.engine.core.async_request_utilities import AsyncResourcePoller
+from restler.engine.core.fuzzing_monitor import Monitor
+from restler.engine.core.request_utilities import detach_transport
+from restler.engine.core.requests import SchemaCombinations
+from restler.engine.core.retry_handler import RetryStats
+from restler.engine.core.token_manager import TokenManager
+from restler.engine.errors import TimeOutException
+from restler.engine.transport_layer.connection_pool import ConnectionPool
+from restler.engine.transport_layer.rate_limiter import RateLimiter
+
+# The sequences of the current generation, the function rendering them and
+# the checkers applied to them.  The worker processes are forked for each
+# generation, so they inherit these along with the rest of the state of the
+# fuzzing run.
+_render = None
+_seq_collection = None
+_checkers = []
+# Whether the worker process was initialized, see _init_worker
+_worker_initialized = False
+
+
+class WorkerResult(object):
+    """ The renderings of a worker process and the updates of the state of
+    the fuzzing run that it made while rendering them """
+    def __init__(self, valid_renderings, monitor_updates, bug_bucket_updates, coverage_entries,
+                 dyn_objects, object_creations, object_accesses, checker_states, stats, timed_out):
+        """ Initializes the WorkerResult object
+
+        @param valid_renderings: The valid renderings of each sequence of the shard
+        @type  valid_renderings: List[Tuple(int, List[Sequence])]
+        @param monitor_updates: The updates of the fuzzing monitor
+        @type  monitor_updates: Tuple
+        @param bug_bucket_updates: The deferred bug bucket updates of each sequence
+        @type  bug_bucket_updates: List[Tuple(int, Dict)]
+        @param coverage_entries: The deferred spec coverage entries of each sequence
+        @type  coverage_entries: List[Tuple(int, Tuple)]
+        @param dyn_objects: The dynamic objects created by the worker
+        @type  dyn_objects: Dict(str, List[str])
+        @param object_creations: The number of objects created by the worker
+        @type  object_creations: Int
+        @param object_accesses: The number of object accesses of the worker
+        @type  object_accesses: Int
+        @param checker_states: The state of each checker, see CheckerBase.get_state
+        @type  checker_states: List[Dict]
+        @param stats: The retry, async polling, connection pool, rate limiter
+                      and token refresh stats of the worker, see _pop_stats
+        @type  stats: Tuple
+        @param timed_out: Whether the time budget ran out while rendering the shard
+        @type  timed_out: Bool
+
+        @return: None
+        @rtype : None
+
+        """
+        self.valid_renderings = valid_renderings
+        self.monitor_updates = monitor_updates
+        self.bug_bucket_updates = bug_bucket_updates
+        self.coverage_entries = coverage_entries
+        self.dyn_objects = dyn_objects
+        self.object_creations = object_creations
+        self.object_accesses = object_accesses
+        self.checker_states = checker_states
+        self.stats = stats
+        self.timed_out = timed_out
+
+
+def _init_worker():
+    """ Gives a new worker process its own transport and network log, and
+    leaves bug bucketing, spec coverage logging and garbage collection to the
+    main process.
+
+    The worker is forked while the threads of the main process (the garbage
+    collector, the async resource poller and the token refresh thread) are
+    running, so any lock that one of them held at that time would never be
+    released in the worker.  The locks shared with these threads are
+    re-created, and the singletons holding them are dropped.  The stats of
+    the worker therefore start from zero, and are returned to the main
+    process with its renderings (see _pop_stats).
+
+    @return: None
+    @rtype : None
+
+    """
+    logger.main_lock = threading.Semaphore(1)
+    dependencies.main_lock = threading.Semaphore(1)
+    SchemaCombinations.DetachLocks()
+    RetryStats.DetachInstance()
+    AsyncPollingStats.DetachInstance()
+    AsyncResourcePoller.DetachInstance()
+    detach_transport()
+    logger.create_worker_network_log(logger.LOG_TYPE_TESTING)
+    BugBuckets.Instance().defer_updates()
+    logger.SpecCoverageLog.Instance().defer_writes()
+    # The objects inherited from the main process are garbage collected by it
+    dependencies.pop_dyn_objects()
+
+
+def _pop_stats():
+    """ Returns the stats of the worker process that are reported in the
+    testing summary, and resets them, since the worker may render several
+    shards.
+
+    @return: The retry, async polling, connection pool, rate limiter and
+             token refresh stats
+    @rtype : Tuple
+
+    """
+    return (RetryStats.Instance().pop_counts(),
+            AsyncPollingStats.Instance().pop_counts(),
+            ConnectionPool().pop_stats(),
+            RateLimiter().pop_stats(),
+            TokenManager.Instance().pop_stats())
+
+
+def _merge_stats(stats):
+    """ Adds the stats of a worker process to those of the main process
+
+    @param stats: The stats of the worker, see _pop_stats
+    @type  stats: Tuple
+
+    @return: None
+    @rtype : None
+
+    """
+    retries, async_polling, connection_pool, rate_limiter, token_refresh = stats
+    RetryStats.Instance().merge(retries)
+    AsyncPollingStats.Instance().merge(async_polling)
+    ConnectionPool().merge_stats(connection_pool)
+    RateLimiter().merge_stats(rate_limiter)
+    TokenManager.Instance().merge_stats(token_refresh)
+
+
+def _render_shard(shard):
+    """ Renders a shard of the sequences of the current generation.
+
+    @param shard: The indexes of the sequences to render
+    @type  shard: List[int]
+
+    @return: The renderings, and the updates of the state of the fuzzing run
+    @rtype : WorkerResult
+
+    """
+    global _worker_initialized
+    # The worker is initialized here rather than by the pool, which would
+    # keep starting new workers if the initialization failed
+    if not _worker_initialized:
+        _init_worker()
+        _worker_initialized = True
+
+    monitor_checkpoint = Monitor().checkpoint()
+    object_creations = dependencies.object_creations
+    object_accesses = dependencies.object_accesses
+    valid_renderings = []
+    bug_bucket_updates = []
+    coverage_entries = []
+    timed_out = False
+    try:
+        for ith in shard:
+            valid_renderings.append((ith, _render(_seq_collection[ith], ith)))
+            bug_bucket_updates.extend((ith, update) for update in BugBuckets.Instance().pop_deferred_updates())
+            coverage_entries.extend((ith, entry) for entry in logger.SpecCoverageLog.Instance().pop_deferred_entries())
+    except TimeOutException:
+        timed_out = True
+        bug_bucket_updates.extend((ith, update) for update in BugBuckets.Instance().pop_deferred_updates())
+        coverage_entries.extend((ith, entry) for entry in logger.SpecCoverageLog.Instance().pop_deferred_entries())
+
+    return WorkerResult(valid_renderings,
+                        Monitor().get_updates_since(monitor_checkpoint),
+                        bug_bucket_updates,
+                        coverage_entries,
+                        dependencies.pop_dyn_objects(),
+                        dependencies.object_creations - object_creations,
+                        dependencies.object_accesses - object_accesses,
+                        [checker.get_state() for checker in _checkers],
+                        _pop_stats(),
+                        timed_out)
+
+
+class WorkerPool(object):
+    """ Renders the sequences of a generation in worker processes.
+
+    Each worker process renders a shard of the sequences, over its own
+    connections and with its own network log.  The main process then merges
+    the status codes and renderings, bug buckets, spec coverage, dynamic
+    objects, checker state and transport stats of the workers, so that the testing summary and
+    bug buckets are the same as if the sequences were rendered by the main
+    process.
+
+    The sequences ending with the same request are rendered by the same
+    worker, in order, so that the checkers that only check a request once
+    (e.g. the payload body checker) check it on the same sequence as the main
+    process would.
+
+    """
+    def __init__(self, num_workers):
+        """ Initializes the WorkerPool object
+
+        @param num_workers: The number of worker processes
+        @type  num_workers: Int
+
+        @return: None
+        @rtype : None
+
+        """
+        self._num_workers = num_workers
+        self._context = multiprocessing.get_context('fork')
+
+    def render(self, render, seq_collection, lock=None, checkers=[]):
+        """ Renders each sequence in a worker process and merges the state of
+        the workers into the main process.
+
+        @param render: Renders a sequence, given the sequence and its index
+        @type  render: Func(Sequence, int)
+        @param seq_collection: The sequences to render
+        @type  seq_collection: List[Sequence]
+        @param lock: Lock object used for sync of more than one fuzzing jobs.
+        @type  lock: thread.Lock object
+        @param checkers: The checkers applied by @param render
+        @type  checkers: List[Checker]
+
+        @return: The valid renderings of each sequence, in the order of @param seq_collection
+        @rtype : List[List[Sequence]]
+
+        """
+        global _render, _seq_collection, _checkers
+        if not seq_collection:
+            return []
+
+        shards = self._get_shards(seq_collection)
+        _render, _seq_collection, _checkers = render, seq_collection, checkers
+        try:
+            with self._context.Pool(len(shards)) as pool:
+                results = pool.map(_render_shard, shards, chunksize=1)
+        finally:
+            _render, _seq_collection, _checkers = None, None, []
+
+        valid_renderings = {}
+        bug_bucket_updates = []
+        coverage_entries = []
+        for result in results:
+            Monitor().merge_updates(result.monitor_updates, lock)
+            dependencies.merge_dyn_objects(result.dyn_objects, result.object_creations, result.object_accesses)
+            valid_renderings.update(result.valid_renderings)
+            bug_bucket_updates.extend(result.bug_bucket_updates)
+            coverage_entries.extend(result.coverage_entries)
+            for checker, checker_state in zip(checkers, result.checker_states):
+                checker.merge_state(checker_state)
+            _merge_stats(result.stats)
+
+        # Bucketize the bugs in the order of the sequences that found them
+        bug_bucket_updates.sort(key=lambda update: update[0])
+        for _, update in bug_bucket_updates:
+            BugBuckets.Instance().update_bug_buckets(lock=lock, **update)
+        # Log the spec coverage in the same order
+        coverage_entries.sort(key=lambda entry: entry[0])
+        logger.SpecCoverageLog.Instance().write_entries([entry for _, entry in coverage_entries])
+
+        if any(result.timed_out for result in results):
+            raise TimeOutException("")
+        return [valid_renderings[ith] for ith in range(len(seq_collection))]
+
+    def _get_shards(self, seq_collection):
+        """ Splits the sequences into a shard for each worker, keeping the
+        sequences ending with the same request in the same shard.
+
+        @param seq_collection: The sequences to render
+        @type  seq_collection: List[Sequence]
+
+        @return: The indexes of the sequences of each shard, in order
+        @rtype : List[List[int]]
+
+        """
+        groups = {}
+        for ith, sequence in enumerate(seq_collection):
+            groups.setdefault(sequence.last_request.request_id, []).append(ith)
+
+        # The largest groups are dealt first, each to the smallest shard, to balance the work
+        shards = [[] for _ in range(min(self._num_workers, len(groups)))]
+        for group in sorted(groups.values(), key=len, reverse=True):
+            min(shards, key=len).extend(group)
+        for shard in shards:
+            shard.sort()
+        return shards
@@ -23,6 +23,9 @@ threadLocal = threading.local()
 # Keep TLS tlb to enforce mutual exclusion when using >1 fuzzing jobs.
 threadLocal.tlb = {}
 tlb = threadLocal.tlb
+# The encoded value of each dynamic variable, along with the value it was encoded from,
+# kept until the variable is set again.
+encoded_values = {}
 # The 'local_dyn_objects_cache' tracks dynamic objects that are created while
 # rendering the sequence prefix and must not be deleted until the prefix is no longer in use.
 threadLocal.local_dyn_objects_cache = {}
@@ -44,6 +47,83 @@ RDELIM = '_READER_DELIM'
 main_lock = threading.Semaphore(1)
 
 
+class RenderedData(str):
+    """ A rendered request that contains dependency placeholders.
+
+    Along with the rendered string, it keeps the request split at its
+    placeholders, as it would be by str.split(RDELIM), so that the
+    dependencies can be resolved without scanning and splitting the whole
+    request each time it is sent.
+
+    """
+    def __new__(cls, segments):
+        """ Creates the rendered request from its segments.
+
+        @param segments: The rendered request split at its placeholders; the
+                         variable names are at the odd indexes.
+        @type  segments: List[Str]
+
+        @return: The rendered request
+        @rtype : RenderedData
+
+        """
+        data = str.__new__(cls, RDELIM.join(segments))
+        data.segments = tuple(segments)
+        return data
+
+    def __getnewargs__(self):
+        return (self.segments,)
+
+
+def get_placeholder_blocks(fuzzable):
+    """ Returns the indexes of the blocks that may render a dependency placeholder.
+
+    @param fuzzable: The values of each block of a request definition
+    @type  fuzzable: List[List[Str]]
+
+    @return: The indexes of the blocks with a value that contains a placeholder
+    @rtype : List[Int]
+
+    """
+    return [idx for idx, values in enumerate(fuzzable)
+            if any(isinstance(value, str) and RDELIM in value for value in values)]
+
+
+def split_rendered_values(values, placeholder_blocks):
+    """ Joins the rendered values of a request, keeping the request split at
+    the dependency placeholders found in @param placeholder_blocks.
+
+    @param values: The rendered values of the request blocks
+    @type  values: List[Str]
+    @param placeholder_blocks: The sorted indexes of the blocks that may
+                               contain placeholders
+    @type  placeholder_blocks: List[Int]
+
+    @return: The rendered request, as a RenderedData if it contains placeholders
+    @rtype : Str or RenderedData
+
+    """
+    segments = []
+    literal = []
+    start = 0
+    for idx in placeholder_blocks:
+        value = values[idx]
+        if RDELIM not in value:
+            continue
+        parts = value.split(RDELIM)
+        literal.extend(values[start:idx])
+        literal.append(parts[0])
+        for part in parts[1:]:
+            segments.append("".join(literal))
+            literal = [part]
+        start = idx + 1
+    if not segments:
+        return "".join(values)
+    literal.extend(values[start:])
+    segments.append("".join(literal))
+    return RenderedData(segments)
+
+
 class DynamicVariable:
     """ Dynamic variable object. """
 
@@ -120,9 +200,15 @@ def get_variable(type):
     if not Settings().encode_dynamic_objects:
         return value
 
+    # The value is only encoded again if it was set since it was last encoded
+    cached = encoded_values.get(type)
+    if cached is not None and cached[0] is value:
+        return cached[1]
+
     encoded_value = json.dumps(value)
     if isinstance(value, (str)):
         encoded_value = encoded_value[1:-1]
+    encoded_values[type] = (value, encoded_value)
 
     # thread_id = threading.current_thread().ident
     # print("Getting: {} / Value: {} ({})".format(type, encoded_value, thread_id))
@@ -156,6 +242,7 @@ def set_variable(type, value):
     object_creations += 1
     logger.write_to_main(f"type={type}, value={value}", LogSettings().dependencies)
     tlb[type] = value
+    encoded_values.pop(type, None)
     # thread_id = threading.current_thread().ident
     # print("Setting: {} / Value: {} ({})".format(type, value, thread_id))
     if gc_paused:
@@ -190,6 +277,7 @@ def set_variable_no_gc(type, value):
 
     """
     tlb[type] = value
+    encoded_values.pop(type, None)
 
 
 def reset_tlb():
@@ -201,6 +289,7 @@ def reset_tlb():
     """
     for k in tlb:
         tlb[k] = None
+    encoded_values.clear()
 
 
 def clear_saved_local_dyn_objects():
@@ -271,6 +360,52 @@ def set_saved_dynamic_objects():
     dyn_objects_cache.clear()
 
 
+def pop_dyn_objects():
+    """ Removes the dynamic objects waiting to be garbage collected from the
+    dynamic objects cache and returns them.
+
+    @return: The dynamic objects of each type
+    @rtype : Dict(str, List[str])
+
+    """
+    if dyn_objects_cache_lock is not None:
+        dyn_objects_cache_lock.acquire()
+    dyn_objects = dict(dyn_objects_cache)
+    dyn_objects_cache.clear()
+    if dyn_objects_cache_lock is not None:
+        dyn_objects_cache_lock.release()
+    return dyn_objects
+
+
+def merge_dyn_objects(dyn_objects, num_creations, num_accesses):
+    """ Adds the dynamic objects created by a worker process of the fuzzing
+    run to the dynamic objects cache, so they are garbage collected, along
+    with the worker's book-keeping.
+
+    @param dyn_objects: The value returned by pop_dyn_objects in the worker
+    @type  dyn_objects: Dict(str, List[str])
+    @param num_creations: The number of objects created by the worker
+    @type  num_creations: Int
+    @param num_accesses: The number of object accesses of the worker
+    @type  num_accesses: Int
+
+    @return: None
+    @rtype : None
+
+    """
+    global object_creations, object_accesses
+    object_creations += num_creations
+    object_accesses += num_accesses
+    if dyn_objects_cache_lock is not None:
+        dyn_objects_cache_lock.acquire()
+    for type, values in dyn_objects.items():
+        if type not in dyn_objects_cache:
+            dyn_objects_cache[type] = []
+        dyn_objects_cache[type].extend(values)
+    if dyn_objects_cache_lock is not None:
+        dyn_objects_cache_lock.release()
+
+
 # These codes are used by the garbage collector to determine whether
 # or not a resource can be removed from the dynamic objects cache.
 # 200 and 202 codes indicate that the DELETE request was successful
@@ -474,7 +609,7 @@ class GarbageCollector:
         aging here.
 
         """
-        from restler.engine.core.async_request_utilities import try_async_poll
+        from restler.engine.core.async_request_utilities import submit_async_poll
 
         if not self.overflowing:
             return
@@ -504,13 +639,17 @@ class GarbageCollector:
                 CUSTOM_LOGGING("{}: Polling for status of garbage collection of * {} * objects". \
                                format(formatting.timestamp(), len(self.async_deletions[type])))
 
-            # Go through the polling requests from the previous time applying destructors
-            for value, (rendered_delete_request, response) in self.async_deletions[type]:
-
-                # Get the request used for polling the resource availability
-                responses_to_parse, resource_error, polling_attempted = try_async_poll(
-                    request_data=rendered_delete_request, response=response, max_async_wait_time=async_timeout,
-                    poll_delete_status=True)
+            # Go through the polling requests from the previous time applying destructors.
+            # The deletions are polled concurrently by the shared poller, so that the
+            # GC waits at most async_timeout for all of them instead of for each one.
+            resource_type = f"{destructor.method} {destructor.endpoint_no_dynamic_objects}"
+            polls = [(value, response, submit_async_poll(
+                        request_data=rendered_delete_request, response=response, max_async_wait_time=async_timeout,
+                        poll_delete_status=True, resource_type=resource_type))
+                     for value, (rendered_delete_request, response) in self.async_deletions[type]]
+
+            for value, response, poll in polls:
+                responses_to_parse, resource_error, polling_attempted = poll.result()
 
                 if polling_attempted:
                     status_code = None if not responses_to_parse else responses_to_parse[0].status_code
@@ -5,7 +5,9 @@
 from __future__ import print_function
 
 import os.path
+import queue
 import sys
+import threading
 import datetime
 from datetime import datetime as dt
 import types
@@ -85,6 +87,83 @@ def is_value_generator(candidate_values):
         candidate_values.__name__ == VALUE_GENERATOR_WRAPPER_FUNC_NAME
 
 
+# How often a prefetching thread blocked on a full queue checks whether its values are still needed
+PREFETCH_POLL_INTERVAL_SEC = 0.1
+
+
+def prefetch_generator_values(new_iterator, done_tracker, generator_idx, queue_size):
+    """ Yields the values of a custom value generator, which are generated
+    ahead of time by a background thread into a bounded queue.
+
+    The values are yielded in the order they were generated, so renderings
+    are the same as without prefetching.  As in value_generator_wrapper,
+    the generator is restarted when it is exhausted, and @done_tracker is
+    set when the first value after the restart is reached, or when the
+    generator provides no values.
+
+    @param new_iterator: Creates a new iterator over the generator's values
+    @type  new_iterator: Func
+    @param done_tracker: The generators that were exhausted at least once
+    @type  done_tracker: Dict
+    @param generator_idx: The key of this generator in @done_tracker
+    @type  generator_idx: Int
+    @param queue_size: The maximum number of values generated ahead of time
+    @type  queue_size: Int
+
+    @return: A generator of the values
+    @rtype : Generator
+
+    """
+    values = queue.Queue(maxsize=queue_size)
+    stopped = threading.Event()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                values.put(item, timeout=PREFETCH_POLL_INTERVAL_SEC)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            iter = new_iterator()
+            count = 0
+            while True:
+                try:
+                    item = ('value', next(iter))
+                    count = count + 1
+                except StopIteration as error:
+                    # If the count is zero, no values were provided, so exit
+                    if count == 0:
+                        put(('end', error))
+                        return
+                    item = ('restart', None)
+                    iter = new_iterator()
+                if not put(item):
+                    return
+        except Exception as error:
+            put(('error', error))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            kind, value = values.get()
+            if kind == 'value':
+                yield value
+            elif kind == 'restart':
+                done_tracker[generator_idx] = True
+            elif kind == 'end':
+                done_tracker[generator_idx] = True
+                raise value
+            else:
+                raise value
+    finally:
+        # Stop the background thread when the values are no longer needed
+        stopped.set()
+
+
 class CandidateValues(object):
     def __init__(self):
         self.unquoted_values = []
@@ -178,8 +257,22 @@ class CandidateValuesPool(object):
         self._create_fuzzable_dates()
         self._dates_added = False
         self._value_generators = None
+        # Whether the value generators were seeded with set_random_seed
+        self._seeded_value_generators = False
         self._add_examples = True
         self._add_default_value = True
+        # (primitive, request_id, tag, quoted) -> flattened and quoted candidate values
+        self._flattened_values = {}
+        self._values_version = 0
+
+    @property
+    def values_version(self):
+        """ A number that changes every time the values of the pool are changed """
+        return self._values_version
+
+    def _invalidate_cached_values(self):
+        self._flattened_values = {}
+        self._values_version += 1
 
     def _create_fuzzable_dates(self):
         """ Creates dates for future and past, which can be added to a list
@@ -325,25 +418,23 @@ class CandidateValuesPool(object):
         @param quoted: If True, quote the strings in the quoted list before returning
         @type  quoted: Bool
 
-        @return: Feasible values for a given primitive.
-        @rtype : List or dict
+        @return: Feasible values for a given primitive.  Lists of values are
+                 returned as tuples shared by all the callers, and dicts of
+                 values as copies.
+        @rtype : Tuple or dict
 
         """
 
-        def _flatten_and_quote_candidate_values(candidate_vals):
-            """ Returns a merged list of quoted and unquoted candidate values """
-            # First check for dict type. This can occur if get_candidate_values
-            # was called on a dict type without a specific tag/key.
-            if isinstance(candidate_vals, dict):
-                retval = dict()
-                for key in candidate_vals:
-                    retval[key] = candidate_vals[key].get_flattened_and_quoted_values(quoted)
-            else:
-                retval = candidate_vals.get_flattened_and_quoted_values(quoted)
-            return retval
-
         def get_custom_value_generator(value_generator, examples=examples):
             def value_generator_wrapper(done_tracker, generator_idx):
+                prefetch_size = Settings().value_generator_prefetch_size
+                # The background threads share the generators' random state, so the
+                # values are only reproducible when generated in the rendering thread
+                if prefetch_size and not self._seeded_value_generators \
+                        and Settings().trace_db_replay_file is None:
+                    yield from prefetch_generator_values(lambda: value_generator(examples=examples),
+                                                         done_tracker, generator_idx, prefetch_size)
+                    return
                 iter = value_generator(examples=examples)
                 count = 0
                 while True:
@@ -360,10 +451,6 @@ class CandidateValuesPool(object):
 
             return value_generator_wrapper
 
-        candidate_values = self.candidate_values
-        if request_id and request_id in self.per_endpoint_candidate_values:
-            candidate_values = self.per_endpoint_candidate_values[request_id]
-
         if request_id and request_id in self.per_endpoint_value_generators:
             candidate_value_gen = None
             value_generators = self.per_endpoint_value_generators[request_id]
@@ -394,24 +481,70 @@ class CandidateValuesPool(object):
             if candidate_value_gen:
                 return get_custom_value_generator(candidate_value_gen, examples=examples)
 
+        if not request_id or request_id not in self.per_endpoint_candidate_values:
+            # Endpoints without their own dictionary share the default values
+            request_id = None
+        try:
+            candidate_values = self._get_flattened_values(primitive_name, request_id, tag, quoted)
+        except KeyError:
+            raise CandidateValueException
+        # The memoized dict must not be modified by the caller
+        if isinstance(candidate_values, dict):
+            return dict(candidate_values)
+        return candidate_values
+
+    def _get_flattened_values(self, primitive_name, request_id, tag, quoted):
+        """ Returns the flattened and quoted candidate values of a primitive,
+        memoized until the pool's values are changed.
+
+        @param primitive_name: The primitive whose values we wish to fetch
+        @type  primitive_name: Str
+        @param request_id: The request ID of a request with per-endpoint
+                           values, or None for the default values
+        @type  request_id: Int or None
+        @param tag: The tag (key) when getting for dict types
+        @type  tag: Str
+        @param quoted: If True, quote the quotable values
+        @type  quoted: Bool
+
+        @return: The candidate values
+        @rtype : Tuple, Str or dict
+
+        """
+        def _freeze(values):
+            return tuple(values) if isinstance(values, list) else values
+
+        key = (primitive_name, request_id, tag, quoted)
+        if key in self._flattened_values:
+            return self._flattened_values[key]
+
+        if request_id is None:
+            candidate_values = self.candidate_values
+        else:
+            candidate_values = self.per_endpoint_candidate_values[request_id]
+
         if primitive_name not in candidate_values:
             print("\n\n\n\t *** Can't get unsupported primitive: {}\n\n\n". \
                   format(primitive_name))
             raise CandidateValueException
 
-        try:
-            if tag:
-                if tag in candidate_values[primitive_name]:
-                    return _flatten_and_quote_candidate_values(candidate_values[primitive_name][tag])
+        candidate_vals = candidate_values[primitive_name]
+        if tag:
+            if tag not in candidate_vals and request_id is not None:
                 # tag not specified in per_endpoint values, try sending from default list
-                return _flatten_and_quote_candidate_values(self.candidate_values[primitive_name][tag])
-            else:
-                if primitive_name in candidate_values:
-                    return _flatten_and_quote_candidate_values(candidate_values[primitive_name])
-                # primitive value not specified in per_endpoint values, try sending from default list
-                return _flatten_and_quote_candidate_values(self.candidate_values[primitive_name])
-        except KeyError:
-            raise CandidateValueException
+                return self._get_flattened_values(primitive_name, None, tag, quoted)
+            retval = _freeze(candidate_vals[tag].get_flattened_and_quoted_values(quoted))
+        elif isinstance(candidate_vals, dict):
+            # This can occur if get_candidate_values was called on a dict type
+            # without a specific tag/key.
+            retval = dict()
+            for candidate_key in candidate_vals:
+                retval[candidate_key] = _freeze(candidate_vals[candidate_key].get_flattened_and_quoted_values(quoted))
+        else:
+            retval = _freeze(candidate_vals.get_flattened_and_quoted_values(quoted))
+
+        self._flattened_values[key] = retval
+        return retval
 
     def get_fuzzable_values(self, primitive_type, default_value, request_id=None, quoted=False, examples=[]):
         """ Return list of fuzzable values with a default value (specified)
@@ -483,9 +616,12 @@ class CandidateValuesPool(object):
         """
         attrs = import_utilities.import_attrs(file_path, ["value_generators", "set_random_seed"])
         self._value_generators = attrs[0]
+        self._invalidate_cached_values()
         random_seed_override_fn = attrs[1]
+        self._seeded_value_generators = False
         if random_seed is not None and random_seed_override_fn is not None:
             random_seed_override_fn(random_seed)
+            self._seeded_value_generators = True
 
     def set_per_value_generators(self, per_value_generators):
         for request_id, generator in per_value_generators.items():
@@ -494,6 +630,7 @@ class CandidateValuesPool(object):
                 self.per_endpoint_value_generators[request_id] = attrs[0]
             else:
                 raise FileNotFoundError(f"{generator} not found！")
+        self._invalidate_cached_values()
 
     def set_candidate_values(self, custom_values, per_endpoint_custom_mutations=None):
         """ Overrides default primitive type values with user-provided ones.
@@ -507,6 +644,7 @@ class CandidateValuesPool(object):
         @rtype : None
 
         """
+        self._invalidate_cached_values()
         # Set default primitives
         self.candidate_values = self._set_custom_values(self.candidate_values, custom_values)
         if not self._dates_added:
@@ -0,0 +1,200 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+""" Transport layer fuctionality using asyncio streams. """
+from __future__ import print_function
+import asyncio
+
+from restler.utils.restler_logger import raw_network_logging as RAW_LOGGING
+from restler.engine.errors import TransportLayerException
+from restler.engine.transport_layer.response import *
+from restler.engine.transport_layer.connection_pool import ConnectionPool
+from restler.engine.transport_layer.connection_pool import connection_key
+from restler.engine.transport_layer.rate_limiter import RateLimiter
+from restler.engine.transport_layer.messaging import HttpResponseFraming
+from restler.engine.transport_layer.messaging import RECV_BUFFER_SIZE
+from restler.engine.transport_layer.messaging import contains_connection_closed
+from restler.engine.transport_layer.messaging import get_ssl_context
+from restler.engine.transport_layer.messaging import decode_response_message
+from restler.engine.transport_layer.messaging import encode_request_message
+
+UTF8 = 'utf-8'
+
+
+class AsyncHttpSock(object):
+    """ Asynchronous counterpart of HttpSock.
+
+    Each AsyncHttpSock owns at most one keep-alive connection and sends one
+    request at a time over it; requests are sent concurrently by using
+    several AsyncHttpSock objects on the same event loop.
+
+    """
+    def __init__(self, connection_settings):
+        """ Initializes an asynchronous socket object.
+
+        @param connection_settings: The connection settings for this socket
+        @type  connection_settings: ConnectionSettings
+
+        @return: None
+        @rtype : None
+
+        """
+        self.connection_settings = connection_settings
+        self.ignore_decoding_failures = Settings().ignore_decoding_failures
+        self._reader = None
+        self._writer = None
+
+    async def set_up_connection(self):
+        """ Opens a new connection to the target.
+
+        @return: None
+        @rtype : None
+
+        """
+        try:
+            host = Settings().host
+            target_ip = self.connection_settings.target_ip or host
+            target_port = self.connection_settings.target_port
+            if self.connection_settings.use_ssl:
+                self._reader, self._writer = await asyncio.open_connection(
+                    target_ip, target_port or 443,
+                    ssl=get_ssl_context(self.connection_settings),
+                    server_hostname=host)
+                ConnectionPool().record_tls_handshake(connection_key(self.connection_settings, host),
+                                                      self._writer.get_extra_info('ssl_object'))
+            else:
+                self._reader, self._writer = await asyncio.open_connection(
+                    target_ip, target_port or 80)
+        except Exception as error:
+            raise TransportLayerException(f"Exception Creating Socket: {error!s}")
+
+    async def sendRecv(self, message, req_timeout_sec, reconnect=False):
+        """ Sends a specified request to the server and waits for a response
+
+        @param message: Message to be sent.
+        @type message : Str
+        @param req_timeout_sec: The time, in seconds, to wait for request to complete
+        @type req_timeout_sec : Int
+        @param reconnect: If set, a new connection is created for the request
+        @type  reconnect: Bool
+
+        @return:
+            False if failure, True if success
+            Response if True returned, Error if False returned
+        @rtype : Tuple (Bool, HttpResponse)
+
+        """
+        try:
+            if reconnect or self._writer is None or self._reader.at_eof():
+                self.close()
+                await self.set_up_connection()
+
+            await self._sendRequest(message)
+            method_name = message[0:message.find(" ")]
+            received_response, keep_alive = await self._recvResponse(req_timeout_sec, method_name)
+            if not received_response and not reconnect:
+                # Re-connect and try again, since this may be due to the connection being closed.
+                RAW_LOGGING("Empty response received.  Re-creating connection and re-trying.")
+                return await self.sendRecv(message, req_timeout_sec, reconnect=True)
+            if not keep_alive or Settings().reconnect_on_every_request:
+                self.close()
+            response = HttpResponse(received_response)
+            RAW_LOGGING(f'Received: {response.to_str!r}\n')
+            return (True, response)
+        except TransportLayerException as error:
+            self.close()
+            response = HttpResponse(str(error).strip('"\''))
+            if 'timed out' in str(error):
+                response._status_code = TIMEOUT_CODE
+                RAW_LOGGING(f"Reached max req_timeout_sec of {req_timeout_sec}.")
+            elif contains_connection_closed(str(error)):
+                response._status_code = CONNECTION_CLOSED_CODE
+                RAW_LOGGING(f"Connection error: {error!s}")
+                if not reconnect:
+                    RAW_LOGGING("Re-creating connection and re-trying.")
+                    return await self.sendRecv(message, req_timeout_sec, reconnect=True)
+            else:
+                RAW_LOGGING(f"Unknown error: {error!s}")
+                if not reconnect:
+                    RAW_LOGGING("Re-creating connection and re-trying.")
+                    return await self.sendRecv(message, req_timeout_sec, reconnect=True)
+            return (False, response)
+
+    async def _sendRequest(self, message):
+        """ Sends message over the current connection.
+
+        @param message: Message to be sent.
+        @type message : Str
+
+        @return: None
+        @rtype : None
+
+        """
+        message, segments = encode_request_message(message, self.connection_settings)
+        # Wait for the rate limiter to allow the request, if necessary
+        delay = RateLimiter().reserve(message)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        try:
+            RAW_LOGGING(f'Sending: {message!r}\n')
+            self._writer.writelines(segments)
+            await self._writer.drain()
+        except Exception as error:
+            raise TransportLayerException(f"Exception Sending Data: {error!s}")
+
+    async def _recvResponse(self, req_timeout_sec, method_name):
+        """ Reads one response from the current connection.
+
+        @param req_timeout_sec: The time, in seconds, to wait for request to complete
+        @type req_timeout_sec : Int
+        @param method_name: The HTTP method of the request that was sent
+        @type  method_name: Str
+
+        @return: The data received, and whether the connection can be reused
+        @rtype : Tuple(Str, Bool)
+
+        """
+        framing = HttpResponseFraming(method_name)
+        buf = bytearray()
+        complete = False
+
+        async def read_response():
+            nonlocal complete
+            while True:
+                data = await self._reader.read(RECV_BUFFER_SIZE)
+                if not data:
+                    return
+                buf.extend(data)
+                if framing.update(buf, len(buf)):
+                    complete = True
+                    return
+
+        try:
+            await asyncio.wait_for(read_response(), req_timeout_sec)
+        except asyncio.TimeoutError:
+            raise TransportLayerException("Exception: timed out")
+        except Exception as error:
+            raise TransportLayerException(f"Exception: {error!s}")
+
+        keep_alive = False
+        received = len(buf)
+        if framing.message_length is not None:
+            keep_alive = complete and framing.keep_alive and received == framing.message_length
+            received = min(received, framing.message_length)
+        with memoryview(buf)[:received] as view:
+            return decode_response_message(view, framing, self.ignore_decoding_failures), keep_alive
+
+    def close(self):
+        """ Closes the current connection, if any.
+
+        @return: None
+        @rtype : None
+
+        """
+        if self._writer is not None:
+            try:
+                self._writer.close()
+            except Exception:
+                pass
+        self._reader = None
+        self._writer = None
@@ -0,0 +1,372 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+""" Pool of keep-alive connections and TLS sessions shared by the HttpSock objects. """
+from __future__ import print_function
+import select
+import threading
+import time
+from collections import OrderedDict
+from collections import deque
+
+from restler.restler_settings import Settings
+
+
+def ConnectionPool():
+    """ Accessor for the ConnectionPool singleton """
+    return HttpConnectionPool.Instance()
+
+
+def connection_key(connection_settings, host):
+    """ Returns the key of the pool that holds connections for the specified
+    connection settings.
+
+    @param connection_settings: The connection settings of the socket
+    @type  connection_settings: ConnectionSettings
+    @param host: The host name sent in the requests (and used for SNI)
+    @type  host: Str
+
+    @return: The pool key
+    @rtype : Tuple(Str, Int, Bool, Str)
+
+    """
+    return (connection_settings.target_ip or host,
+            connection_settings.target_port,
+            connection_settings.use_ssl,
+            host)
+
+
+def is_connection_stale(sock):
+    """ Returns whether an idle connection can no longer be used.
+
+    An idle keep-alive connection must not have anything to read: readable
+    data means that the server either closed (or half-closed) the connection
+    or sent unexpected data, so the connection is discarded in both cases.
+
+    @param sock: The idle socket
+    @type  sock: Socket
+
+    @return: True if the connection is stale
+    @rtype : Bool
+
+    """
+    try:
+        if sock.fileno() == -1:
+            return True
+        if hasattr(sock, 'pending') and sock.pending():
+            return True
+        if hasattr(select, 'poll'):
+            poller = select.poll()
+            poller.register(sock, select.POLLIN | select.POLLPRI)
+            return bool(poller.poll(0))
+        readable, _, _ = select.select([sock], [], [], 0)
+        return bool(readable)
+    except (OSError, ValueError):
+        return True
+
+
+class PoolStats(object):
+    """ Counters of the connection pool """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.expired = 0
+        self.evicted = 0
+        self.full_tls_handshakes = 0
+        self.resumed_tls_handshakes = 0
+
+    def merge(self, other):
+        """ Adds the counters of another pool, e.g. of a worker process
+
+        @param other: The counters to add
+        @type  other: PoolStats
+
+        @return: None
+        @rtype : None
+
+        """
+        for name, value in vars(other).items():
+            setattr(self, name, getattr(self, name) + value)
+
+    def tls_dict(self):
+        """ Returns the TLS handshake stats in the format of the testing summary
+
+        @return: The stats
+        @rtype : OrderedDict
+
+        """
+        stats = OrderedDict()
+        stats['full'] = self.full_tls_handshakes
+        stats['resumed'] = self.resumed_tls_handshakes
+        return stats
+
+    def to_dict(self):
+        """ Returns the stats in the format of the testing summary
+
+        @return: The stats
+        @rtype : OrderedDict
+
+        """
+        stats = OrderedDict()
+        stats['hits'] = self.hits
+        stats['misses'] = self.misses
+        stats['stale_connections'] = self.stale
+        stats['idle_evictions'] = self.expired
+        stats['size_limit_evictions'] = self.evicted
+        return stats
+
+
+class HttpConnectionPool(object):
+    __instance = None
+    __instance_lock = threading.Lock()
+
+    @staticmethod
+    def Instance():
+        """ Singleton's instance accessor.  The pool is created with the
+        current settings on first use.
+
+        @return HttpConnectionPool instance
+        @rtype  HttpConnectionPool
+
+        """
+        if HttpConnectionPool.__instance is None:
+            with HttpConnectionPool.__instance_lock:
+                if HttpConnectionPool.__instance is None:
+                    HttpConnectionPool.__instance = HttpConnectionPool(
+                        Settings().max_idle_connections,
+                        Settings().connection_idle_timeout_sec)
+        return HttpConnectionPool.__instance
+
+    @staticmethod
+    def TEST_DeleteInstance():
+        if HttpConnectionPool.__instance is not None:
+            HttpConnectionPool.__instance.close_all()
+        HttpConnectionPool.__instance = None
+
+    @staticmethod
+    def DetachInstance():
+        """ Drops the instance inherited by a worker process, without closing
+        its connections, which are still used by the main process.
+
+        @return: None
+        @rtype : None
+
+        """
+        HttpConnectionPool.__instance = None
+        HttpConnectionPool.__instance_lock = threading.Lock()
+
+    def __init__(self, max_idle_connections, idle_timeout_sec):
+        """ Initializes the connection pool.
+
+        @param max_idle_connections: The maximum number of idle connections
+                                     kept for each target
+        @type  max_idle_connections: Int
+        @param idle_timeout_sec: The time, in seconds, after which an idle
+                                 connection is closed
+        @type  idle_timeout_sec: Int or Float
+
+        @return: None
+        @rtype : None
+
+        """
+        self._max_idle_connections = max_idle_connections
+        self._idle_timeout_sec = idle_timeout_sec
+        self._lock = threading.Lock()
+        # pool key -> deque of (socket, time released), oldest first
+        self._idle = {}
+        # pool key -> the last TLS session established with the target
+        self._tls_sessions = {}
+        self._stats = PoolStats()
+
+    def acquire(self, key):
+        """ Returns an idle connection for the key, if one can be reused.
+
+        @param key: The pool key (see connection_key)
+        @type  key: Tuple
+
+        @return: A connected socket, or None if a new connection must be created
+        @rtype : Socket or None
+
+        """
+        to_close = []
+        sock = None
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                to_close.extend(self._expire(idle, time.time()))
+            while idle:
+                # Take the most recently used connection, which is the least
+                # likely to have been closed by the server.
+                candidate, _ = idle.pop()
+                if is_connection_stale(candidate):
+                    self._stats.stale += 1
+                    to_close.append(candidate)
+                    continue
+                sock = candidate
+                break
+            if sock is None:
+                self._stats.misses += 1
+            else:
+                self._stats.hits += 1
+        _close_all(to_close)
+        return sock
+
+    def release(self, key, sock):
+        """ Returns a connection to the pool after a complete response was read.
+
+        @param key: The pool key (see connection_key)
+        @type  key: Tuple
+        @param sock: The connected socket
+        @type  sock: Socket
+
+        @return: None
+        @rtype : None
+
+        """
+        to_close = []
+        with self._lock:
+            idle = self._idle.setdefault(key, deque())
+            now = time.time()
+            to_close.extend(self._expire(idle, now))
+            idle.append((sock, now))
+            while len(idle) > self._max_idle_connections:
+                oldest, _ = idle.popleft()
+                self._stats.evicted += 1
+                to_close.append(oldest)
+        _close_all(to_close)
+
+    def get_tls_session(self, key):
+        """ Returns the TLS session to resume when connecting to the target.
+
+        @param key: The pool key (see connection_key)
+        @type  key: Tuple
+
+        @return: The last TLS session established with the target, if any
+        @rtype : ssl.SSLSession or None
+
+        """
+        return self._tls_sessions.get(key)
+
+    def record_tls_handshake(self, key, ssl_sock):
+        """ Counts a completed TLS handshake and saves its session for
+        resumption by later connections.
+
+        @param key: The pool key (see connection_key)
+        @type  key: Tuple
+        @param ssl_sock: The socket (or SSL object) that completed the handshake
+        @type  ssl_sock: ssl.SSLSocket or ssl.SSLObject
+
+        @return: None
+        @rtype : None
+
+        """
+        if ssl_sock is None:
+            return
+        with self._lock:
+            if ssl_sock.session_reused:
+                self._stats.resumed_tls_handshakes += 1
+            else:
+                self._stats.full_tls_handshakes += 1
+        self.update_tls_session(key, ssl_sock)
+
+    def update_tls_session(self, key, ssl_sock):
+        """ Saves the TLS session of a connection for resumption by later
+        connections.
+
+        @param key: The pool key (see connection_key)
+        @type  key: Tuple
+        @param ssl_sock: The connected socket (or SSL object)
+        @type  ssl_sock: ssl.SSLSocket or ssl.SSLObject
+
+        @return: None
+        @rtype : None
+
+        """
+        session = ssl_sock.session
+        if session is not None:
+            self._tls_sessions[key] = session
+
+    def close_all(self):
+        """ Closes all idle connections.
+
+        @return: None
+        @rtype : None
+
+        """
+        with self._lock:
+            to_close = [sock for idle in self._idle.values() for sock, _ in idle]
+            self._idle = {}
+        _close_all(to_close)
+
+    def stats(self):
+        """ Returns the pool's hit/miss stats.
+
+        @return: The stats
+        @rtype : OrderedDict
+
+        """
+        with self._lock:
+            return self._stats.to_dict()
+
+    def pop_stats(self):
+        """ Returns the pool's counters, and resets them.  Used by the worker
+        processes of the fuzzing run to return their counters.
+
+        @return: The counters
+        @rtype : PoolStats
+
+        """
+        with self._lock:
+            stats, self._stats = self._stats, PoolStats()
+        return stats
+
+    def merge_stats(self, stats):
+        """ Adds the counters of a worker process of the fuzzing run
+
+        @param stats: The counters, see pop_stats
+        @type  stats: PoolStats
+
+        @return: None
+        @rtype : None
+
+        """
+        with self._lock:
+            self._stats.merge(stats)
+
+    def tls_stats(self):
+        """ Returns the number of full and resumed TLS handshakes.
+
+        @return: The stats
+        @rtype : OrderedDict
+
+        """
+        with self._lock:
+            return self._stats.tls_dict()
+
+    def _expire(self, idle, now):
+        """ Removes the connections that were idle for too long.
+        Must be called with the lock held.
+
+        @param idle: The idle connections of one key, oldest first
+        @type  idle: Deque
+        @param now: The current time
+        @type  now: Float
+
+        @return: The expired connections, to be closed by the caller
+        @rtype : List[Socket]
+
+        """
+        expired = []
+        while idle and now - idle[0][1] > self._idle_timeout_sec:
+            expired.append(idle.popleft()[0])
+            self._stats.expired += 1
+        return expired
+
+
+def _close_all(socks):
+    for sock in socks:
+        try:
+            sock.close()
+        except Exception:
+            pass
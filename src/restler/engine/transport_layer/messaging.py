@@ -3,9 +3,11 @@
 
 """ Transport layer fuctionality using python sockets. """
 from __future__ import print_function
+import hashlib
 import ssl
 import socket
-import time
+import sys
+import tempfile
 import threading
 from restler.utils.logging.trace_db import (DB as TraceDatabase,
                                             SequenceTracker)
@@ -15,6 +17,9 @@ from restler.utils import restler_logger as logger
 from restler.engine.errors import TransportLayerException
 from restler.restler_settings import ConnectionSettings, LogSettings
 from restler.engine.transport_layer.response import *
+from restler.engine.transport_layer.connection_pool import ConnectionPool
+from restler.engine.transport_layer.connection_pool import connection_key
+from restler.engine.transport_layer.rate_limiter import RateLimiter
 
 # todo comment these Testsocket first.
 # if util.find_spec("test_servers"):
@@ -22,12 +27,705 @@ from restler.engine.transport_layer.response import *
 
 DELIM = "\r\n\r\n"
 UTF8 = 'utf-8'
+BYTES_DELIM = DELIM.encode(UTF8)
+BYTES_CRLF = b"\r\n"
+# Body length assumed for responses that declare neither a Content-Length nor
+# a chunked transfer encoding; the reader stops earlier if the server closes.
+DEFAULT_CONTENT_LENGTH = 2 ** 20
+# Body length assumed for such responses when the body is streamed (see max_response_body_bytes)
+UNBOUNDED_CONTENT_LENGTH = sys.maxsize
+RECV_BUFFER_SIZE = 2 ** 16
+# Receive buffers that grew past this size for a large response are dropped
+# instead of being kept for the next one.
+MAX_RETAINED_RECV_BUFFER_SIZE = 2 ** 22
+# Media subtypes of text formats, besides text/* and the +json and +xml suffixes
+TEXT_MEDIA_SUBTYPES = {'json', 'xml', 'javascript', 'x-www-form-urlencoded', 'graphql', 'yaml', 'x-yaml'}
+
+# SSL contexts by connection settings (see get_ssl_context)
+_ssl_contexts = {}
+_ssl_contexts_lock = threading.Lock()
+
+
+class HttpResponseFraming(object):
+    """ Incrementally determines where an HTTP/1.1 response ends.
+
+    The status line and headers are parsed once, as soon as the header
+    delimiter has been received.  The message body is then delimited either
+    by its Content-Length or by decoding the chunked transfer encoding.
+
+    """
+    def __init__(self, method_name, default_content_length=DEFAULT_CONTENT_LENGTH):
+        """ Initializes the framing state for a single response.
+
+        @param method_name: The HTTP method of the request that was sent
+        @type  method_name: Str
+        @param default_content_length: The body length assumed for responses
+                                        whose length is not known in advance
+        @type  default_content_length: Int
 
+        @return: None
+        @rtype : None
 
-class HttpSock(object):
-    __last_request_sent_time = time.time()
-    __request_sem = threading.Semaphore()
+        """
+        self._is_head_request = method_name.upper() == "HEAD"
+        self._default_content_length = default_content_length
+        self._scan_start = 0
+        self._next_chunk_start = None
+        self._length_from_header = True
+        self.header_length = None
+        self.http_version = None
+        self.status_code = None
+        self.headers = {}
+        self.chunked = False
+        # Total length of the response message (header + body), once known
+        self.message_length = None
+
+    @property
+    def keep_alive(self):
+        """ Whether the server keeps the connection open after this response,
+        so that it can be reused for another request.
+
+        @return: True if the connection may be reused
+        @rtype : Bool
 
+        """
+        if self.message_length is None or not self._length_from_header:
+            return False
+        connection = self.headers.get('connection', '').lower()
+        if self.http_version == 'HTTP/1.0':
+            return connection == 'keep-alive'
+        return connection != 'close'
+
+    def update(self, buf, length, base=0):
+        """ Processes the bytes received so far.
+
+        @param buf: The receive buffer
+        @type  buf: Bytearray
+        @param length: The number of valid bytes in @param buf
+        @type  length: Int
+        @param base: The offset in the response of the first byte of @param buf,
+                     when the bytes before it were discarded (once the header
+                     was parsed) and must not be needed again (see resume_offset)
+        @type  base: Int
+
+        @return: True if the complete response has been received
+        @rtype : Bool
+
+        """
+        if self.header_length is None:
+            # Only scan the newly received bytes (plus a possibly split delimiter)
+            start = max(0, self._scan_start - len(BYTES_DELIM) + 1)
+            header_end = buf.find(BYTES_DELIM, start, length)
+            if header_end == -1:
+                self._scan_start = length
+                return False
+            self._parse_header(buf, header_end)
+
+        if self.chunked:
+            return self._update_chunks(buf, length, base)
+        return base + length >= self.message_length
+
+    def _parse_header(self, buf, header_end):
+        """ Parses the status line and the headers of the response.
+
+        @param buf: The receive buffer
+        @type  buf: Bytearray
+        @param header_end: The index of the header delimiter in @param buf
+        @type  header_end: Int
+
+        @return: None
+        @rtype : None
+
+        """
+        self.header_length = header_end + len(BYTES_DELIM)
+        header_lines = buf[:header_end].decode('latin-1').split("\r\n")
+        status_line = header_lines[0].split(" ", 2)
+        self.http_version = status_line[0].upper()
+        if len(status_line) > 1:
+            self.status_code = status_line[1]
+        for line in header_lines[1:]:
+            name, sep, value = line.partition(":")
+            if sep:
+                self.headers[name.strip().lower()] = value.strip()
+
+        if self.status_code in ('204', '304') or self._is_head_request:
+            content_length = 0
+        elif 'chunked' in self.headers.get('transfer-encoding', '').lower():
+            self.chunked = True
+            self._next_chunk_start = self.header_length
+            return
+        else:
+            try:
+                content_length = int(self.headers['content-length'])
+            except (KeyError, ValueError):
+                # The body ends when the server closes the connection
+                self._length_from_header = False
+                content_length = self._default_content_length
+        self.message_length = self.header_length + content_length
+
+    def resume_offset(self, length):
+        """ Returns the offset of the first received byte that is still needed
+        to find the end of the response: the bytes before it may be discarded.
+
+        @param length: The number of bytes of the response received so far
+        @type  length: Int
+
+        @return: The offset
+        @rtype : Int
+
+        """
+        if self.header_length is None:
+            return 0
+        if self.chunked:
+            return min(self._next_chunk_start, length)
+        return length
+
+    def _update_chunks(self, buf, length, base=0):
+        """ Decodes as many complete chunks as have been received.
+
+        @param buf: The receive buffer
+        @type  buf: Bytearray
+        @param length: The number of valid bytes in @param buf
+        @type  length: Int
+        @param base: The offset in the response of the first byte of @param buf
+        @type  base: Int
+
+        @return: True if the last chunk and the trailer section were received
+        @rtype : Bool
+
+        """
+        end = base + length
+        while self._next_chunk_start <= end:
+            chunk_start = self._next_chunk_start
+            line_end = buf.find(BYTES_CRLF, chunk_start - base, length)
+            if line_end == -1:
+                return False
+            # Chunk extensions follow the size, separated by ';'
+            size_field = bytes(buf[chunk_start - base:line_end]).split(b";", 1)[0].strip()
+            try:
+                chunk_size = int(size_field, 16)
+            except ValueError:
+                raise TransportLayerException(f"Invalid chunk size received: {size_field!r}")
+
+            data_start = line_end + len(BYTES_CRLF)
+            if chunk_size == 0:
+                # The last chunk is followed by optional trailers and an empty line
+                if length - data_start < len(BYTES_CRLF):
+                    return False
+                if buf[data_start:data_start + len(BYTES_CRLF)] == BYTES_CRLF:
+                    self.message_length = base + data_start + len(BYTES_CRLF)
+                    return True
+                trailer_end = buf.find(BYTES_DELIM, data_start, length)
+                if trailer_end == -1:
+                    return False
+                self.message_length = base + trailer_end + len(BYTES_DELIM)
+                return True
+            self._next_chunk_start = base + data_start + chunk_size + len(BYTES_CRLF)
+        return False
+
+
+class HttpResponseReader(object):
+    """ Reads HTTP responses from a socket into a reusable byte buffer. """
+    def __init__(self, ignore_decoding_failures=False, max_body_bytes=None, spill_body=False):
+        """ Initializes the reader.
+
+        @param ignore_decoding_failures: Whether to drop bytes that are not
+                                         valid UTF-8 instead of failing
+        @type  ignore_decoding_failures: Bool
+        @param max_body_bytes: The number of body bytes kept in memory, or None
+                               to keep the whole body.  The rest of a larger
+                               body is hashed and discarded as it is received.
+        @type  max_body_bytes: Int or None
+        @param spill_body: Whether the bodies larger than @param max_body_bytes
+                           are also written to a temporary file
+        @type  spill_body: Bool
+
+        @return: None
+        @rtype : None
+
+        """
+        self.ignore_decoding_failures = ignore_decoding_failures
+        self.max_body_bytes = max_body_bytes
+        self.spill_body = spill_body
+        self._buf = bytearray(RECV_BUFFER_SIZE)
+        # Whether the connection can be reused after the last response read
+        self.keep_alive = False
+        # The summary of the body of the last response read, if it was larger than max_body_bytes
+        self.body_overflow = None
+
+    def _reserve(self, size):
+        """ Grows the receive buffer so that it holds at least @param size bytes.
+
+        @param size: The required buffer size
+        @type  size: Int
+
+        @return: None
+        @rtype : None
+
+        """
+        if size > len(self._buf):
+            new_size = max(size, 2 * len(self._buf))
+            self._buf.extend(bytes(new_size - len(self._buf)))
+
+    def read(self, sock, req_timeout_sec, method_name):
+        """ Reads one response from the socket.
+
+        @param sock: The socket to read from
+        @type  sock: Socket
+        @param req_timeout_sec: The time, in seconds, to wait for request to complete
+        @type req_timeout_sec : Int
+        @param method_name: The HTTP method of the request that was sent
+        @type  method_name: Str
+
+        @return: The response received, or what was received before the
+                 connection was closed
+        @rtype : Str
+
+        """
+        capped = self.max_body_bytes is not None
+        # Without a known length, a capped body can be streamed until the server closes
+        framing = HttpResponseFraming(method_name, UNBOUNDED_CONTENT_LENGTH if capped else DEFAULT_CONTENT_LENGTH)
+        received = 0
+        complete = False
+        self.keep_alive = False
+        self.body_overflow = None
+        overflow = None
+        try:
+            sock.settimeout(req_timeout_sec)
+        except Exception as error:
+            raise TransportLayerException(f"Exception: {error!s}")
+
+        while True:
+            if framing.message_length is not None:
+                if capped:
+                    self._reserve(min(framing.message_length,
+                                      framing.header_length + self.max_body_bytes + RECV_BUFFER_SIZE))
+                else:
+                    # The Content-Length is sent by the server and not trusted,
+                    # so the buffer only grows as the response is received.
+                    self._reserve(min(framing.message_length, received + RECV_BUFFER_SIZE))
+            if received == len(self._buf):
+                self._reserve(received + 1)
+            try:
+                with memoryview(self._buf)[received:] as view:
+                    bytes_received = sock.recv_into(view)
+            except Exception as error:
+                raise TransportLayerException(f"Exception: {error!s}")
+            if not bytes_received:
+                break
+            received += bytes_received
+            if framing.update(self._buf, received):
+                complete = True
+                break
+            if capped and framing.header_length is not None and\
+               received > framing.header_length + self.max_body_bytes:
+                overflow = self._start_body_overflow(framing, received)
+                complete, received = self._stream_body_overflow(sock, framing, received, overflow)
+                break
+
+        if framing.message_length is not None:
+            # Data past the end of the response would corrupt the next one
+            self.keep_alive = complete and framing.keep_alive and received == framing.message_length
+            received = min(received, framing.message_length)
+        if capped and framing.header_length is not None:
+            prefix_length = framing.header_length + self.max_body_bytes
+            if overflow is None and received > prefix_length:
+                # The whole body was received at once, but only a prefix is kept
+                overflow = self._start_body_overflow(framing, received)
+            if overflow is not None:
+                self.body_overflow = overflow.close(received - framing.header_length)
+                received = min(received, prefix_length)
+                if is_text_content_type(framing.headers.get('content-type', '')):
+                    # Do not cut the kept prefix in the middle of a character
+                    received = get_utf8_prefix_end(self._buf, framing.header_length, received)
+        try:
+            return self._decode(received, framing)
+        finally:
+            if len(self._buf) > MAX_RETAINED_RECV_BUFFER_SIZE:
+                self._buf = bytearray(RECV_BUFFER_SIZE)
+
+    def _start_body_overflow(self, framing, received):
+        """ Starts hashing (and spilling) a body larger than max_body_bytes,
+        beginning with the body bytes already in the buffer.
+
+        @param framing: The framing of the response
+        @type  framing: HttpResponseFraming
+        @param received: The number of bytes of the response in the buffer
+        @type  received: Int
+
+        @return: The overflow writer
+        @rtype : BodyOverflowWriter
+
+        """
+        overflow = BodyOverflowWriter(self.spill_body)
+        end = received if framing.message_length is None else min(received, framing.message_length)
+        with memoryview(self._buf)[framing.header_length:end] as view:
+            overflow.write(view)
+        return overflow
+
+    def _stream_body_overflow(self, sock, framing, received, overflow):
+        """ Reads the rest of a response whose body is larger than
+        max_body_bytes.  The body is hashed (and spilled) as it is received,
+        and only the bytes that the framing still needs are kept in memory.
+
+        @param sock: The socket to read from
+        @type  sock: Socket
+        @param framing: The framing of the response
+        @type  framing: HttpResponseFraming
+        @param received: The number of bytes of the response received so far
+        @type  received: Int
+        @param overflow: The overflow writer
+        @type  overflow: BodyOverflowWriter
+
+        @return: Whether the complete response was received, and the total
+                 number of bytes received
+        @rtype : Tuple(Bool, Int)
+
+        """
+        window_base = framing.resume_offset(received)
+        window = bytearray(self._buf[window_base:received])
+        while True:
+            try:
+                data = sock.recv(RECV_BUFFER_SIZE)
+            except Exception as error:
+                overflow.close(0)
+                raise TransportLayerException(f"Exception: {error!s}")
+            if not data:
+                return False, received
+            start = received
+            received += len(data)
+            window += data
+            complete = framing.update(window, len(window), window_base)
+            end = received if framing.message_length is None else min(received, framing.message_length)
+            if end > start:
+                overflow.write(memoryview(data)[:end - start])
+            if complete:
+                return True, received
+            resume_offset = framing.resume_offset(received)
+            if resume_offset > window_base:
+                del window[:resume_offset - window_base]
+                window_base = resume_offset
+
+    def _decode(self, length, framing):
+        """ Decodes the first @param length bytes of the buffer.
+
+        @param length: The number of bytes to decode
+        @type  length: Int
+        @param framing: The framing of the response
+        @type  framing: HttpResponseFraming
+
+        @return: The decoded response
+        @rtype : Str
+
+        """
+        with memoryview(self._buf)[:length] as view:
+            return decode_response_message(view, framing, self.ignore_decoding_failures)
+
+
+class BodyOverflowWriter(object):
+    """ Hashes, and optionally writes to a temporary file, a response body
+    that is too large to be kept in memory. """
+    def __init__(self, spill):
+        """ Initializes the writer.
+
+        @param spill: Whether the body is written to a temporary file
+        @type  spill: Bool
+
+        @return: None
+        @rtype : None
+
+        """
+        self._sha256 = hashlib.sha256()
+        self._file = None
+        if spill:
+            self._file = tempfile.NamedTemporaryFile(prefix='restler_response_body_', suffix='.bin',
+                                                     delete=False)
+
+    def write(self, data):
+        """ Processes the next bytes of the body
+
+        @param data: The bytes
+        @type  data: Bytes-like object
+
+        @return: None
+        @rtype : None
+
+        """
+        self._sha256.update(data)
+        if self._file is not None:
+            self._file.write(data)
+
+    def close(self, body_length):
+        """ Finishes writing the body.
+
+        @param body_length: The length of the body, in bytes
+        @type  body_length: Int
+
+        @return: The summary of the body
+        @rtype : ResponseBodyOverflow
+
+        """
+        path = None
+        if self._file is not None:
+            path = self._file.name
+            self._file.close()
+        return ResponseBodyOverflow(body_length, self._sha256.hexdigest(), path)
+
+
+def get_utf8_prefix_end(data, start, end):
+    """ Returns the end of the longest prefix of data[start:end] that does
+    not end in the middle of a UTF-8 encoded character.
+
+    @param data: The encoded data
+    @type  data: Bytes-like object
+    @param start: The start of the data to consider
+    @type  start: Int
+    @param end: The end of the data to consider
+    @type  end: Int
+
+    @return: The end of the prefix
+    @rtype : Int
+
+    """
+    # Find the first byte of the last character, skipping its continuation bytes
+    lead = end
+    while lead > max(start, end - 4) and (data[lead - 1] & 0xC0) == 0x80:
+        lead -= 1
+    if lead == start:
+        return end
+    first_byte = data[lead - 1]
+    if first_byte >= 0xC0:
+        char_length = 2 if first_byte < 0xE0 else 3 if first_byte < 0xF0 else 4
+        if end - (lead - 1) < char_length:
+            return lead - 1
+    return end
+
+
+def is_text_content_type(content_type):
+    """ Returns whether a Content-Type is a text format, which must be decoded
+    as UTF-8 (as opposed to binary formats, such as application/octet-stream).
+
+    @param content_type: The value of the Content-Type header
+    @type  content_type: Str
+
+    @return: True if the content is text
+    @rtype : Bool
+
+    """
+    media_type = content_type.split(';', 1)[0].strip().lower()
+    if not media_type or 'charset=' in content_type.lower():
+        return True
+    main_type, _, sub_type = media_type.partition('/')
+    return main_type == 'text' or sub_type in TEXT_MEDIA_SUBTYPES or \
+        sub_type.endswith('+json') or sub_type.endswith('+xml')
+
+
+def decode_response_message(data, framing, ignore_decoding_failures):
+    """ Decodes a received response.  The body of a response whose Content-Type
+    is not a text format is not decoded as UTF-8, but mapped byte for byte to
+    characters (latin-1), which never fails.
+
+    @param data: The received bytes
+    @type  data: Bytes-like object
+    @param framing: The framing of the response
+    @type  framing: HttpResponseFraming
+    @param ignore_decoding_failures: Whether to drop bytes that are not
+                                     valid UTF-8 instead of failing
+    @type  ignore_decoding_failures: Bool
+
+    @return: The decoded response
+    @rtype : Str
+
+    """
+    header_length = framing.header_length
+    if header_length is None or len(data) <= header_length or\
+       is_text_content_type(framing.headers.get('content-type', '')):
+        return decode_response(data, ignore_decoding_failures)
+    return decode_response(data[:header_length], ignore_decoding_failures) +\
+        str(data[header_length:], 'latin-1')
+
+
+def decode_response(data, ignore_decoding_failures):
+    """ Decodes a received response.
+
+    @param data: The received bytes
+    @type  data: Bytes-like object
+    @param ignore_decoding_failures: Whether to drop bytes that are not
+                                     valid UTF-8 instead of failing
+    @type  ignore_decoding_failures: Bool
+
+    @return: The decoded response
+    @rtype : Str
+
+    """
+    try:
+        return str(data, UTF8)
+    except Exception as ex:
+        if ignore_decoding_failures:
+            RAW_LOGGING(f'Failed to decode data due to {ex}. '
+                        'Trying again while ignoring offending bytes.')
+            return str(data, UTF8, 'ignore')
+        raise
+
+
+def get_ssl_context(connection_settings):
+    """ Returns the SSL context used to connect to the target.  The context
+    (including the client certificate) is created once per connection
+    settings and shared by all sockets, which also allows TLS sessions to
+    be resumed across connections.
+
+    @param connection_settings: The connection settings
+    @type  connection_settings: ConnectionSettings
+
+    @return: The SSL context
+    @rtype : ssl.SSLContext
+
+    """
+    context = _ssl_contexts.get(connection_settings)
+    if context is not None:
+        return context
+    with _ssl_contexts_lock:
+        if connection_settings not in _ssl_contexts:
+            if connection_settings.disable_cert_validation:
+                # context = ssl._create_unverified_context()
+                context = ssl.create_default_context()
+            else:
+                context = ssl.create_default_context()
+            if Settings().client_certificate_path:
+                context.load_cert_chain(
+                    certfile=Settings().client_certificate_path,
+                    keyfile=Settings().client_certificate_key_path,
+                )
+            _ssl_contexts[connection_settings] = context
+        return _ssl_contexts[connection_settings]
+
+
+def detach_ssl_contexts():
+    """ Drops the SSL contexts inherited by a worker process, along with
+    their lock, which may have been held by another thread of the main
+    process when the worker was forked.  The worker creates its own.
+
+    @return: None
+    @rtype : None
+
+    """
+    global _ssl_contexts, _ssl_contexts_lock
+    _ssl_contexts = {}
+    _ssl_contexts_lock = threading.Lock()
+
+
+def encode_request_message(message, connection_settings):
+    """ Encodes a rendered request into the byte segments to send, adding the
+    Content-Length, User-Agent and sequence id headers, as configured.
+
+    The request is encoded once.  The segments are views of the encoded
+    request around the added headers, so that neither the request nor its
+    body is copied again to splice in the headers or to compute the
+    Content-Length.
+
+    @param message: The rendered request
+    @type  message: Str
+    @param connection_settings: The connection settings
+    @type  connection_settings: ConnectionSettings
+
+    @return: The request as sent (for logging), and its byte segments
+    @rtype : Tuple(Str, List[memoryview or bytes])
+
+    """
+    encoded = message.encode(UTF8)
+    # The delimiter is ASCII, so it is found at the same place in the
+    # encoded request as in the string.
+    end_of_header = encoded.find(BYTES_DELIM)
+
+    if end_of_header == -1:
+        RAW_LOGGING(f'Failed to append headers to message: {message!r}\n')
+        raise ValueError("The request does not contain the end of its headers")
+
+    added_headers = []
+    if encoded.find(b"Content-Length: ", 0, end_of_header) == -1:
+        # The length of the body in bytes, which differs from its length in
+        # characters when it contains non-ASCII characters.
+        content_length = len(encoded) - end_of_header - len(BYTES_DELIM)
+        added_headers.append(f"Content-Length: {content_length}")
+    if connection_settings.user_agent is not None:
+        added_headers.append(f"User-Agent: {connection_settings.user_agent}")
+    elif connection_settings.include_user_agent:
+        # Send the RESTler user agent only if a custom user agent is not specified
+        added_headers.append(f"User-Agent: restler/{Settings().version}")
+    if connection_settings.include_unique_sequence_id:
+        sequence_id = SequenceTracker().get_sequence_id()
+        if sequence_id is not None:
+            added_headers.append(f"x-restler-sequence-id: {sequence_id}")
+
+    if not added_headers:
+        return message, [encoded]
+
+    added = "".join("\r\n" + header for header in added_headers)
+    str_end_of_header = message.find(DELIM)
+    message = message[:str_end_of_header] + added + message[str_end_of_header:]
+    view = memoryview(encoded)
+    return message, [view[:end_of_header], added.encode(UTF8), view[end_of_header:]]
+
+
+def send_segments(sock, segments):
+    """ Sends byte segments over a socket without joining them.
+
+    Plain sockets send all of the segments with one sendmsg call (repeated
+    until everything was sent).  SSL sockets do not support sendmsg, so the
+    segments are joined and sent with a single sendall; sending them one at
+    a time would stall each request on Nagle's algorithm and delayed ACKs.
+
+    @param sock: The connected socket
+    @type  sock: Socket
+    @param segments: The segments to send
+    @type  segments: List[bytes-like]
+
+    @return: None
+    @rtype : None
+
+    """
+    if isinstance(sock, ssl.SSLSocket) or not hasattr(sock, 'sendmsg'):
+        sock.sendall(segments[0] if len(segments) == 1 else b"".join(segments))
+        return
+
+    views = [memoryview(segment) for segment in segments if len(segment)]
+    while views:
+        sent = sock.sendmsg(views)
+        # Skip the segments that were sent completely and the sent part of the next one
+        while sent and views:
+            if sent >= len(views[0]):
+                sent -= len(views[0])
+                views.pop(0)
+            else:
+                views[0] = views[0][sent:]
+                sent = 0
+
+
+def contains_connection_closed(error_str):
+    """ Returns whether or not the error string contains a connection closed error
+
+    @param error_str: The error string to check for connection closed error
+    @type  error_str: Str
+
+    @return: True if the error string contains the connection closed error
+    @rtype : Bool
+
+    """
+    # WinError 10054 occurs when the server terminates the connection and RESTler
+    # is being run from a Windows system.
+    # Errno 104 occurs when the server terminates the connection and RESTler
+    # is being run from a Linux system.
+    connection_closed_strings = [
+        # Windows
+        '[WinError 10054]',
+        '[WinError 10053]',
+        # Linux
+        '[Errno 104]'
+    ]
+    return any(filter(lambda x: x in error_str, connection_closed_strings))
+
+
+class HttpSock(object):
     def set_up_connection(self):
         try:
             host = Settings().host
@@ -39,19 +737,13 @@ class HttpSock(object):
             elif self.connection_settings.use_ssl:
             """
             if self.connection_settings.use_ssl:
-                if self.connection_settings.disable_cert_validation:
-                    # context = ssl._create_unverified_context()
-                    context = ssl.create_default_context()
-                else:
-                    context = ssl.create_default_context()
-                if Settings().client_certificate_path:
-                    context.load_cert_chain(
-                        certfile=Settings().client_certificate_path,
-                        keyfile=Settings().client_certificate_key_path,
-                    )
-
+                context = get_ssl_context(self.connection_settings)
+                pool_key = self._pool_key()
+                # Resume the last TLS session to the target to skip the full handshake
+                session = ConnectionPool().get_tls_session(pool_key)
                 with socket.create_connection((target_ip, target_port or 443)) as sock:
-                    self._sock = context.wrap_socket(sock, server_hostname=host)
+                    self._sock = context.wrap_socket(sock, server_hostname=host, session=session)
+                ConnectionPool().record_tls_handshake(pool_key, self._sock)
 
             else:
                 self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -69,12 +761,13 @@ class HttpSock(object):
         @rtype : None
 
         """
-        self._request_throttle_sec = (float)(Settings().request_throttle_ms / 1000.0) \
-            if Settings().request_throttle_ms else None
-
         self.connection_settings = connection_settings
 
         self.ignore_decoding_failures = Settings().ignore_decoding_failures
+        self._response_reader = HttpResponseReader(self.ignore_decoding_failures,
+                                                   Settings().max_response_body_bytes,
+                                                   Settings().response_body_overflow == 'spill')
+        self._use_pool = not Settings().use_test_socket and Settings().max_idle_connections > 0
         self._connected = False
         self._sock = None
 
@@ -107,11 +800,7 @@ class HttpSock(object):
 
         try:
             if reconnect or not self._connected:
-                if reconnect:
-                    if self._sock:
-                        self._closeSocket()
-                self.set_up_connection()
-                self._connected = True
+                self._connect(reconnect)
 
             self._sendRequest(message)
             logger.write_to_main(f"message={message}", True)
@@ -124,7 +813,11 @@ class HttpSock(object):
                     RAW_LOGGING("Empty response received.  Re-creating connection and re-trying.")
                     return self.sendRecv(message, req_timeout_sec, reconnect=True)
                 logger.write_to_main(f"received_response={received_response}", True)
-                response = HttpResponse(received_response)
+                response = HttpResponse(received_response, self._response_reader.body_overflow)
+                if response.body_overflow is not None:
+                    RAW_LOGGING(f"Response body truncated to {Settings().max_response_body_bytes} bytes: "
+                                f"{response.body_overflow!s}")
+                self._finish_response()
             else:
                 response = self._sock.recv()
             RAW_LOGGING(f'Received: {response.to_str!r}\n')
@@ -135,11 +828,14 @@ class HttpSock(object):
                 )
             return (True, response)
         except TransportLayerException as error:
+            # The connection may still carry (part of) the response, so it
+            # must not be used for another request.
+            self._discard_connection()
             response = HttpResponse(str(error).strip('"\''))
             if 'timed out' in str(error):
                 response._status_code = TIMEOUT_CODE
                 RAW_LOGGING(f"Reached max req_timeout_sec of {req_timeout_sec}.")
-            elif self._contains_connection_closed(str(error)):
+            elif contains_connection_closed(str(error)):
                 response._status_code = CONNECTION_CLOSED_CODE
                 RAW_LOGGING(f"Connection error: {error!s}")
                 if not reconnect:
@@ -152,28 +848,65 @@ class HttpSock(object):
                     return self.sendRecv(message, req_timeout_sec, reconnect=True)
             return (False, response)
 
-    def _contains_connection_closed(self, error_str):
-        """ Returns whether or not the error string contains a connection closed error
+    def _pool_key(self):
+        """ Returns the key of the connection pool for this socket's connections
 
-        @param error_str: The error string to check for connection closed error
-        @type  error_str: Str
+        @return: The pool key
+        @rtype : Tuple
 
-        @return: True if the error string contains the connection closed error
-        @rtype : Bool
+        """
+        return connection_key(self.connection_settings, Settings().host)
+
+    def _connect(self, reconnect):
+        """ Obtains a connection for the next request, reusing an idle
+        keep-alive connection from the pool unless @param reconnect is set.
+
+        @param reconnect: If set, a new connection is created
+        @type  reconnect: Bool
+
+        @return: None
+        @rtype : None
+
+        """
+        self._discard_connection()
+        if not reconnect and self._use_pool:
+            self._sock = ConnectionPool().acquire(self._pool_key())
+        if self._sock is None:
+            self.set_up_connection()
+        self._connected = True
+
+    def _finish_response(self):
+        """ Returns the connection to the pool once a complete response was
+        read, or closes it if it cannot be reused.
+
+        @return: None
+        @rtype : None
+
+        """
+        if self.connection_settings.use_ssl and not Settings().use_test_socket:
+            # With TLS 1.3, the session ticket is only received after the handshake
+            ConnectionPool().update_tls_session(self._pool_key(), self._sock)
+        if not self._response_reader.keep_alive or Settings().reconnect_on_every_request:
+            self._discard_connection()
+        elif self._use_pool:
+            ConnectionPool().release(self._pool_key(), self._sock)
+            self._sock = None
+            self._connected = False
+
+    def _discard_connection(self):
+        """ Closes the current connection, if any, ignoring errors.
+
+        @return: None
+        @rtype : None
 
         """
-        # WinError 10054 occurs when the server terminates the connection and RESTler
-        # is being run from a Windows system.
-        # Errno 104 occurs when the server terminates the connection and RESTler
-        # is being run from a Linux system.
-        connection_closed_strings = [
-            # Windows
-            '[WinError 10054]',
-            '[WinError 10053]',
-            # Linux
-            '[Errno 104]'
-        ]
-        return any(filter(lambda x: x in error_str, connection_closed_strings))
+        if self._sock:
+            try:
+                self._sock.close()
+            except Exception:
+                pass
+        self._sock = None
+        self._connected = False
 
     def _sendRequest(self, message):
         """ Sends message via current instance of socket object.
@@ -185,37 +918,10 @@ class HttpSock(object):
         @rtype : None
 
         """
+        message, segments = encode_request_message(message, self.connection_settings)
 
-        def _get_end_of_header(message):
-            return message.index(DELIM)
-
-        def _get_start_of_body(message):
-            return _get_end_of_header(message) + len(DELIM)
-
-        def _append_to_header(message, content):
-            header = message[:_get_end_of_header(message)] + "\r\n" + content + DELIM
-            return header + message[_get_start_of_body(message):]
-        if "Content-Length: " not in message:
-            try:
-                # 字符串有中文时长度和bytes长度不一样！！
-                contentlen = len(message[_get_start_of_body(message):].encode('utf-8'))
-                # contentlen = len(message[_get_start_of_body(message):])
-                message = _append_to_header(message, f"Content-Length: {contentlen}")
-            except Exception as error:
-                RAW_LOGGING(f'Failed to append Content-Length header to message: {message!r}\n')
-                raise error
-        if self.connection_settings.user_agent is not None:
-            message = _append_to_header(message, f"User-Agent: {self.connection_settings.user_agent}")
-        elif self.connection_settings.include_user_agent:
-            # Send the RESTler user agent only if a custom user agent is not specified
-            message = _append_to_header(message, f"User-Agent: restler/{Settings().version}")
-        if self.connection_settings.include_unique_sequence_id:
-            sequence_id = SequenceTracker().get_sequence_id()
-            if sequence_id is not None:
-                message = _append_to_header(message, f"x-restler-sequence-id: {sequence_id}")
-
-        # Attempt to throttle the request if necessary
-        self._begin_throttle_request()
+        # Wait for the rate limiter to allow the request, if necessary
+        RateLimiter().acquire(message)
 
         try:
             RAW_LOGGING(f'Sending: {message!r}\n')
@@ -225,135 +931,23 @@ class HttpSock(object):
                     timestamp=iso_timestamp()
                 )
             logger.write_to_main(f"message={message}", False)
-            self._sock.sendall(message.encode(UTF8))
+            send_segments(self._sock, segments)
         except Exception as error:
             raise TransportLayerException(f"Exception Sending Data: {error!s}")
-        finally:
-            self._end_throttle_request()
-
-    def _begin_throttle_request(self):
-        """ Will attempt to throttle a request by comparing the last time
-        a request was sent to the throttle time (if any).
-
-        @return: None
-        @rtype : None
-
-        """
-        if self._request_throttle_sec:
-            HttpSock.__request_sem.acquire()
-            elapsed = time.time() - HttpSock.__last_request_sent_time
-            throttle_time_remaining = self._request_throttle_sec - elapsed
-            if throttle_time_remaining > 0:
-                time.sleep(throttle_time_remaining)
-
-    def _end_throttle_request(self):
-        """ Will release the throttle lock (if held), so another
-        request can be sent.
-
-        Sets last_request_sent_time
-
-        @return: None
-        @rtype : None
-
-        """
-        if self._request_throttle_sec:
-            HttpSock.__last_request_sent_time = time.time()
-            HttpSock.__request_sem.release()
 
     def _recvResponse(self, req_timeout_sec, method_name):
         """ Reads data from socket object.
 
         @param req_timeout_sec: The time, in seconds, to wait for request to complete
         @type req_timeout_sec : Int
+        @param method_name: The HTTP method of the request that was sent
+        @type  method_name: Str
 
         @return: Data received on current socket.
         @rtype : Str
 
         """
-        global DELIM
-        data = ''
-
-        def decode_buf(buf):
-            try:
-                return buf.decode(UTF8)
-            except Exception as ex:
-                if self.ignore_decoding_failures:
-                    RAW_LOGGING(f'Failed to decode data due to {ex}. \
-                        Trying again while ignoring offending bytes.')
-                    return buf.decode(UTF8, "ignore")
-                else:
-                    raise
-
-        # get the data of header (and maybe more)
-        bytes_received = 0
-        while DELIM not in data:
-            try:
-                self._sock.settimeout(req_timeout_sec)
-                buf = self._sock.recv(2 ** 20)
-                bytes_received += len(buf)
-            except Exception as error:
-                raise TransportLayerException(f"Exception: {error!s}")
-
-            if len(buf) == 0:
-                return data
-
-            data += decode_buf(buf)
-
-        # Handle chunk encoding
-        chuncked_encoding = False
-        if 'Transfer-Encoding: chunked\r\n' in data or \
-                'transfer-encoding: chunked\r\n' in data:
-            # Handle corner case of single-chunk data transfer. Without this
-            # check, the next recv call on _sock will hang until timeout.
-            if data.endswith(DELIM):
-                return data
-            chuncked_encoding = True
-        if chuncked_encoding:
-            while True:
-                try:
-                    buf = self._sock.recv(2 ** 20)
-                    bytes_received += len(buf)
-                except Exception as error:
-                    raise TransportLayerException(f"Exception: {error!s}")
-
-                if len(buf) == 0:
-                    return data
-
-                data += decode_buf(buf)
-
-                if data.endswith(DELIM):
-                    return data
-
-        header_len = data.index(DELIM) + len(DELIM)
-
-        if data[:12] in ["HTTP/1.1 204", "HTTP/1.1 304"]:
-            content_len = 0
-        elif method_name.upper() == "HEAD":
-            content_len = 0
-        else:
-            try:
-                data_lower = data.lower()
-                content_len = data_lower.split("content-length: ")[1]
-                content_len = int(content_len.split('\r\n')[0])
-            except Exception as error:
-                content_len = 2 ** 20
-
-        bytes_remain = content_len - bytes_received + header_len
-
-        # get rest of socket data
-        while bytes_remain > 0:
-            try:
-                buf = self._sock.recv(2 ** 20)
-            except Exception as error:
-                raise TransportLayerException(f"Exception: {error!s}")
-
-            if len(buf) == 0:
-                return data
-
-            bytes_remain -= len(buf)
-            data += decode_buf(buf)
-
-        return data
+        return self._response_reader.read(self._sock, req_timeout_sec, method_name)
 
     def _closeSocket(self):
         """ Closes open socket object.
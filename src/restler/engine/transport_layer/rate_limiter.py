@@ -0,0 +1,463 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+""" Token-bucket rate limiting of the requests sent to the service under test. """
+from __future__ import print_function
+import email.utils
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from restler.restler_settings import Settings
+
+# Status codes whose Retry-After header asks the client to slow down
+BACKPRESSURE_CODES = {'429', '503'}
+# Factor applied to the rate of a bucket when the service signals backpressure
+BACKOFF_FACTOR = 0.5
+# Fraction of the configured rate that is recovered with each successful response
+RECOVERY_FRACTION = 0.05
+# Lowest fraction of the configured rate an adaptive bucket is slowed down to
+MIN_RATE_FRACTION = 0.05
+
+HOST_HEADER = re.compile(r'\r\nHost:\s*([^\r\n]*)', re.IGNORECASE)
+
+
+def RateLimiter():
+    """ Accessor for the RequestRateLimiter singleton """
+    return RequestRateLimiter.Instance()
+
+
+def get_endpoint(message):
+    """ Returns the method and path (without the query) of a rendered request.
+
+    @param message: The rendered request
+    @type  message: Str
+
+    @return: The method and path, or None if the request line is malformed
+    @rtype : Tuple(Str, Str) or None
+
+    """
+    request_line = message[:message.find('\r\n')].split(' ')
+    if len(request_line) < 2:
+        return None
+    return (request_line[0], request_line[1].split('?', 1)[0])
+
+
+def parse_retry_after(value, now=None):
+    """ Parses the value of a Retry-After header.
+
+    @param value: The header value, either a number of seconds or an HTTP date
+    @type  value: Str
+    @param now: The current time (used for HTTP dates)
+    @type  now: Float
+
+    @return: The number of seconds to wait, or None if the value is invalid
+    @rtype : Float or None
+
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_time = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if retry_time is None:
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, retry_time.timestamp() - now)
+
+
+def get_retry_after(response):
+    """ Returns the delay requested by a response's Retry-After header.
+
+    @param response: The response
+    @type  response: HttpResponse
+
+    @return: The number of seconds to wait, or None if the response does not
+             have a valid Retry-After header
+    @rtype : Float or None
+
+    """
+    for name, value in response.headers_dict.items():
+        if name.strip().lower() == 'retry-after':
+            return parse_retry_after(value)
+    return None
+
+
+class TokenBucket(object):
+    """ A thread-safe token bucket.
+
+    Tokens are added at @rate per second up to @burst tokens.  Callers reserve
+    a token under a short-lived lock and then wait for it without holding the
+    lock, so concurrent senders are spaced out instead of serialized.
+
+    """
+    def __init__(self, rate, burst=1, adaptive=False):
+        """ Initializes a token bucket.
+
+        @param rate: The number of tokens added per second
+        @type  rate: Float
+        @param burst: The maximum number of tokens in the bucket
+        @type  burst: Int
+        @param adaptive: Whether the rate is lowered when the service signals
+                         backpressure and recovered with successful responses
+        @type  adaptive: Bool
+
+        @return: None
+        @rtype : None
+
+        """
+        self._configured_rate = float(rate)
+        self._rate = float(rate)
+        self._burst = max(1, burst)
+        self._adaptive = adaptive
+        self._tokens = float(self._burst)
+        self._last_update = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def reserve(self):
+        """ Takes a token from the bucket.  The bucket may go into debt, in
+        which case the caller must wait before sending its request.
+
+        @return: The time, in seconds, to wait before the token may be used
+        @rtype : Float
+
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._burst, self._tokens + (now - self._last_update) * self._rate)
+            self._last_update = now
+            self._tokens -= 1
+            delay = 0.0
+            if self._tokens < 0:
+                delay = -self._tokens / self._rate
+            return max(delay, self._blocked_until - now)
+
+    def acquire(self):
+        """ Waits until a token is available.
+
+        @return: The time, in seconds, that was spent waiting
+        @rtype : Float
+
+        """
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def pause(self, delay_sec):
+        """ Blocks the bucket for a given time, e.g. as requested by Retry-After.
+
+        @param delay_sec: The time, in seconds, during which no tokens are granted
+        @type  delay_sec: Float
+
+        @return: None
+        @rtype : None
+
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._blocked_until = max(self._blocked_until, now + delay_sec)
+            # Do not let the tokens accumulated before the pause be spent in a burst after it
+            self._tokens = min(self._tokens, 1.0)
+
+    def slow_down(self):
+        """ Lowers the rate of an adaptive bucket after backpressure.
+
+        @return: None
+        @rtype : None
+
+        """
+        if not self._adaptive:
+            return
+        with self._lock:
+            self._rate = max(self._configured_rate * MIN_RATE_FRACTION, self._rate * BACKOFF_FACTOR)
+
+    def speed_up(self):
+        """ Recovers part of the configured rate of an adaptive bucket after a
+        successful response.
+
+        @return: None
+        @rtype : None
+
+        """
+        if not self._adaptive or self._rate >= self._configured_rate:
+            return
+        with self._lock:
+            self._rate = min(self._configured_rate, self._rate + self._configured_rate * RECOVERY_FRACTION)
+
+
+class RateLimiterStats(object):
+    """ Counters of the rate limiter """
+    def __init__(self):
+        self.throttled_requests = 0
+        self.throttle_wait_sec = 0.0
+        self.backpressure_responses = 0
+
+    def merge(self, other):
+        """ Adds the counters of another rate limiter, e.g. of a worker process
+
+        @param other: The counters to add
+        @type  other: RateLimiterStats
+
+        @return: None
+        @rtype : None
+
+        """
+        self.throttled_requests += other.throttled_requests
+        self.throttle_wait_sec += other.throttle_wait_sec
+        self.backpressure_responses += other.backpressure_responses
+
+    def to_dict(self):
+        """ Returns the stats in the format of the testing summary
+
+        @return: The stats
+        @rtype : OrderedDict
+
+        """
+        stats = OrderedDict()
+        stats['throttled_requests'] = self.throttled_requests
+        stats['throttle_wait_sec'] = round(self.throttle_wait_sec, 3)
+        stats['backpressure_responses'] = self.backpressure_responses
+        return stats
+
+
+class RequestRateLimiter(object):
+    __instance = None
+    __instance_lock = threading.Lock()
+
+    @staticmethod
+    def Instance():
+        """ Singleton's instance accessor.  The limiter is created with the
+        current settings on first use.
+
+        @return RequestRateLimiter instance
+        @rtype  RequestRateLimiter
+
+        """
+        if RequestRateLimiter.__instance is None:
+            with RequestRateLimiter.__instance_lock:
+                if RequestRateLimiter.__instance is None:
+                    settings = Settings()
+                    rate = settings.rate_limit_requests_per_second
+                    burst = settings.rate_limit_burst
+                    if rate is None and settings.request_throttle_ms:
+                        # A minimum delay between requests is a bucket that holds a single token
+                        rate = 1000.0 / settings.request_throttle_ms
+                        burst = 1
+                    RequestRateLimiter.__instance = RequestRateLimiter(
+                        rate, burst,
+                        scope=settings.rate_limit_scope,
+                        max_concurrent_requests=settings.rate_limit_max_concurrent_requests,
+                        adaptive=settings.rate_limit_adaptive)
+        return RequestRateLimiter.__instance
+
+    @staticmethod
+    def TEST_DeleteInstance():
+        RequestRateLimiter.__instance = None
+
+    @staticmethod
+    def DetachInstance():
+        """ Drops the instance inherited by a worker process, whose locks may
+        have been held by another thread of the main process when the worker
+        was forked.  The worker limits its own requests.
+
+        @return: None
+        @rtype : None
+
+        """
+        RequestRateLimiter.__instance = None
+        RequestRateLimiter.__instance_lock = threading.Lock()
+
+    def __init__(self, rate, burst=1, scope='global', max_concurrent_requests=None, adaptive=False):
+        """ Initializes the rate limiter.
+
+        @param rate: The maximum number of requests sent per second for each
+                     scope key, or None to not limit the rate
+        @type  rate: Float or None
+        @param burst: The number of requests that may be sent at once
+        @type  burst: Int
+        @param scope: 'global' to share one limit across all requests, 'host'
+                      for one limit per Host, or 'endpoint' for one limit per
+                      method and path
+        @type  scope: Str
+        @param max_concurrent_requests: The maximum number of requests waiting
+                                        for a response for each scope key
+        @type  max_concurrent_requests: Int or None
+        @param adaptive: Whether backpressure responses pause the requests and
+                         lower the rate.  Otherwise, the rate is fixed.
+        @type  adaptive: Bool
+
+        @return: None
+        @rtype : None
+
+        """
+        self._rate = rate
+        self._burst = burst
+        self._scope = scope
+        self._max_concurrent_requests = max_concurrent_requests
+        self._adaptive = adaptive
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._semaphores = {}
+        self._stats = RateLimiterStats()
+
+    @property
+    def enabled(self):
+        return self._rate is not None or self._max_concurrent_requests is not None
+
+    def get_key(self, message):
+        """ Returns the scope key of a rendered request.
+
+        @param message: The rendered request
+        @type  message: Str
+
+        @return: The key of the bucket that limits the request
+        @rtype : Str or Tuple
+
+        """
+        if self._scope == 'host':
+            match = HOST_HEADER.search(message)
+            return match.group(1).strip() if match else ''
+        if self._scope == 'endpoint':
+            return get_endpoint(message) or ''
+        return ''
+
+    def _get_bucket(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.setdefault(key, TokenBucket(self._rate, self._burst, self._adaptive))
+        return bucket
+
+    def reserve(self, message):
+        """ Reserves the right to send a request.
+
+        @param message: The rendered request
+        @type  message: Str
+
+        @return: The time, in seconds, to wait before sending the request
+        @rtype : Float
+
+        """
+        if self._rate is None:
+            return 0.0
+        delay = self._get_bucket(self.get_key(message)).reserve()
+        if delay > 0:
+            with self._lock:
+                self._stats.throttled_requests += 1
+                self._stats.throttle_wait_sec += delay
+        return delay
+
+    def acquire(self, message):
+        """ Waits until a request may be sent.
+
+        @param message: The rendered request
+        @type  message: Str
+
+        @return: None
+        @rtype : None
+
+        """
+        delay = self.reserve(message)
+        if delay > 0:
+            time.sleep(delay)
+
+    def concurrency_slot(self, message):
+        """ Returns the semaphore that bounds the requests waiting for a
+        response for the request's scope key.
+
+        @param message: The rendered request
+        @type  message: Str
+
+        @return: The semaphore, or None if concurrency is not limited
+        @rtype : threading.BoundedSemaphore or None
+
+        """
+        if self._max_concurrent_requests is None:
+            return None
+        key = self.get_key(message)
+        semaphore = self._semaphores.get(key)
+        if semaphore is None:
+            with self._lock:
+                semaphore = self._semaphores.setdefault(
+                    key, threading.BoundedSemaphore(self._max_concurrent_requests))
+        return semaphore
+
+    def on_response(self, message, response):
+        """ Adapts the rate of the request's bucket to the service's feedback,
+        if the limiter is adaptive.
+
+        Backpressure responses (429, or 503 with Retry-After) pause the bucket
+        for the requested time and lower its rate; successful responses
+        gradually restore it.
+
+        @param message: The rendered request
+        @type  message: Str
+        @param response: The response received
+        @type  response: HttpResponse
+
+        @return: None
+        @rtype : None
+
+        """
+        if self._rate is None or not self._adaptive or response is None or response.status_code is None:
+            return
+        bucket = self._get_bucket(self.get_key(message))
+        if response.status_code in BACKPRESSURE_CODES:
+            retry_after = get_retry_after(response)
+            if retry_after is None and response.status_code != '429':
+                return
+            with self._lock:
+                self._stats.backpressure_responses += 1
+            if retry_after is not None:
+                bucket.pause(retry_after)
+            bucket.slow_down()
+        else:
+            bucket.speed_up()
+
+    def stats(self):
+        """ Returns the rate limiter's stats.
+
+        @return: The stats
+        @rtype : OrderedDict
+
+        """
+        with self._lock:
+            return self._stats.to_dict()
+
+    def pop_stats(self):
+        """ Returns the rate limiter's counters, and resets them.  Used by the
+        worker processes of the fuzzing run to return their counters.
+
+        @return: The counters
+        @rtype : RateLimiterStats
+
+        """
+        with self._lock:
+            stats, self._stats = self._stats, RateLimiterStats()
+        return stats
+
+    def merge_stats(self, stats):
+        """ Adds the counters of a worker process of the fuzzing run
+
+        @param stats: The counters, see pop_stats
+        @type  stats: RateLimiterStats
+
+        @return: None
+        @rtype : None
+
+        """
+        with self._lock:
+            self._stats.merge(stats)
@@ -1,6 +1,6 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
-import string
+import json
 import re
 from restler.restler_settings import Settings
 
@@ -14,24 +14,147 @@ RESTLER_BUG_CODES = [TIMEOUT_CODE, CONNECTION_CLOSED_CODE]
 # of a sequence because the sequence failed prior to that request being reached.
 RESTLER_INVALID_CODE = '999'
 
+# Characters that may precede the JSON payload in a body (chunk sizes and CRLFs),
+# followed by the character that starts the payload
+JSON_START = re.compile(r'[0-9a-fA-F\r\n ]*([{\[])')
+# Marks the memoized values of an HttpResponse that were not computed yet
+_NOT_PARSED = object()
+
+# The custom bug code patterns, combined and compiled once per settings object
+_bug_code_settings = None
+_bug_code_results = {}
+_custom_bug_codes = None
+_custom_non_bug_codes = None
+
+
+def _combine_patterns(patterns):
+    """ Combines status code patterns into a single compiled pattern, which
+    matches a status code if any of the patterns matches it.
+
+    @param patterns: The compiled patterns
+    @type  patterns: List[re.Pattern]
+
+    @return: The combined pattern, or None if there are no patterns
+    @rtype : re.Pattern or None
+
+    """
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{pattern.pattern})" for pattern in patterns))
+
+
+def is_bug_code(status_code):
+    """ Returns True if the status code is considered a bug.  The result is
+    memoized for each status code.
+
+    @param status_code: The status code
+    @type  status_code: Str
+
+    @return: True if the status code is considered a bug
+    @rtype : Bool
+
+    """
+    global _bug_code_settings, _bug_code_results, _custom_bug_codes, _custom_non_bug_codes
+    settings = Settings()
+    if settings is not _bug_code_settings:
+        _custom_bug_codes = _combine_patterns(settings.custom_bug_codes)
+        _custom_non_bug_codes = _combine_patterns(settings.custom_non_bug_codes)
+        _bug_code_results = {}
+        _bug_code_settings = settings
+
+    try:
+        return _bug_code_results[status_code]
+    except KeyError:
+        pass
+
+    if _custom_non_bug_codes is not None:
+        # All codes except the ones in the custom_non_bug_codes list should be flagged as bugs.
+        # Hence, return False only if the status code exists in the list.
+        result = _custom_non_bug_codes.match(status_code) is None
+    elif status_code.startswith('5'):
+        result = True
+    else:
+        result = _custom_bug_codes is not None and _custom_bug_codes.match(status_code) is not None
+    _bug_code_results[status_code] = result
+    return result
+
+
+class ResponseBodyOverflow(object):
+    """ Summary of a response body that was larger than max_response_body_bytes,
+    of which only a prefix is kept in the HttpResponse """
+    __slots__ = ('body_length', 'sha256', 'path')
+
+    def __init__(self, body_length, sha256, path=None):
+        """ Initializes the summary
+
+        @param body_length: The length of the whole body, in bytes, as received
+                            (including the chunked transfer encoding, if any)
+        @type  body_length: Int
+        @param sha256: The SHA-256 hex digest of the whole body, as received
+        @type  sha256: Str
+        @param path: The path of the temporary file that contains the whole
+                     body, if it was spilled to a file
+        @type  path: Str or None
+
+        """
+        self.body_length = body_length
+        self.sha256 = sha256
+        self.path = path
+
+    def __getstate__(self):
+        return (self.body_length, self.sha256, self.path)
+
+    def __setstate__(self, state):
+        self.body_length, self.sha256, self.path = state
+
+    def __str__(self):
+        location = f", saved to {self.path}" if self.path else ""
+        return f"{self.body_length} bytes, sha256={self.sha256}{location}"
+
+
 class HttpResponse(object):
-    def __init__(self, response_str: str=None):
+    __slots__ = ('_str', '_status_code', '_header_end', '_headers', '_headers_dict',
+                 '_json_body', '_json_object', 'body_overflow')
+
+    def __init__(self, response_str: str=None, body_overflow=None):
         """ Initializes an HttpResponse object
 
+        The status code is parsed right away.  The header and body offsets,
+        the headers and the JSON body are parsed on first use and memoized.
+
         @param response_str: The response that was received from the server
+        @param body_overflow: If the body was larger than max_response_body_bytes,
+                              the summary of the whole body (the response then
+                              only contains a prefix of the body)
+        @type  body_overflow: ResponseBodyOverflow or None
 
         """
+        self.body_overflow = body_overflow
         self._str = None
         self._status_code = None
+        self._header_end = _NOT_PARSED
+        self._headers = _NOT_PARSED
+        self._headers_dict = None
+        self._json_body = _NOT_PARSED
+        self._json_object = _NOT_PARSED
 
         if response_str:
             self._str = str(response_str)
 
-            try:
-                http_str = self._str.split("HTTP/1.1")[1].strip()
-                self._status_code = http_str.split(" ")[0]
-            except:
-                pass
+            version_start = self._str.find("HTTP/1.1")
+            if version_start != -1:
+                status_start = version_start + len("HTTP/1.1")
+                status_end = self._str.find("HTTP/1.1", status_start)
+                if status_end == -1:
+                    status_end = len(self._str)
+                self._status_code = self._str[status_start:status_end].strip().split(" ", 1)[0]
+
+    def __getstate__(self):
+        return (self._str, self._status_code, self.body_overflow)
+
+    def __setstate__(self, state):
+        self.__init__()
+        self._str, self._status_code, self.body_overflow = state
 
     @property
     def to_str(self):
@@ -54,6 +177,18 @@ class HttpResponse(object):
         """
         return self._status_code
 
+    def _get_header_end(self):
+        """ Returns the offset of the delimiter between the headers and the body
+
+        @return: The offset, or None if the response has no body delimiter
+        @rtype : Int or None
+
+        """
+        if self._header_end is _NOT_PARSED:
+            header_end = self._str.find(DELIM) if self._str is not None else -1
+            self._header_end = header_end if header_end != -1 else None
+        return self._header_end
+
     @property
     def body(self):
         """ The body of the response
@@ -62,10 +197,14 @@ class HttpResponse(object):
         @rtype : Str
 
         """
-        try:
-            return self._str.split(DELIM)[1]
-        except:
+        header_end = self._get_header_end()
+        if header_end is None:
             return None
+        body_start = header_end + len(DELIM)
+        body_end = self._str.find(DELIM, body_start)
+        if body_end == -1:
+            return self._str[body_start:]
+        return self._str[body_start:body_end]
 
     @property
     def headers(self):
@@ -75,70 +214,80 @@ class HttpResponse(object):
         @rtype : List[Str]
 
         """
-        try:
-            response_without_body = self._str.split(DELIM)[0]
-            # assumed format: HTTP/1.1 STATUS_CODE STATUS TEXT\r\nresponse...
-            return response_without_body.split(" ", 2)[2].split('\r\n')[1:]
-        except:
-            return None
+        if self._headers is _NOT_PARSED:
+            try:
+                header_end = self._get_header_end()
+                response_without_body = self._str if header_end is None else self._str[:header_end]
+                # assumed format: HTTP/1.1 STATUS_CODE STATUS TEXT\r\nresponse...
+                self._headers = response_without_body.split(" ", 2)[2].split('\r\n')[1:]
+            except:
+                self._headers = None
+        return self._headers
 
     @property
     def headers_dict(self):
         """ The parsed name-value pairs of the headers of the response
         Headers which are not in the expected format are ignored.
+        The headers are parsed once; each caller gets a copy of them.
 
         @return: The headers
         @rtype : Dict[Str, Str]
 
         """
-        headers_dict = {}
-        if self.headers is None:
-            return headers_dict
+        if self._headers_dict is not None:
+            return dict(self._headers_dict)
 
-        for header in self.headers:
-            try:
-                payload_start_idx = header.index(":")
-                header_name = header[0:payload_start_idx]
-                header_val = header[payload_start_idx+1:]
-                headers_dict[header_name] = header_val
-            except Exception as error:
-                print(f"Error parsing header: {header}")
-                pass
-        return headers_dict
+        headers_dict = {}
+        if self.headers is not None:
+            for header in self.headers:
+                try:
+                    payload_start_idx = header.index(":")
+                    header_name = header[0:payload_start_idx]
+                    header_val = header[payload_start_idx+1:]
+                    headers_dict[header_name] = header_val
+                except Exception as error:
+                    print(f"Error parsing header: {header}")
+                    pass
+        self._headers_dict = headers_dict
+        return dict(headers_dict)
 
     @property
     def json_body(self):
         """ The json portion of the body if exists.
 
+        Only hex values (chunk sizes), spaces and CRLF characters may precede
+        the curly brace or bracket that starts the json portion.
+
         @return: The json body
         @rtype : Str or None
 
         """
-        def is_invalid(c):
-            """ Returns True if character is an unexpected value.
-            This function is called when checking before curly braces in a response.
-            Hex values and CRLF characters are considered valid, all others are not.
-            """
-            return c not in string.hexdigits and c != '\r' and c != '\n' and c != ' '
-
-        try:
+        if self._json_body is _NOT_PARSED:
+            self._json_body = None
             body = self.body
-            for idx, c in enumerate(body):
-                if c == '{':
-                    l_index = idx
-                    r_find = '}'
-                    break
-                elif c == '[':
-                    l_index = idx
-                    r_find = ']'
-                    break
-                elif is_invalid(c):
-                    return None
-
-            r_index = body.rindex(r_find) + 1
-            return body[l_index : r_index]
-        except:
-            return None
+            match = JSON_START.match(body) if body else None
+            if match is not None:
+                l_index = match.start(1)
+                r_find = '}' if match.group(1) == '{' else ']'
+                r_index = body.rfind(r_find) + 1
+                if r_index > 0:
+                    self._json_body = body[l_index : r_index]
+        return self._json_body
+
+    @property
+    def json_object(self):
+        """ The json portion of the body, parsed.
+
+        @return: The parsed json body, or None if the body does not contain valid json
+        @rtype : Dict or List or None
+
+        """
+        if self._json_object is _NOT_PARSED:
+            try:
+                self._json_object = json.loads(self.json_body)
+            except (json.JSONDecodeError, TypeError):
+                self._json_object = None
+        return self._json_object
 
     @property
     def status_text(self):
@@ -150,7 +299,7 @@ class HttpResponse(object):
         """
         try:
             # assumed format: HTTP/1.1 STATUS_CODE STATUS TEXT\r\nresponse...
-            return self._str.split(" ", 2)[2].split('\r\n')[0]
+            return self._str.split(" ", 2)[2].split('\r\n', 1)[0]
         except:
             return None
 
@@ -162,19 +311,7 @@ class HttpResponse(object):
 
         """
         if self._status_code:
-            if Settings().custom_non_bug_codes:
-                # All codes except the ones in the custom_non_bug_codes list should be flagged as bugs.
-                # Hence, return False only if the status code exists in the list.
-                for code in Settings().custom_non_bug_codes:
-                    if re.match(code, self._status_code):
-                        return False
-                else:
-                    return True
-            if self._status_code.startswith('5'):
-                return True
-            for code in Settings().custom_bug_codes:
-                if re.match(code, self._status_code):
-                    return True
+            return is_bug_code(self._status_code)
         return False
 
     def has_valid_code(self):
@@ -186,4 +323,4 @@ class HttpResponse(object):
         """
         if self._status_code:
             return self._status_code in VALID_CODES
-        return False
\ No newline at end of file
+        return False
@@ -6,6 +6,7 @@ from __future__ import print_function
 
 import logging
 from enum import Enum
+import multiprocessing
 import os
 import re
 import time
@@ -642,6 +643,12 @@ class SettingsDictArg(SettingsArg):
 
 DYN_OBJECTS_CACHE_SIZE_DEFAULT = 10
 FUZZING_MODE_DEFAULT = 'bfs'
+# Fuzzing jobs are threads of the main process by default
+FUZZING_JOBS_MODE_DEFAULT = 'threads'
+FUZZING_JOBS_MODES = ['threads', 'processes']
+# The fuzzing job threads do not render the next generation ahead by default,
+# since the known invalid renderings are not skipped for it
+FUZZING_JOBS_RENDER_AHEAD_DEFAULT = False
 # All below times are in seconds
 MAX_GC_CLEANUP_TIME_SECONDS_DEFAULT = 300
 MAX_TRACE_DB_CLEANUP_TIME_SECONDS_DEFAULT = 10
@@ -657,8 +664,27 @@ MAX_ASYNC_RESOURCE_CREATION_TIME_DEFAULT = 20
 MAX_COMBINATIONS_DEFAULT = 20
 MAX_SCHEMA_COMBINATIONS_DEFAULT = 20
 MAX_EXAMPLES_DEFAULT = 20
+MAX_CACHED_SCHEMA_COMBINATIONS_DEFAULT = 1000
+# The parameter value combinations of a request are its itertools.product by default
+COMBINATION_STRATEGY_DEFAULT = 'product'
+COMBINATION_STRATEGIES = ['product', 'pairwise', 't-wise:N', 'random:seed', 'sample']
 
 MAX_SEQUENCE_LENGTH_DEFAULT = 100
+# Maximum number of idle keep-alive connections kept per target
+MAX_IDLE_CONNECTIONS_DEFAULT = 10
+CONNECTION_IDLE_TIMEOUT_SEC_DEFAULT = 30
+RATE_LIMIT_BURST_DEFAULT = 1
+# The rate is fixed unless adaptive throttling is enabled, as with request_throttle_ms
+RATE_LIMIT_ADAPTIVE_DEFAULT = False
+# Requests are sent up to 5 times when the response asks for a retry
+RETRY_MAX_RETRIES_DEFAULT = 4
+RETRY_MAX_INTERVAL_SEC_DEFAULT = 60
+RETRY_STRATEGIES = ['linear', 'exponential']
+# Async resource operations are polled after 1, 2, 4, 8, 10, 10, ... seconds by default
+ASYNC_POLL_INITIAL_INTERVAL_SEC_DEFAULT = 1
+ASYNC_POLL_MAX_INTERVAL_SEC_DEFAULT = 10
+ASYNC_POLL_BACKOFF_FACTOR_DEFAULT = 2
+RATE_LIMIT_SCOPES = ['global', 'host', 'endpoint']
 TARGET_PORT_MAX = (1 << 16) - 1
 TIME_BUDGET_DEFAULT = 24.0 * 7  # ~1 week
 
@@ -677,6 +703,40 @@ DEFAULT_TEST_SERVER_ID = 'unit_test'
 DEFAULT_VERSION = '0.0.0'
 
 
+def parse_combination_strategy(strategy):
+    """ Parses the combination_strategy setting.
+
+    'pairwise' and 't-wise:N' select the rows of a covering array of strength
+    2 and N, respectively. 'random:seed' selects the rows of a pairwise
+    covering array whose greedy choices are randomized with the given seed.
+    'sample' draws distinct combinations uniformly from the product, using
+    the random_seed setting.
+
+    @param strategy: One of COMBINATION_STRATEGIES
+    @type  strategy: Str
+
+    @return: The strategy ('product', 't-wise', 'random' or 'sample') and its strength or seed
+    @rtype : Tuple(Str, Int or None)
+
+    """
+    if strategy == 'product':
+        return ('product', None)
+    if strategy == 'pairwise':
+        return ('t-wise', 2)
+    if strategy == 'sample':
+        return ('sample', None)
+    name, _, arg = strategy.partition(':')
+    if name in ['t-wise', 'random']:
+        try:
+            arg = int(arg)
+        except ValueError:
+            arg = None
+        if arg is not None and (arg > 0 or name == 'random' and arg == 0):
+            return (name, arg)
+    raise OptionValidationError(f"combination_strategy must be one of {COMBINATION_STRATEGIES}, "
+                                f"with N a positive integer and seed a non-negative integer")
+
+
 def Settings():
     """ Accessor for the RestlerSettings singleton """
     return RestlerSettings.Instance()
@@ -758,6 +818,12 @@ class RestlerSettings(object):
                                                    user_args, minval=0)
         # The number of simultaneous fuzzing jobs to perform
         self._fuzzing_jobs = SettingsArg('fuzzing_jobs', int, 1, user_args, minval=1)
+        ## Whether the fuzzing jobs are threads of the main process, or worker processes
+        self._fuzzing_jobs_mode = SettingsArg('fuzzing_jobs_mode', str, FUZZING_JOBS_MODE_DEFAULT, user_args)
+        ## Whether the fuzzing job threads render sequences of the next generation
+        ## while the last sequences of the current generation are rendered
+        self._fuzzing_jobs_render_ahead = SettingsArg('fuzzing_jobs_render_ahead', bool,
+                                                       FUZZING_JOBS_RENDER_AHEAD_DEFAULT, user_args)
         ## The fuzzing mode (bfs/bfs-cheap/random-walk/directed-smoke-test)
         self._fuzzing_mode = SettingsArg('fuzzing_mode', str, FUZZING_MODE_DEFAULT, user_args)
         ## Length of time between garbage collection calls (None = no garbage collection)
@@ -797,6 +863,10 @@ class RestlerSettings(object):
         self._ignore_dependencies = SettingsArg('ignore_dependencies', bool, False, user_args)
         ##  Re-create the connection for every request sent.
         self._reconnect_on_every_request = SettingsArg('reconnect_on_every_request', bool, False, user_args)
+        ## Settings for the intervals between the polls of async resource operations
+        self._async_polling_args = SettingsArg('async_polling_settings', dict, {}, user_args)
+        ## Settings for the pool of keep-alive connections
+        self._connection_pool_args = SettingsArg('connection_pool_settings', dict, {}, user_args)
         ## Ignore server-side feedback
         self._ignore_feedback = SettingsArg('ignore_feedback', bool, False, user_args)
         ## Include user agent in requests sent
@@ -813,6 +883,9 @@ class RestlerSettings(object):
         self._max_combinations = SettingsArg('max_combinations', int, MAX_COMBINATIONS_DEFAULT, user_args, minval=0)
         ## Settings for advanced combinations testing, such as testing multiple schema combinations
         self._combinations_args = SettingsArg('test_combinations_settings', dict, {}, user_args)
+        ## How the parameter value combinations of a request are chosen: 'product', 'pairwise', 't-wise:N',
+        ## 'random:seed' or 'sample'
+        self._combination_strategy = SettingsArg('combination_strategy', str, COMBINATION_STRATEGY_DEFAULT, user_args)
         ## Settings for caching the sequence prefixes when rendering request combinations
         self._seq_rendering_settings = SettingsArg('sequence_exploration_settings', dict, {}, user_args)
         ## Maximum time to wait for a response after sending a request (seconds)
@@ -837,10 +910,21 @@ class RestlerSettings(object):
         self._path_regex = SettingsArg('path_regex', str, None, user_args)
         ## Custom value generator module file path
         self._custom_value_generators_file_path = SettingsArg('custom_value_generators', str, None, user_args)
+        ## Number of values of each custom value generator that are generated ahead of time by a background thread
+        ## (not used for seeded value generators or when replaying)
+        self._value_generator_prefetch_size = SettingsArg('value_generator_prefetch_size', int, 0, user_args, minval=0)
+        ## Maximum number of independent renderings of a sequence's last request that may be in flight at once
+        self._max_inflight_requests = SettingsArg('max_inflight_requests', int, 1, user_args, minval=1)
         ## Minimum time, in milliseconds, to wait between sending requests
         self._request_throttle_ms = SettingsArg('request_throttle_ms', (int, float), None, user_args, minval=0)
+        ## Token-bucket rate limit and per-host or per-endpoint concurrency limit of the requests sent
+        self._rate_limit_args = SettingsArg('rate_limit_settings', dict, {}, user_args)
         ## Settings for customizing re-try logic for requests
         self._retry_args = SettingsArg('custom_retry_settings', dict, {}, user_args)
+        ## Maximum number of bytes of a response body kept in memory (the rest is hashed and discarded)
+        self._max_response_body_bytes = SettingsArg('max_response_body_bytes', int, None, user_args, minval=0)
+        ## What to do with the part of a response body past max_response_body_bytes: 'discard' or 'spill' (to a file)
+        self._response_body_overflow = SettingsArg('response_body_overflow', str, 'discard', user_args)
         ## Ignore data UTF decoding failures (see https://github.com/microsoft/restler-fuzzer/issues/164)
         self._ignore_decoding_failures = SettingsArg('ignore_decoding_failures', bool, False, user_args)
         ## Collection of endpoint specific producer timing delays - will be set with other per_resource settings
@@ -967,6 +1051,14 @@ class RestlerSettings(object):
     def fuzzing_jobs(self):
         return self._fuzzing_jobs.val
 
+    @property
+    def fuzzing_jobs_mode(self):
+        return self._fuzzing_jobs_mode.val
+
+    @property
+    def fuzzing_jobs_render_ahead(self):
+        return self._fuzzing_jobs_render_ahead.val
+
     @property
     def fuzzing_mode(self):
         return self._fuzzing_mode.val
@@ -1084,6 +1176,10 @@ class RestlerSettings(object):
     def max_combinations(self):
         return self._max_combinations.val
 
+    @property
+    def combination_strategy(self):
+        return self._combination_strategy.val
+
     @property
     def max_schema_combinations(self):
         if 'max_schema_combinations' in self._combinations_args.val:
@@ -1096,6 +1192,12 @@ class RestlerSettings(object):
             return self._combinations_args.val['max_examples']
         return MAX_EXAMPLES_DEFAULT
 
+    @property
+    def max_cached_schema_combinations(self):
+        if 'max_cached_schema_combinations' in self._combinations_args.val:
+            return self._combinations_args.val['max_cached_schema_combinations']
+        return MAX_CACHED_SCHEMA_COMBINATIONS_DEFAULT
+
     @property
     def header_param_combinations(self):
         if 'header_param_combinations' in self._combinations_args.val:
@@ -1154,10 +1256,48 @@ class RestlerSettings(object):
     def custom_value_generators_file_path(self):
         return self._custom_value_generators_file_path.val
 
+    @property
+    def value_generator_prefetch_size(self):
+        return self._value_generator_prefetch_size.val
+
+    @property
+    def max_inflight_requests(self):
+        return self._max_inflight_requests.val
+
     @property
     def request_throttle_ms(self):
         return self._request_throttle_ms.val
 
+    @property
+    def rate_limit_requests_per_second(self):
+        if 'requests_per_second' in self._rate_limit_args.val:
+            return self._rate_limit_args.val['requests_per_second']
+        return None
+
+    @property
+    def rate_limit_burst(self):
+        if 'burst' in self._rate_limit_args.val:
+            return self._rate_limit_args.val['burst']
+        return RATE_LIMIT_BURST_DEFAULT
+
+    @property
+    def rate_limit_scope(self):
+        if 'scope' in self._rate_limit_args.val:
+            return self._rate_limit_args.val['scope']
+        return 'global'
+
+    @property
+    def rate_limit_max_concurrent_requests(self):
+        if 'max_concurrent_requests' in self._rate_limit_args.val:
+            return self._rate_limit_args.val['max_concurrent_requests']
+        return None
+
+    @property
+    def rate_limit_adaptive(self):
+        if 'adaptive' in self._rate_limit_args.val:
+            return self._rate_limit_args.val['adaptive']
+        return RATE_LIMIT_ADAPTIVE_DEFAULT
+
     @property
     def custom_retry_codes(self):
         if 'status_codes' in self._retry_args.val:
@@ -1176,6 +1316,62 @@ class RestlerSettings(object):
             return self._retry_args.val['interval_sec']
         return None
 
+    @property
+    def custom_retry_strategy(self):
+        if 'strategy' in self._retry_args.val:
+            return self._retry_args.val['strategy']
+        return 'linear'
+
+    @property
+    def custom_retry_max_retries(self):
+        if 'max_retries' in self._retry_args.val:
+            return self._retry_args.val['max_retries']
+        return RETRY_MAX_RETRIES_DEFAULT
+
+    @property
+    def custom_retry_max_interval_sec(self):
+        if 'max_interval_sec' in self._retry_args.val:
+            return self._retry_args.val['max_interval_sec']
+        return RETRY_MAX_INTERVAL_SEC_DEFAULT
+
+    @property
+    def max_idle_connections(self):
+        if 'max_idle_connections' in self._connection_pool_args.val:
+            return self._connection_pool_args.val['max_idle_connections']
+        return MAX_IDLE_CONNECTIONS_DEFAULT
+
+    @property
+    def connection_idle_timeout_sec(self):
+        if 'idle_timeout_sec' in self._connection_pool_args.val:
+            return self._connection_pool_args.val['idle_timeout_sec']
+        return CONNECTION_IDLE_TIMEOUT_SEC_DEFAULT
+
+    @property
+    def async_poll_initial_interval_sec(self):
+        if 'initial_interval_sec' in self._async_polling_args.val:
+            return self._async_polling_args.val['initial_interval_sec']
+        return ASYNC_POLL_INITIAL_INTERVAL_SEC_DEFAULT
+
+    @property
+    def async_poll_max_interval_sec(self):
+        if 'max_interval_sec' in self._async_polling_args.val:
+            return self._async_polling_args.val['max_interval_sec']
+        return ASYNC_POLL_MAX_INTERVAL_SEC_DEFAULT
+
+    @property
+    def async_poll_backoff_factor(self):
+        if 'backoff_factor' in self._async_polling_args.val:
+            return self._async_polling_args.val['backoff_factor']
+        return ASYNC_POLL_BACKOFF_FACTOR_DEFAULT
+
+    @property
+    def max_response_body_bytes(self):
+        return self._max_response_body_bytes.val
+
+    @property
+    def response_body_overflow(self):
+        return self._response_body_overflow.val
+
     @property
     def ignore_decoding_failures(self):
         return self._ignore_decoding_failures.val
@@ -1498,6 +1694,62 @@ class RestlerSettings(object):
                                         " for random walk method")
         if self.request_throttle_ms and self.fuzzing_jobs != 1:
             raise OptionValidationError("Request throttling not available for multiple fuzzing jobs")
+        if self.fuzzing_jobs_mode not in FUZZING_JOBS_MODES:
+            raise OptionValidationError(f"fuzzing_jobs_mode must be one of {FUZZING_JOBS_MODES}")
+        if self.fuzzing_jobs_mode == 'processes':
+            if 'fork' not in multiprocessing.get_all_start_methods():
+                raise OptionValidationError("fuzzing_jobs_mode 'processes' is not available on this platform")
+            if self.run_gc_after_every_sequence:
+                raise OptionValidationError("run_gc_after_every_sequence is not available for "
+                                            "fuzzing_jobs_mode 'processes'")
+            if self.value_generator_prefetch_size:
+                raise OptionValidationError("value_generator_prefetch_size is not available for "
+                                            "fuzzing_jobs_mode 'processes'")
+            if self._rate_limit_args.val:
+                # Each worker process would apply the whole rate limit
+                raise OptionValidationError("rate_limit_settings is not available for "
+                                            "fuzzing_jobs_mode 'processes'")
+        if self.request_throttle_ms and self.max_inflight_requests != 1:
+            raise OptionValidationError("Request throttling not available for multiple in-flight requests")
+        if not isinstance(self.max_idle_connections, int) or self.max_idle_connections < 0:
+            raise OptionValidationError("connection_pool_settings: max_idle_connections must be a "
+                                        "non-negative integer")
+        if not isinstance(self.connection_idle_timeout_sec, (int, float)) or self.connection_idle_timeout_sec < 0:
+            raise OptionValidationError("connection_pool_settings: idle_timeout_sec must be a "
+                                        "non-negative number")
+        if self.rate_limit_requests_per_second is not None:
+            if not isinstance(self.rate_limit_requests_per_second, (int, float)) or\
+               self.rate_limit_requests_per_second <= 0:
+                raise OptionValidationError("rate_limit_settings: requests_per_second must be a positive number")
+            if self.request_throttle_ms:
+                raise OptionValidationError("Specifying both request_throttle_ms and "
+                                            "rate_limit_settings: requests_per_second is not allowed.")
+        if not isinstance(self.rate_limit_burst, int) or self.rate_limit_burst < 1:
+            raise OptionValidationError("rate_limit_settings: burst must be a positive integer")
+        if self.rate_limit_scope not in RATE_LIMIT_SCOPES:
+            raise OptionValidationError(f"rate_limit_settings: scope must be one of {RATE_LIMIT_SCOPES}")
+        if self.rate_limit_max_concurrent_requests is not None and\
+           (not isinstance(self.rate_limit_max_concurrent_requests, int) or
+            self.rate_limit_max_concurrent_requests < 1):
+            raise OptionValidationError("rate_limit_settings: max_concurrent_requests must be a positive integer")
+        if not isinstance(self.rate_limit_adaptive, bool):
+            raise OptionValidationError("rate_limit_settings: adaptive must be a boolean")
+        if self.custom_retry_strategy not in RETRY_STRATEGIES:
+            raise OptionValidationError(f"custom_retry_settings: strategy must be one of {RETRY_STRATEGIES}")
+        if not isinstance(self.custom_retry_max_retries, int) or self.custom_retry_max_retries < 0:
+            raise OptionValidationError("custom_retry_settings: max_retries must be a non-negative integer")
+        if not isinstance(self.custom_retry_max_interval_sec, (int, float)) or\
+           self.custom_retry_max_interval_sec < 0:
+            raise OptionValidationError("custom_retry_settings: max_interval_sec must be a non-negative number")
+        for name, value in [('initial_interval_sec', self.async_poll_initial_interval_sec),
+                            ('max_interval_sec', self.async_poll_max_interval_sec)]:
+            if not isinstance(value, (int, float)) or value < 0:
+                raise OptionValidationError(f"async_polling_settings: {name} must be a non-negative number")
+        if not isinstance(self.async_poll_backoff_factor, (int, float)) or self.async_poll_backoff_factor < 1:
+            raise OptionValidationError("async_polling_settings: backoff_factor must be a number >= 1")
+        if self.response_body_overflow not in ['discard', 'spill']:
+            raise OptionValidationError("response_body_overflow must be 'discard' or 'spill'")
+        parse_combination_strategy(self.combination_strategy)
         if self.custom_bug_codes and self.custom_non_bug_codes:
             raise OptionValidationError("Both custom_bug_codes and custom_non_bug_codes lists were specified. "
                                         "Specifying both lists is not allowed.")
@@ -61,6 +61,7 @@ LOG_TYPE_GC = 'gc'
 LOG_TYPE_PREPROCESSING = 'preprocessing'
 LOG_TYPE_REPLAY = 'replay'
 LOG_TYPE_AUTH = 'auth'
+LOG_TYPE_POLLING = 'polling'
 
 
 class Bug:
@@ -166,6 +167,8 @@ class SpecCoverageLog(object):
             raise Exception("Attempting to create a new singleton instance.")
 
         self._renderings_logged = {}
+        # The coverage entries recorded instead of written, see defer_writes
+        self._deferred_entries = None
 
         # create the spec coverage file
         file_path = os.path.join(LOGS_DIR, 'speccov-all-combinations.json')
@@ -277,6 +280,44 @@ class SpecCoverageLog(object):
 
         """
 
+        if Settings().disable_logging:
+            return
+
+        if rendered_sequence:
+            req = rendered_sequence.sequence.last_request
+        else:
+            if not request:
+                raise Exception("Either the rendered sequence or request must be specified.")
+            req = request
+
+        # For uniqueness, the rendered request hash should include
+        # the current combination IDs of every request in the sequence.
+        if log_rendered_hash and rendered_sequence:
+            req_hash = f"{req.method_endpoint_hex_definition}_{str(req._current_combination_id)}"
+            if rendered_sequence.sequence.prefix.length > 0:
+                req_hash = f"{req_hash}__{rendered_sequence.sequence.prefix_combination_id}"
+        else:
+            req_hash = req.method_endpoint_hex_definition
+
+        req_coverage = self._get_request_coverage_summary_stats(req, req_hash, log_tracked_parameters=log_rendered_hash)
+        min_coverage = self._get_request_coverage_summary_stats(req, req_hash, log_tracked_parameters=log_rendered_hash,
+                                                                log_raw_requests=True)
+        if self._deferred_entries is not None:
+            self._deferred_entries.append((req_hash, req_coverage, min_coverage))
+        else:
+            self.write_entries([(req_hash, req_coverage, min_coverage)])
+
+    def write_entries(self, entries):
+        """ Writes coverage entries to the spec coverage files.
+
+        @param entries: The request hash, coverage and abbreviated coverage of
+                        each entry, see log_request_coverage_incremental
+        @type  entries: List[Tuple(str, Dict, Dict)]
+
+        @return: None
+        @rtype : None
+
+        """
         def write_incremental_coverage(file_path, req_coverage):
             if not os.path.exists(file_path):
                 with open(file_path, 'w', encoding='utf-8') as file:
@@ -297,39 +338,41 @@ class SpecCoverageLog(object):
                 file.write(coverage_as_json)
                 file.write("}")
 
-        if Settings().disable_logging:
-            return
+        for req_hash, req_coverage, min_coverage in entries:
+            if req_hash in self._renderings_logged:
+                # Duplicate spec coverage should not be logged.
+                raise Exception(f"ERROR: spec coverage is being logged twice for the same rendering: {req_hash}.")
+            self._renderings_logged[req_hash] = req_coverage[req_hash]['valid']
 
-        if rendered_sequence:
-            req = rendered_sequence.sequence.last_request
-        else:
-            if not request:
-                raise Exception("Either the rendered sequence or request must be specified.")
-            req = request
+            file_path = os.path.join(LOGS_DIR, 'speccov-all-combinations.json')
+            write_incremental_coverage(file_path, req_coverage)
 
-        # For uniqueness, the rendered request hash should include
-        # the current combination IDs of every request in the sequence.
-        if log_rendered_hash and rendered_sequence:
-            req_hash = f"{req.method_endpoint_hex_definition}_{str(req._current_combination_id)}"
-            if rendered_sequence.sequence.prefix.length > 0:
-                req_hash = f"{req_hash}__{rendered_sequence.sequence.prefix_combination_id}"
-        else:
-            req_hash = req.method_endpoint_hex_definition
+            file_path = os.path.join(LOGS_DIR, 'speccov-min.json')
+            write_incremental_coverage(file_path, min_coverage)
 
-        if req_hash in self._renderings_logged:
-            # Duplicate spec coverage should not be logged.
-            raise Exception(f"ERROR: spec coverage is being logged twice for the same rendering: {req_hash}.")
+    def defer_writes(self):
+        """ Records the coverage entries instead of writing them, so that a
+        worker process of the fuzzing run leaves the spec coverage files to
+        the main process.
 
-        req_coverage = self._get_request_coverage_summary_stats(req, req_hash, log_tracked_parameters=log_rendered_hash)
-        self._renderings_logged[req_hash] = req_coverage[req_hash]['valid']
+        @return: None
+        @rtype : None
 
-        file_path = os.path.join(LOGS_DIR, 'speccov-all-combinations.json')
-        write_incremental_coverage(file_path, req_coverage)
+        """
+        self._deferred_entries = []
 
-        req_coverage = self._get_request_coverage_summary_stats(req, req_hash, log_tracked_parameters=log_rendered_hash,
-                                                                log_raw_requests=True)
-        file_path = os.path.join(LOGS_DIR, 'speccov-min.json')
-        write_incremental_coverage(file_path, req_coverage)
+    def pop_deferred_entries(self):
+        """ Returns the coverage entries recorded since the last call, to be
+        written with write_entries.
+
+        @return: The recorded coverage entries
+        @rtype : List[Tuple(str, Dict, Dict)]
+
+        """
+        entries = self._deferred_entries or []
+        if self._deferred_entries is not None:
+            self._deferred_entries = []
+        return entries
 
     def generate_summary_speccov(self):
         """ Generate a speccov file that contains one entry for each request, which contains whether the request
@@ -550,6 +593,22 @@ def create_network_log(log_name):
         raise Exception(f"Network log with thread id {thread_id} already exists.")
 
 
+def create_worker_network_log(log_name):
+    """ Creates the network log of a worker process of the fuzzing run.  The
+    network logs inherited from the main process are dropped, and the log
+    file name includes the process id so that each worker has its own log.
+
+    @param log_name: The name of the log - will be included in filename
+    @type  log_name: Str
+
+    @return: None    @rtype :
+
+    """
+    Network_Logs.clear()
+    thread_id = threading.current_thread().ident
+    Network_Logs[thread_id] = NetworkLog(log_name, f"{thread_id}.{os.getpid()}")
+
+
 def raw_network_logging(data):
     """ Helper to log network traffic transferred over sockets.
 
@@ -1000,6 +1059,13 @@ def print_generation_stats(req_collection, fuzzing_monitor, global_lock, final=F
 
     """
     from restler.engine.bug_bucketing import BugBuckets
+    from restler.engine.core.async_request_utilities import AsyncPollingStats
+    from restler.engine.core.retry_handler import RetryStats
+    from restler.engine.core.sequence_scheduler import SchedulerStats
+    from restler.engine.core.sequences import SequenceMemoryStats
+    from restler.engine.core.token_manager import TokenManager
+    from restler.engine.transport_layer.connection_pool import ConnectionPool
+    from restler.engine.transport_layer.rate_limiter import RateLimiter
     from restler.engine.transport_layer.response import VALID_CODES
     from restler.engine.transport_layer.response import RESTLER_INVALID_CODE
     timestamp = formatting.timestamp()
@@ -1051,6 +1117,14 @@ def print_generation_stats(req_collection, fuzzing_monitor, global_lock, final=F
         testing_summary['total_requests_sent'] = total_requests_sent
         testing_summary['bug_buckets'] = bug_buckets
         testing_summary['reproducible_bug_buckets'] = BugBuckets.Instance().repro_bug_buckets()
+        testing_summary['connection_pool'] = ConnectionPool().stats()
+        testing_summary['tls_handshakes'] = ConnectionPool().tls_stats()
+        testing_summary['rate_limiter'] = RateLimiter().stats()
+        testing_summary['retries'] = RetryStats.Instance().to_dict()
+        testing_summary['token_refresh'] = TokenManager.Instance().stats()
+        testing_summary['async_polling'] = AsyncPollingStats.Instance().to_dict()
+        testing_summary['fuzzing_jobs'] = SchedulerStats.Instance().to_dict()
+        testing_summary['sequence_memory'] = SequenceMemoryStats.Instance().to_dict()
         settings_summary = OrderedDict()
         settings_summary['random_seed'] = Settings().random_seed
         testing_summary['settings'] = settings_summary
@@ -1105,8 +1179,7 @@ def format_request_block(request_id, request_block, candidate_values_pool):
         current_fuzzable_tag = field_name
         values = candidate_values_pool.get_candidate_values(primitive, request_id=request_id, tag=current_fuzzable_tag,
                                                             quoted=quoted)
-        if not isinstance(values, list):
-            values = [values]
+        values = list(values) if isinstance(values, (list, tuple)) else [values]
         if len(values) == 1:
             default_val = values[0]
     # Handle custom payload with uuid4 suffix
@@ -0,0 +1,76 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+""" Micro-benchmark of Request.render_iter, in renderings per second.
+
+Usage: python tools/benchmarks/benchmark_render.py [num_renderings]
+
+The restler package is imported as the unit tests import it.
+"""
+import json
+import os
+import sys
+import time
+
+import rest.restler.restler_settings as restler_settings
+from rest.restler.restler_settings import RestlerSettings
+from rest.restler.restler_settings import LogSetting
+from rest.restler.engine import primitives
+from rest.restler.engine.core.requests import Request
+
+
+def make_request():
+    """ A request with path, query, header and body parameters """
+    return Request([
+        primitives.restler_static_string("PUT "),
+        primitives.restler_basepath("/api"),
+        primitives.restler_static_string("/"),
+        primitives.restler_static_string("stores"),
+        primitives.restler_static_string("/"),
+        primitives.restler_fuzzable_string("fuzzstring", quoted=False),
+        primitives.restler_static_string("?"),
+        primitives.restler_static_string("api-version="),
+        primitives.restler_fuzzable_group("api-version", ["2020-01-01", "2021-01-01", "2022-01-01"]),
+        primitives.restler_static_string("&"),
+        primitives.restler_static_string("count="),
+        primitives.restler_fuzzable_int("1"),
+        primitives.restler_static_string(" HTTP/1.1\r\n"),
+        primitives.restler_static_string("Accept: application/json\r\n"),
+        primitives.restler_static_string("Host: localhost\r\n"),
+        primitives.restler_refreshable_authentication_token("authentication_token_tag"),
+        primitives.restler_static_string("Content-Type: application/json\r\n"),
+        primitives.restler_static_string("\r\n"),
+        primitives.restler_static_string("{"),
+        primitives.restler_static_string('"id": '),
+        primitives.restler_fuzzable_uuid4("id", quoted=True),
+        primitives.restler_static_string(', "name": '),
+        primitives.restler_fuzzable_string("fuzzstring", quoted=True),
+        primitives.restler_static_string(', "enabled": '),
+        primitives.restler_fuzzable_bool("true"),
+        primitives.restler_static_string(', "kind": '),
+        primitives.restler_fuzzable_group("kind", ["a", "b", "c", "d"], quoted=True),
+        primitives.restler_static_string("}"),
+        primitives.restler_static_string("\r\n")
+    ], requestId="/api/stores/{storeId}")
+
+
+def main(num_renderings):
+    RestlerSettings({'max_combinations': num_renderings}, "")
+    with open(os.path.join(os.path.dirname(restler_settings.__file__), "log_settings.json")) as file_handler:
+        LogSetting().init_from_json(json.load(file_handler))
+    pool = primitives.CandidateValuesPool()
+    pool.set_candidate_values({
+        'restler_fuzzable_string': [f'str{i}' for i in range(10)],
+        'restler_fuzzable_int': [str(i) for i in range(10)],
+        'restler_fuzzable_bool': ['true', 'false'],
+        'restler_refreshable_authentication_token': {'token_auth_method': None}
+    })
+    request = make_request()
+    start = time.perf_counter()
+    count = sum(1 for _ in request.render_iter(pool))
+    elapsed = time.perf_counter() - start
+    print(f"{count} renderings in {elapsed:.3f}s: {count / elapsed:.0f} renderings/sec")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
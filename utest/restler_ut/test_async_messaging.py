@@ -0,0 +1,158 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+import rest.restler.restler_settings as restler_settings
+from rest.restler.restler_settings import RestlerSettings
+from rest.restler.restler_settings import LogSetting
+import rest.restler.utils.restler_logger as logger
+import rest.restler.engine.core.request_utilities as request_utilities
+from rest.restler.engine.transport_layer.async_messaging import AsyncHttpSock
+
+
+def make_request(path):
+    return f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n"
+
+
+class LocalServer(object):
+    """ An HTTP server on an asyncio event loop of its own thread, which
+    answers each request with its path, after the delay given in the path """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.active = 0
+        self.max_active = 0
+        self.handlers = set()
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.server = self.loop.run_until_complete(asyncio.start_server(self.handle, '127.0.0.1', 0))
+            self.port = self.server.sockets[0].getsockname()[1]
+            started.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        started.wait()
+
+    async def handle(self, reader, writer):
+        with self.lock:
+            self.connections += 1
+        self.handlers.add(asyncio.current_task())
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                path = head.split(b' ')[1].decode()
+                with self.lock:
+                    self.active += 1
+                    self.max_active = max(self.max_active, self.active)
+                await asyncio.sleep(float(path.split('delay=')[1]) if 'delay=' in path else 0)
+                with self.lock:
+                    self.active -= 1
+                body = path.encode()
+                connection = b'Connection: close\r\n' if 'close' in path else b''
+                writer.write(b'HTTP/1.1 200 OK\r\n' + connection +
+                             b'Content-Length: %d\r\n\r\n' % len(body) + body)
+                await writer.drain()
+                if connection:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        writer.close()
+
+    def stop(self):
+        async def close():
+            self.server.close()
+            for handler in self.handlers:
+                handler.cancel()
+            await asyncio.gather(*self.handlers, return_exceptions=True)
+            await self.server.wait_closed()
+        asyncio.run_coroutine_threadsafe(close(), self.loop).result(10)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(10)
+        self.loop.close()
+
+
+class AsyncMessagingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalServer()
+        RestlerSettings.TEST_DeleteInstance()
+        RestlerSettings({'target_ip': '127.0.0.1', 'target_port': self.server.port, 'host': 'localhost',
+                         'no_ssl': True, 'max_inflight_requests': 3}, "")
+        with open(os.path.join(os.path.dirname(restler_settings.__file__), "log_settings.json")) as file_handler:
+            LogSetting().init_from_json(json.load(file_handler))
+        self.logs_dir = tempfile.TemporaryDirectory()
+        self.network_logs = logger.NETWORK_LOGS
+        logger.NETWORK_LOGS = os.path.join(self.logs_dir.name, 'network.txt')
+        self.thread_id = threading.current_thread().ident
+        self.created_network_log = self.thread_id not in logger.Network_Logs
+        if self.created_network_log:
+            logger.create_network_log(logger.LOG_TYPE_TESTING)
+
+    def tearDown(self):
+        for http_sock in getattr(request_utilities.threadLocal, 'async_socks', []):
+            http_sock.close()
+        event_loop = getattr(request_utilities.threadLocal, 'event_loop', None)
+        request_utilities.detach_transport()
+        if event_loop is not None:
+            # Let the closed connections be shut down
+            event_loop.run_until_complete(asyncio.sleep(0))
+            event_loop.close()
+        self.server.stop()
+        if self.created_network_log:
+            logger.Network_Logs.pop(self.thread_id, None)
+        logger.NETWORK_LOGS = self.network_logs
+        self.logs_dir.cleanup()
+        RestlerSettings.TEST_DeleteInstance()
+
+    def test_async_send_request_data(self):
+        """ Test that the requests are sent over the keep-alive connection of the socket """
+        event_loop = asyncio.new_event_loop()
+        http_sock = AsyncHttpSock(RestlerSettings.Instance().connection_settings)
+        try:
+            for path in ['/items/1', '/items/2']:
+                response = event_loop.run_until_complete(
+                    request_utilities.async_send_request_data(make_request(path), http_sock))
+                self.assertEqual(response.status_code, '200')
+                self.assertEqual(response.body, path)
+            self.assertEqual(self.server.connections, 1)
+
+            # A new connection is opened once the server closes the connection
+            for path in ['/items/close', '/items/3']:
+                response = event_loop.run_until_complete(
+                    request_utilities.async_send_request_data(make_request(path), http_sock))
+                self.assertEqual(response.body, path)
+            self.assertEqual(self.server.connections, 2)
+        finally:
+            http_sock.close()
+            event_loop.run_until_complete(asyncio.sleep(0))
+            event_loop.close()
+
+    def test_send_inflight_request_data(self):
+        """ Test that the responses are returned in order, with at most max_inflight_requests in flight """
+        paths = [f'/items/{ith}?delay={delay}' for ith, delay in enumerate([0.3, 0.2, 0.1, 0, 0, 0.1, 0])]
+        responses = request_utilities.send_inflight_request_data([make_request(path) for path in paths])
+        self.assertEqual([response.body for response in responses], paths)
+        self.assertEqual(self.server.max_active, 3)
+        self.assertEqual(self.server.connections, 3)
+
+        # The connections are kept for the next requests, and fewer requests use fewer connections
+        self.server.max_active = 0
+        paths = ['/items/a?delay=0.1', '/items/b']
+        responses = request_utilities.send_inflight_request_data([make_request(path) for path in paths])
+        self.assertEqual([response.body for response in responses], paths)
+        self.assertEqual(self.server.max_active, 2)
+        self.assertEqual(self.server.connections, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
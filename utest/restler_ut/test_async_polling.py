@@ -0,0 +1,178 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import rest.restler.restler_settings as restler_settings
+from rest.restler.restler_settings import RestlerSettings
+from rest.restler.restler_settings import LogSetting
+import rest.restler.utils.restler_logger as logger
+import rest.restler.engine.core.request_utilities as request_utilities
+from rest.restler.engine.core.async_request_utilities import AsyncPollingStats
+from rest.restler.engine.core.async_request_utilities import AsyncResourcePoller
+from rest.restler.engine.core.async_request_utilities import ResourcePollingOperation
+from rest.restler.engine.transport_layer.response import HttpResponse
+
+PUT_DATA = "PUT /items/item1 HTTP/1.1\r\nHost: localhost\r\n\r\n{}"
+
+
+def make_response(status_code, body=None, retry_after=None):
+    headers = f"Retry-After: {retry_after}\r\n" if retry_after is not None else ""
+    body = json.dumps(body) if isinstance(body, dict) else (body or "")
+    return HttpResponse(f"HTTP/1.1 {status_code} Status\r\n{headers}Content-Length: {len(body)}\r\n\r\n{body}")
+
+
+def status_response(status, retry_after=None):
+    return make_response('200', {'status': status}, retry_after)
+
+
+class AsyncPollingTest(unittest.TestCase):
+
+    def setUp(self):
+        RestlerSettings.TEST_DeleteInstance()
+        RestlerSettings({'async_polling_settings': {'initial_interval_sec': 1, 'max_interval_sec': 4,
+                                                    'backoff_factor': 2}}, "")
+        with open(os.path.join(os.path.dirname(restler_settings.__file__), "log_settings.json")) as file_handler:
+            LogSetting().init_from_json(json.load(file_handler))
+        self.logs_dir = tempfile.TemporaryDirectory()
+        self.network_logs, self.logs_dir_path = logger.NETWORK_LOGS, logger.LOGS_DIR
+        logger.NETWORK_LOGS = os.path.join(self.logs_dir.name, 'network.txt')
+        logger.LOGS_DIR = self.logs_dir.name
+        self.thread_id = threading.current_thread().ident
+        self.created_network_log = self.thread_id not in logger.Network_Logs
+        if self.created_network_log:
+            logger.create_network_log(logger.LOG_TYPE_TESTING)
+        AsyncPollingStats.DetachInstance()
+
+        # The responses to the polling requests of each operation, and the requests sent
+        self.poll_responses = {}
+        self.sent = []
+        self.lock = threading.Lock()
+        self.send_request_data = request_utilities.send_request_data
+        request_utilities.send_request_data = self.send
+
+    def tearDown(self):
+        request_utilities.send_request_data = self.send_request_data
+        if self.created_network_log:
+            logger.Network_Logs.pop(self.thread_id, None)
+        logger.NETWORK_LOGS, logger.LOGS_DIR = self.network_logs, self.logs_dir_path
+        self.logs_dir.cleanup()
+        AsyncPollingStats.DetachInstance()
+        RestlerSettings.TEST_DeleteInstance()
+
+    def send(self, rendered_data, req_timeout_sec=None, reconnect=None, http_sock=None):
+        """ Returns the next polling response of an operation, or a successful
+        response to the GET of the resource """
+        with self.lock:
+            self.sent.append(rendered_data)
+            if rendered_data.startswith("GET /items"):
+                return make_response('200', {'name': 'item1'})
+            responses = self.poll_responses[rendered_data]
+            return responses.pop(0) if len(responses) > 1 else responses[0]
+
+    def make_operation(self, poll_responses, name='op', response=None, max_async_wait_time=60):
+        polling_data = f"GET /operations/{name} HTTP/1.1\r\n\r\n"
+        self.poll_responses[polling_data] = poll_responses
+        return ResourcePollingOperation(PUT_DATA, response or make_response('201'), polling_data, False,
+                                        max_async_wait_time, False, 'items')
+
+    def test_backoff(self):
+        """ Test that the polling interval grows exponentially up to the maximum interval """
+        operation = self.make_operation([status_response('InProgress')])
+        self.assertEqual(operation.next_delay, 0)
+        self.assertEqual([operation.poll() for _ in range(5)], [1, 2, 4, 4, 4])
+        self.assertEqual(operation.num_polls, 5)
+
+    def test_retry_after(self):
+        """ Test that a Retry-After header sets the delay, capped by the maximum interval """
+        operation = self.make_operation([status_response('InProgress', retry_after=3),
+                                         status_response('InProgress', retry_after=100),
+                                         status_response('InProgress')],
+                                        response=make_response('201', retry_after=2))
+        self.assertEqual(operation.next_delay, 2)
+        self.assertEqual([operation.poll() for _ in range(3)], [3, 4, 1])
+        operation = self.make_operation([], name='capped', response=make_response('201', retry_after=60))
+        self.assertEqual(operation.next_delay, 4)
+
+    def test_in_progress(self):
+        """ Test that the operation keeps polling while the resource is in progress """
+        operation = self.make_operation([status_response('InProgress'), status_response('Creating'),
+                                         status_response('Succeeded')])
+        self.assertIsNotNone(operation.poll())
+        self.assertIsNotNone(operation.poll())
+        self.assertIsNone(operation.poll())
+        responses, resource_error, polled = operation.result()
+        self.assertEqual([response.json_object for response in responses], [{'name': 'item1'}])
+        self.assertFalse(resource_error)
+        self.assertTrue(polled)
+        self.assertEqual(self.sent[-1], "GET /items/item1 HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        stats = AsyncPollingStats.Instance().to_dict()['items']
+        self.assertEqual((stats['operations'], stats['succeeded'], stats['polls']), (1, 1, 3))
+
+    def test_failed(self):
+        """ Test that a failed operation, and an invalid status, are reported """
+        operation = self.make_operation([status_response('Failed')])
+        self.assertIsNone(operation.poll())
+        responses, resource_error, _ = operation.result()
+        self.assertTrue(resource_error)
+        self.assertEqual(len(responses), 1)
+        self.assertEqual(responses[0].status_code, '201')
+
+        # A body that is not json is polled again
+        operation = self.make_operation([make_response('200', 'not json'), status_response('Succeeded')],
+                                        name='invalid')
+        self.assertEqual(operation.poll(), 1)
+        self.assertIsNone(operation.poll())
+        stats = AsyncPollingStats.Instance().to_dict()['items']
+        self.assertEqual((stats['operations'], stats['failed']), (1, 1))
+
+    def test_run_timeout(self):
+        """ Test that the operation times out after max_async_wait_time """
+        operation = self.make_operation([status_response('InProgress')], max_async_wait_time=0.2)
+        start = time.time()
+        responses, resource_error, polled = operation.run()
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual([response.json_object for response in responses], [{'name': 'item1'}])
+        self.assertFalse(resource_error)
+        self.assertEqual(AsyncPollingStats.Instance().to_dict()['items']['timed_out'], 1)
+
+    def test_poller(self):
+        """ Test that the poller polls the operations in the order of their next poll, up to their deadline """
+        poller = AsyncResourcePoller()
+        slow = self.make_operation([status_response('Succeeded')], name='slow',
+                                   response=make_response('201', retry_after=0.3))
+        fast = self.make_operation([status_response('InProgress', retry_after=0.1),
+                                    status_response('Succeeded')], name='fast')
+        timed_out = self.make_operation([status_response('InProgress', retry_after=4)], name='timed_out',
+                                        max_async_wait_time=0.5)
+        futures = [poller.submit(operation) for operation in [slow, fast, timed_out]]
+        results = [future.result(timeout=10) for future in futures]
+        self.assertTrue(all(polled for _, _, polled in results))
+
+        polls = [data.split(' ')[1] for data in self.sent if data.startswith("GET /operations")]
+        self.assertEqual(polls, ['/operations/fast', '/operations/timed_out', '/operations/fast',
+                                 '/operations/slow'])
+        stats = AsyncPollingStats.Instance().to_dict()['items']
+        self.assertEqual((stats['succeeded'], stats['timed_out'], stats['polls']), (2, 1, 4))
+        self.assertGreaterEqual(stats['max_sec'], 0.5)
+        self.assertLess(stats['max_sec'], 2)
+
+    def test_stats(self):
+        """ Test the average and maximum latency of each resource type """
+        stats = AsyncPollingStats()
+        stats.record('items', 'succeeded', 1.0, 2)
+        stats.record('items', 'failed', 2.0, 3)
+        stats.record('users', 'timed_out', 0.5, 1)
+        self.assertEqual(list(stats.to_dict()), ['items', 'users'])
+        self.assertEqual(dict(stats.to_dict()['items']),
+                         {'operations': 2, 'succeeded': 1, 'failed': 1, 'timed_out': 0, 'polls': 5,
+                          'avg_sec': 1.5, 'max_sec': 2.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import unittest
 import os
+import threading
 import datetime
 from datetime import datetime as dt
 from rest.restler.engine.primitives import CandidateValues, CandidateValuesPool
@@ -128,6 +129,93 @@ class CandidateValuesTest(unittest.TestCase):
         self.assertTrue(x is None)
         pass
 
+    def test_memoized_values(self):
+        """Test that the flattened candidate values are shared and invalidated when the pool changes"""
+        s = RestlerSettings({}, "")
+        pool = CandidateValuesPool()
+        pool.set_candidate_values({
+            "restler_fuzzable_string": ["a", "b"],
+            "restler_fuzzable_string_unquoted": ["c"],
+            "restler_custom_payload": {"tag": ["x"]}
+        }, per_endpoint_custom_mutations={
+            "/endpoint": {"restler_custom_payload": {"other": ["y"]}}
+        })
+        quoted_values = pool.get_candidate_values(primitives.FUZZABLE_STRING, quoted=True)
+        self.assertEqual(quoted_values, ('"a"', '"b"', "c"))
+        self.assertIs(pool.get_candidate_values(primitives.FUZZABLE_STRING, quoted=True), quoted_values)
+        self.assertEqual(pool.get_candidate_values(primitives.FUZZABLE_STRING), ("a", "b", "c"))
+
+        # Per-endpoint values fall back to the shared default values
+        default_payload = pool.get_candidate_values(primitives.CUSTOM_PAYLOAD, tag="tag")
+        self.assertIs(pool.get_candidate_values(primitives.CUSTOM_PAYLOAD, request_id="/endpoint", tag="tag"),
+                      default_payload)
+        self.assertEqual(pool.get_candidate_values(primitives.CUSTOM_PAYLOAD, request_id="/endpoint", tag="other"),
+                         ("y",))
+
+        # Dicts of values are copied, so that the memoized values are not modified
+        payloads = pool.get_candidate_values(primitives.CUSTOM_PAYLOAD)
+        payloads["tag"] = ("z",)
+        self.assertEqual(pool.get_candidate_values(primitives.CUSTOM_PAYLOAD), {"tag": ("x",)})
+
+        pool.set_candidate_values({"restler_fuzzable_string": ["d"]})
+        self.assertEqual(pool.get_candidate_values(primitives.FUZZABLE_STRING, quoted=True), ('"d"', "c"))
+
+    def test_prefetched_value_generators(self):
+        """Test that prefetched generator values are in the same order and track exhaustion the same way"""
+        def generate_string(**kwargs):
+            for x in ["gen_1st", "gen_2nd", "gen_3rd"]:
+                yield x
+
+        def get_values(prefetch_size):
+            RestlerSettings.TEST_DeleteInstance()
+            RestlerSettings({"value_generator_prefetch_size": prefetch_size}, "")
+            pool = CandidateValuesPool()
+            pool._value_generators = {"restler_fuzzable_string": generate_string}
+            value_generator_wrapper = pool.get_candidate_values(primitives.FUZZABLE_STRING)
+            self.assertTrue(primitives.is_value_generator(value_generator_wrapper))
+            done_tracker = {}
+            value_generator = value_generator_wrapper(done_tracker, 7)
+            values = []
+            for _ in range(5):
+                values.append((next(value_generator), dict(done_tracker)))
+            value_generator.close()
+            return values
+
+        values = get_values(0)
+        self.assertEqual(values[3], ("gen_1st", {7: True}))
+        self.assertEqual(get_values(2), values)
+
+        # A generator without values is marked as done
+        def generate_nothing(**kwargs):
+            yield from []
+
+        for prefetch_size in [0, 2]:
+            RestlerSettings.TEST_DeleteInstance()
+            RestlerSettings({"value_generator_prefetch_size": prefetch_size}, "")
+            pool = CandidateValuesPool()
+            pool._value_generators = {"restler_fuzzable_string": generate_nothing}
+            done_tracker = {}
+            value_generator = pool.get_candidate_values(primitives.FUZZABLE_STRING)(done_tracker, 7)
+            with self.assertRaises(RuntimeError):
+                next(value_generator)
+            self.assertEqual(done_tracker, {7: True})
+
+        # Seeded value generators are not prefetched, so their values can be reproduced
+        value_gen_file_path = os.path.join(os.path.dirname(primitives.__file__), '..', 'checkers',
+                                           'invalid_value_checker_value_gen.py')
+        seeded_values = []
+        for prefetch_size in [0, 2]:
+            RestlerSettings.TEST_DeleteInstance()
+            RestlerSettings({"value_generator_prefetch_size": prefetch_size}, "")
+            pool = CandidateValuesPool()
+            pool.set_value_generators(value_gen_file_path, random_seed=0)
+            value_generator = pool.get_candidate_values(primitives.FUZZABLE_STRING)({}, 0)
+            num_threads = threading.active_count()
+            seeded_values.append([next(value_generator) for _ in range(3)])
+            self.assertEqual(threading.active_count(), num_threads)
+            value_generator.close()
+        self.assertEqual(seeded_values[0], seeded_values[1])
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
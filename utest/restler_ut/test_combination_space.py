@@ -0,0 +1,233 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import functools
+import itertools
+import json
+import operator
+import os
+import unittest
+import rest.restler.restler_settings as restler_settings
+from rest.restler.restler_settings import RestlerSettings
+from rest.restler.restler_settings import LogSetting
+from rest.restler.engine import primitives
+from rest.restler.engine.core.requests import CombinationSpace
+from rest.restler.engine.core.requests import CoveringArraySpace
+from rest.restler.engine.core.requests import get_covering_array
+from rest.restler.engine.core.requests import Request
+from rest.restler.engine.core.requests import SampledCombinationSpace
+from rest.restler.engine.core.requests import SchemaCombinations
+from rest.restler.engine.core.requests import SharedRequest
+
+FUZZABLE = [['a', 'b'], ['static'], ['x', 'y', 'z'], ['1', '2']]
+
+
+class CombinationSpaceTest(unittest.TestCase):
+
+    def test_product_order(self):
+        """ Test that combination ids are decoded in the order of itertools.product """
+        space = CombinationSpace(FUZZABLE, max_combinations=100)
+        expected = list(itertools.product(*FUZZABLE))
+        self.assertEqual(len(space), len(expected))
+        self.assertEqual([space[i] for i in range(len(space))], expected)
+        self.assertEqual(list(space.iter_from(0)), expected)
+        for start in range(len(expected) + 1):
+            self.assertEqual(list(space.iter_from(start)), expected[start:])
+        with self.assertRaises(IndexError):
+            space[len(expected)]
+
+    def test_max_combinations(self):
+        """ Test that the space is truncated, or cycled, up to max_combinations """
+        expected = list(itertools.product(*FUZZABLE))
+        space = CombinationSpace(FUZZABLE, max_combinations=5)
+        self.assertEqual(list(space.iter_from(2)), expected[2:5])
+
+        space = CombinationSpace(FUZZABLE, max_combinations=30, cycle=True)
+        self.assertEqual(len(space), 30)
+        self.assertEqual(space.product_len, 12)
+        self.assertEqual(space[25], expected[1])
+        self.assertEqual(list(space.iter_from(10)), (expected * 3)[10:30])
+        self.assertEqual(list(space.iter_from(0)), (expected * 3)[:30])
+
+        self.assertEqual(len(CombinationSpace([['a'], []], max_combinations=10, cycle=True)), 0)
+
+    def test_sampled(self):
+        """ Test that sampled combinations are distinct, reproducible and drawn from the whole space """
+        expected = list(itertools.product(*FUZZABLE))
+        space = SampledCombinationSpace(FUZZABLE, max_combinations=5, seed=1)
+        combinations = list(space.iter_from(0))
+        self.assertEqual(len(set(combinations)), 5)
+        self.assertTrue(set(combinations).issubset(expected))
+        self.assertEqual(list(SampledCombinationSpace(FUZZABLE, max_combinations=5, seed=1).iter_from(2)),
+                         combinations[2:])
+        self.assertEqual(sorted(SampledCombinationSpace(FUZZABLE, max_combinations=100, seed=2).iter_from(0)),
+                         sorted(expected))
+
+        # The space is too large to enumerate
+        fuzzable = [[str(value) for value in range(20)]] * 30
+        space = SampledCombinationSpace(fuzzable, max_combinations=1000, seed=3)
+        self.assertEqual(len(set(space.iter_from(0))), 1000)
+        self.assertGreater(len({combination[0] for combination in space.iter_from(0)}), 1)
+
+
+class CoveringArrayTest(unittest.TestCase):
+
+    def assertCovers(self, radixes, strength, rows):
+        active = [dim for dim, radix in enumerate(radixes) if radix > 1]
+        for dims in itertools.combinations(active, strength):
+            covered = {tuple(row[dim] for dim in dims) for row in rows}
+            self.assertEqual(len(covered), len(list(itertools.product(*[range(radixes[dim]) for dim in dims]))))
+
+    def test_covering_array(self):
+        """ Test that every combination of values of any N lists is covered """
+        for radixes, strength, seed in [((3, 3, 3, 3), 2, None), ((4, 1, 3, 2, 5), 2, 7),
+                                        ((2,) * 8, 3, None), ((10,) * 10, 2, None)]:
+            rows = get_covering_array(radixes, strength, seed)
+            self.assertCovers(radixes, strength, rows)
+            self.assertLess(len(rows), functools.reduce(operator.mul, radixes) / 4)
+        self.assertEqual(len(get_covering_array((3, 3, 3, 3), 2, max_rows=4)), 4)
+        self.assertEqual(get_covering_array((2, 0), 2), ())
+
+    def test_max_rows(self):
+        """ Test that only the rows needed are built, for spaces with many uncovered combinations """
+        rows = get_covering_array((30,) * 15, 3, max_rows=20)
+        self.assertEqual(len(set(rows)), 20)
+        # Each row starts from the first combination not covered yet
+        self.assertEqual([row[:3] for row in rows[:3]], [(0, 0, 0), (0, 0, 1), (0, 0, 2)])
+        rows = get_covering_array((100,) * 20, 2, seed=1, max_rows=20)
+        self.assertEqual(len(set(rows)), 20)
+
+    def test_space(self):
+        """ Test that the combinations are the rows of the covering array """
+        space = CoveringArraySpace(FUZZABLE, max_combinations=100, strength=2)
+        self.assertEqual(space.product_len, 6)
+        self.assertEqual(list(space.iter_from(0)), [space[i] for i in range(len(space))])
+        self.assertEqual(list(space.iter_from(4)), list(space.iter_from(0))[4:])
+        self.assertCovers([len(values) for values in FUZZABLE], 2,
+                          [[values.index(value) for values, value in zip(FUZZABLE, combination)]
+                           for combination in space.iter_from(0)])
+
+        space = CoveringArraySpace(FUZZABLE, max_combinations=10, strength=2, cycle=True)
+        self.assertEqual(list(space.iter_from(0))[6:], list(space.iter_from(0))[:4])
+
+    def test_render_pairwise(self):
+        """ Test that render_iter renders the rows of the covering array and seeks them by id """
+        RestlerSettings({'max_combinations': 1000, 'combination_strategy': 'pairwise'}, "")
+        with open(os.path.join(os.path.dirname(restler_settings.__file__), "log_settings.json")) as file_handler:
+            LogSetting().init_from_json(json.load(file_handler))
+        try:
+            pool = primitives.CandidateValuesPool()
+            pool.set_candidate_values({'restler_fuzzable_string': ['a', 'b', 'c', 'd'],
+                                       'restler_fuzzable_int': ['1', '2', '3', '4']})
+            request = Request([primitives.restler_static_string("GET /a?w="),
+                               primitives.restler_fuzzable_string("fuzzstring"),
+                               primitives.restler_static_string("&x="),
+                               primitives.restler_fuzzable_int("1"),
+                               primitives.restler_static_string("&y="),
+                               primitives.restler_fuzzable_string("fuzzstring"),
+                               primitives.restler_static_string("&z="),
+                               primitives.restler_fuzzable_int("1"),
+                               primitives.restler_static_string(" HTTP/1.1\r\n\r\n")])
+            renderings = [rendering[0] for rendering in request.render_iter(pool)]
+            # Each parameter has 5 values, including its default
+            self.assertLess(len(renderings), 5 ** 4 / 8)
+            self.assertEqual(request.num_combinations(pool), len(renderings))
+            for skip in [1, 7, len(renderings) - 1]:
+                self.assertEqual(next(request.render_iter(pool, skip=skip))[0], renderings[skip])
+        finally:
+            RestlerSettings.TEST_DeleteInstance()
+
+
+class SchemaCombinationsTest(unittest.TestCase):
+
+    def setUp(self):
+        RestlerSettings({'test_combinations_settings': {'max_cached_schema_combinations': 2}}, "")
+        with open(os.path.join(os.path.dirname(restler_settings.__file__), "log_settings.json")) as file_handler:
+            LogSetting().init_from_json(json.load(file_handler))
+        SchemaCombinations.TEST_ClearCache()
+        self.pool = primitives.CandidateValuesPool()
+        self.pool.set_candidate_values({'restler_fuzzable_string': ['a', 'b']})
+
+    def tearDown(self):
+        SchemaCombinations.TEST_ClearCache()
+        RestlerSettings.TEST_DeleteInstance()
+
+    @staticmethod
+    def make_request():
+        return Request([
+            primitives.restler_static_string("GET "),
+            primitives.restler_basepath("/api"),
+            primitives.restler_static_string("/a?x="),
+            primitives.restler_fuzzable_string("fuzzstring"),
+            primitives.restler_static_string(" HTTP/1.1\r\n\r\n")
+        ])
+
+    def test_cached_schemas(self):
+        """ Test that schema combinations and their fuzzable values are reused until they change """
+        request = self.make_request()
+        renderings = [rendering[0] for rendering in request.render_iter(self.pool)]
+        schema_combinations = request._schema_combinations
+        schema = schema_combinations.get(0)
+        fuzzable_values = schema.fuzzable_values
+        self.assertEqual([rendering[0] for rendering in request.render_iter(self.pool)], renderings)
+        self.assertIs(request._schema_combinations, schema_combinations)
+        self.assertIs(schema.fuzzable_values, fuzzable_values)
+
+        self.pool.set_candidate_values({'restler_fuzzable_string': ['c']})
+        self.assertEqual(next(request.render_iter(self.pool))[0], "GET /api/a?x=c HTTP/1.1\r\n\r\n")
+        self.assertIsNot(schema.fuzzable_values, fuzzable_values)
+
+        # Modifying the definition in place invalidates the cache
+        request.update_basepath()
+        self.assertIsNone(schema_combinations.definition)
+        next(request.render_iter(self.pool))
+        self.assertIsNot(request._schema_combinations, schema_combinations)
+
+    def test_url_encoded_values(self):
+        """ Test that the candidate values of the query are URL-encoded once per schema """
+        self.pool.set_candidate_values({'restler_fuzzable_string': ['a b', 'c/d&']})
+        request = self.make_request()
+        renderings = [rendering[0] for rendering in request.render_iter(self.pool)]
+        self.assertEqual(set(renderings), {"GET /api/a?x=a+b HTTP/1.1\r\n\r\n",
+                                           "GET /api/a?x=c/d%26 HTTP/1.1\r\n\r\n"})
+        url_encodings = request._schema_combinations.get(0).fuzzable_values[1][4]
+        self.assertEqual(url_encodings[3], {'a b': 'a+b', 'c/d&': 'c/d%26'})
+
+    def test_lru(self):
+        """ Test that the least recently rendered requests are evicted from the cache """
+        first = self.make_request()
+        second = self.make_request()
+        next(first.render_iter(self.pool))
+        self.assertEqual(len(first._schema_combinations._schemas), 1)
+        list(first.render_iter(self.pool))
+        list(second.render_iter(self.pool))
+        self.assertEqual(len(first._schema_combinations._schemas), 0)
+        self.assertEqual(len(second._schema_combinations._schemas), 2)
+
+    def test_shared_copies(self):
+        """ Test that the copies of a request use the caches prepared on the request """
+        expected = [rendering[0] for rendering in self.make_request().render_iter(self.pool)]
+        SchemaCombinations.TEST_ClearCache()
+        request = self.make_request()
+        request.prepare_render_caches(self.pool)
+        schema_combinations = request._schema_combinations
+        fuzzable_values = schema_combinations.get(0).fuzzable_values
+        self.assertIsNotNone(fuzzable_values)
+
+        request_copy = SharedRequest(request)
+        renderings = [rendering[0] for rendering in request_copy.render_iter(self.pool)]
+        self.assertEqual(renderings, expected)
+        self.assertIs(request_copy._schema_combinations, schema_combinations)
+        self.assertIs(schema_combinations.get(0).fuzzable_values, fuzzable_values)
+        self.assertIsNone(request_copy._attributes)
+
+        # A copy with a different definition has its own caches
+        request_copy._definition = request.definition[:2] + [primitives.restler_static_string("/b?x=")] + \
+            request.definition[3:]
+        next(request_copy.render_iter(self.pool))
+        self.assertIsNot(request_copy._schema_combinations, schema_combinations)
+        self.assertIs(request._schema_combinations, schema_combinations)
+
+
+if __name__ == '__main__':
+    unittest.main()
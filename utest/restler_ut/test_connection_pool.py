@@ -0,0 +1,66 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import socket
+import time
+import unittest
+from rest.restler.engine.transport_layer.connection_pool import HttpConnectionPool
+
+
+class ConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sockets = []
+
+    def tearDown(self):
+        for sock in self.sockets:
+            sock.close()
+
+    def _socket_pair(self):
+        pair = socket.socketpair()
+        self.sockets.extend(pair)
+        return pair
+
+    def test_reuse(self):
+        """ Test that a released connection is reused for the same key only """
+        pool = HttpConnectionPool(max_idle_connections=2, idle_timeout_sec=30)
+        client, _ = self._socket_pair()
+        pool.release('a', client)
+        self.assertIsNone(pool.acquire('b'))
+        self.assertIs(pool.acquire('a'), client)
+        self.assertIsNone(pool.acquire('a'))
+        stats = pool.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+
+    def test_stale_connection(self):
+        """ Test that a connection closed by the server is not reused """
+        pool = HttpConnectionPool(max_idle_connections=2, idle_timeout_sec=30)
+        client, server = self._socket_pair()
+        pool.release('a', client)
+        server.close()
+        self.assertIsNone(pool.acquire('a'))
+        self.assertEqual(pool.stats()['stale_connections'], 1)
+
+    def test_idle_eviction(self):
+        """ Test that connections idle for too long are closed """
+        pool = HttpConnectionPool(max_idle_connections=2, idle_timeout_sec=0.1)
+        client, _ = self._socket_pair()
+        pool.release('a', client)
+        time.sleep(0.2)
+        self.assertIsNone(pool.acquire('a'))
+        self.assertEqual(pool.stats()['idle_evictions'], 1)
+
+    def test_size_limit(self):
+        """ Test that the oldest connection is closed when the pool is full """
+        pool = HttpConnectionPool(max_idle_connections=2, idle_timeout_sec=30)
+        clients = [self._socket_pair()[0] for _ in range(3)]
+        for client in clients:
+            pool.release('a', client)
+        self.assertEqual(pool.stats()['size_limit_evictions'], 1)
+        self.assertEqual(clients[0].fileno(), -1)
+        self.assertIs(pool.acquire('a'), clients[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
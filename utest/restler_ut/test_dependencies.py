@@ -0,0 +1,53 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import copy
+import pickle
+import unittest
+
+from rest.restler.restler_settings import RestlerSettings
+import rest.restler.engine.dependencies as dependencies
+from rest.restler.engine.core.sequences import Sequence
+
+PLACEHOLDER = dependencies.RDELIM + 'store_id' + dependencies.RDELIM
+
+
+class DependenciesTest(unittest.TestCase):
+
+    def setUp(self):
+        RestlerSettings.TEST_DeleteInstance()
+        RestlerSettings({}, "")
+
+    def tearDown(self):
+        dependencies.reset_tlb()
+        RestlerSettings.TEST_DeleteInstance()
+
+    def test_split_rendered_values(self):
+        """ Test that the placeholders located at render time match splitting the request """
+        values = ['GET /stores/', PLACEHOLDER, '/items', ' HTTP/1.1\r\n\r\n',
+                  '{"ids": ["' + PLACEHOLDER + '", "' + PLACEHOLDER + '"]}']
+        rendered_data = dependencies.split_rendered_values(values, [1, 4])
+        self.assertIsInstance(rendered_data, dependencies.RenderedData)
+        self.assertEqual(rendered_data, "".join(values))
+        self.assertEqual(list(rendered_data.segments), "".join(values).split(dependencies.RDELIM))
+        self.assertEqual(copy.deepcopy(rendered_data).segments, rendered_data.segments)
+        self.assertEqual(pickle.loads(pickle.dumps(rendered_data)).segments, rendered_data.segments)
+
+        rendered_data = dependencies.split_rendered_values(values[2:4], [0])
+        self.assertNotIsInstance(rendered_data, dependencies.RenderedData)
+        self.assertEqual(rendered_data, "".join(values[2:4]))
+
+    def test_resolve_dependencies(self):
+        """ Test that dependencies are resolved with the value that was last set """
+        values = ['GET /stores/', PLACEHOLDER, ' HTTP/1.1\r\n\r\n']
+        rendered_data = dependencies.split_rendered_values(values, [1])
+        dependencies.set_variable_no_gc('store_id', 'a"b')
+        self.assertEqual(Sequence().resolve_dependencies(rendered_data), 'GET /stores/a\\"b HTTP/1.1\r\n\r\n')
+        self.assertEqual(Sequence().resolve_dependencies(str(rendered_data)),
+                         'GET /stores/a\\"b HTTP/1.1\r\n\r\n')
+        dependencies.set_variable_no_gc('store_id', 'c')
+        self.assertEqual(Sequence().resolve_dependencies(rendered_data), 'GET /stores/c HTTP/1.1\r\n\r\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
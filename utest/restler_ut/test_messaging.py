@@ -0,0 +1,245 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import hashlib
+import socket
+import threading
+import unittest
+import rest.restler.engine.transport_layer.messaging as messaging
+from rest.restler.engine.errors import TransportLayerException
+from rest.restler.engine.transport_layer.connection_pool import ConnectionPool
+from rest.restler.engine.transport_layer.connection_pool import HttpConnectionPool
+from rest.restler.engine.transport_layer.messaging import HttpSock
+from rest.restler.engine.transport_layer.messaging import HttpResponseReader
+from rest.restler.engine.transport_layer.messaging import encode_request_message
+from rest.restler.engine.transport_layer.messaging import detach_ssl_contexts
+from rest.restler.engine.transport_layer.messaging import get_ssl_context
+from rest.restler.engine.transport_layer.messaging import get_utf8_prefix_end
+from rest.restler.engine.transport_layer.messaging import send_segments
+from rest.restler.restler_settings import ConnectionSettings
+from rest.restler.restler_settings import RestlerSettings
+
+
+class HttpResponseReaderTest(unittest.TestCase):
+
+    def _read(self, parts, method_name="GET", close=False, reader=None):
+        """ Sends @param parts over a socket pair and reads them back as a response """
+        reader_sock, writer_sock = socket.socketpair()
+
+        def write():
+            for part in parts:
+                writer_sock.sendall(part)
+            if close:
+                writer_sock.close()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            return (reader or HttpResponseReader()).read(reader_sock, 2, method_name)
+        finally:
+            writer.join()
+            reader_sock.close()
+            if not close:
+                writer_sock.close()
+
+    def test_content_length(self):
+        """ Test that exactly Content-Length bytes are read, across partial reads """
+        message = b'HTTP/1.1 200 OK\r\nContent-Length: 8\r\n\r\n{"a": 1}'
+        response = self._read([message[:5], message[5:30], message[30:]])
+        self.assertEqual(response, message.decode())
+
+    def test_chunked(self):
+        """ Test that chunked responses end after the last chunk and trailers,
+            even if chunk data contains the header delimiter """
+        message = b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n' \
+                  b'4;ext=1\r\n\r\n\r\n\r\n4\r\n{"a"\r\n0\r\nX-Trailer: 1\r\n\r\n'
+        parts = [message[i:i + 3] for i in range(0, len(message), 3)]
+        self.assertEqual(self._read(parts), message.decode())
+
+    def test_bogus_content_length(self):
+        """ Test that the buffer is not sized from a Content-Length that is never received """
+        message = b'HTTP/1.1 200 OK\r\nContent-Length: 100000000000\r\n\r\nabc'
+        reader = HttpResponseReader()
+        self.assertEqual(self._read([message], close=True, reader=reader), message.decode())
+        self.assertFalse(reader.keep_alive)
+
+    def test_no_body(self):
+        """ Test that 204 and HEAD responses do not wait for a body """
+        message = b'HTTP/1.1 204 No Content\r\n\r\n'
+        self.assertEqual(self._read([message]), message.decode())
+        message = b'HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\n'
+        self.assertEqual(self._read([message], method_name="HEAD"), message.decode())
+
+    def test_connection_closed(self):
+        """ Test that the data received before the connection is closed is returned """
+        self.assertEqual(self._read([], close=True), '')
+        message = b'HTTP/1.1 200 OK\r\n\r\nabc'
+        self.assertEqual(self._read([message], close=True), message.decode())
+
+    def test_max_body_bytes(self):
+        """ Test that only a prefix of large bodies is kept and the whole body is hashed """
+        header = b'HTTP/1.1 200 OK\r\nContent-Length: 200000\r\n\r\n'
+        body = bytes(range(256)) * 781 + b'x' * 64
+        reader = HttpResponseReader(max_body_bytes=10)
+        parts = [header + body[:100]] + [body[i:i + 50000] for i in range(100, len(body), 50000)]
+        response = self._read(parts, reader=reader)
+        self.assertEqual(response, header.decode() + '\x00\x01\x02\x03\x04\x05\x06\x07\x08\t')
+        self.assertTrue(reader.keep_alive)
+        self.assertEqual(reader.body_overflow.body_length, 200000)
+        self.assertEqual(reader.body_overflow.sha256, hashlib.sha256(body).hexdigest())
+
+        # Chunked bodies, with chunk size lines split across reads
+        chunks = b''.join(b'%x\r\n' % len(body[i:i + 999]) + body[i:i + 999] + b'\r\n'
+                          for i in range(0, len(body), 999)) + b'0\r\n\r\n'
+        header = b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n'
+        parts = [header] + [chunks[i:i + 777] for i in range(0, len(chunks), 777)]
+        self._read(parts, reader=reader)
+        self.assertTrue(reader.keep_alive)
+        self.assertEqual(reader.body_overflow.body_length, len(chunks))
+        self.assertEqual(reader.body_overflow.sha256, hashlib.sha256(chunks).hexdigest())
+
+        # Bodies without a length are read until the connection is closed
+        header = b'HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\n\r\n'
+        response = self._read([header, b'a' * 3000000], close=True, reader=reader)
+        self.assertEqual(response, header.decode() + 'a' * 10)
+        self.assertEqual(reader.body_overflow.body_length, 3000000)
+
+    def test_max_body_bytes_utf8(self):
+        """ Test that the kept prefix of a text body is not cut inside a character """
+        body = '{"name": "h\u00e9llo w\u00f6rld"}'.encode('utf-8')
+        header = b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n' % len(body)
+        reader = HttpResponseReader(False, 12)
+        self.assertEqual(self._read([header + body], reader=reader), header.decode() + '{"name": "h')
+        self.assertEqual(reader.body_overflow.body_length, len(body))
+        reader = HttpResponseReader(False, 13)
+        self.assertEqual(self._read([header + body], reader=reader), header.decode() + '{"name": "h\u00e9')
+
+        for text in ['a\u00e9', '\u20ac\u20ac', '\U0001f600']:
+            encoded = text.encode('utf-8')
+            for end in range(len(encoded) + 1):
+                prefix_end = get_utf8_prefix_end(encoded, 0, end)
+                self.assertTrue(text.startswith(encoded[:prefix_end].decode('utf-8')))
+                self.assertGreater(prefix_end, end - 4)
+
+    def test_binary_body(self):
+        """ Test that bodies of binary content types are not decoded as UTF-8 """
+        message = b'HTTP/1.1 200 OK\r\nContent-Type: application/octet-stream\r\n' \
+                  b'Content-Length: 3\r\n\r\n\xff\xfe\x00'
+        self.assertEqual(self._read([message]), message.decode('latin-1'))
+        with self.assertRaises(UnicodeDecodeError):
+            self._read([message.replace(b'octet-stream', b'json')])
+
+    def test_timeout(self):
+        """ Test that a missing body raises a timeout """
+        with self.assertRaises(TransportLayerException):
+            self._read([b'HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\n'])
+
+
+class EncodeRequestMessageTest(unittest.TestCase):
+
+    def test_encode(self):
+        """ Test that the headers are added before the body and that the
+            Content-Length is the length of the encoded body """
+        connection_settings = ConnectionSettings('localhost', 80, use_ssl=False, user_agent='test')
+        message, segments = encode_request_message(
+            'PUT /a HTTP/1.1\r\nHost: x\r\n\r\n{"a": "\u00e9"}', connection_settings)
+        self.assertEqual(message, 'PUT /a HTTP/1.1\r\nHost: x\r\nContent-Length: 11\r\n'
+                                  'User-Agent: test\r\n\r\n{"a": "\u00e9"}')
+        self.assertEqual(b''.join(segments), message.encode('utf-8'))
+
+        message, segments = encode_request_message(
+            'PUT /a HTTP/1.1\r\nContent-Length: 2\r\n\r\n{}', ConnectionSettings('localhost', 80))
+        self.assertEqual(message, 'PUT /a HTTP/1.1\r\nContent-Length: 2\r\n\r\n{}')
+        self.assertEqual(len(segments), 1)
+
+    def test_send_segments(self):
+        """ Test that large segments are sent completely with partial sends """
+        segments = [b'a' * 100000, b'', memoryview(b'b' * 300000)[1:]]
+        reader_sock, writer_sock = socket.socketpair()
+        received = bytearray()
+
+        def read():
+            while len(received) < 399999:
+                received.extend(reader_sock.recv(65536))
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        try:
+            send_segments(writer_sock, segments)
+        finally:
+            reader.join()
+            reader_sock.close()
+            writer_sock.close()
+        self.assertEqual(bytes(received), b'a' * 100000 + b'b' * 299999)
+
+    def test_send_segments_without_sendmsg(self):
+        """ Test that the segments are sent at once by sockets without sendmsg """
+        class Socket(object):
+            def __init__(self):
+                self.sent = []
+
+            def sendall(self, data):
+                self.sent.append(bytes(data))
+
+        sock = Socket()
+        send_segments(sock, [b'GET / HTTP/1.1', memoryview(b'\r\nA: 1'), b'\r\n\r\n'])
+        self.assertEqual(sock.sent, [b'GET / HTTP/1.1\r\nA: 1\r\n\r\n'])
+
+
+class FakeSslSocket(object):
+    def __init__(self, session_reused, session):
+        self.session_reused = session_reused
+        self.session = session
+
+    def close(self):
+        pass
+
+
+class FakeSslContext(object):
+    """ Records the sessions that sockets are wrapped with """
+    def __init__(self):
+        self.sessions = []
+
+    def wrap_socket(self, sock, server_hostname=None, session=None):
+        self.sessions.append(session)
+        return FakeSslSocket(session is not None, f"session{len(self.sessions)}")
+
+
+class SslContextTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server_sock = socket.create_server(('127.0.0.1', 0))
+        RestlerSettings.TEST_DeleteInstance()
+        RestlerSettings({'target_ip': '127.0.0.1', 'target_port': self.server_sock.getsockname()[1],
+                         'host': 'localhost'}, "")
+        HttpConnectionPool.TEST_DeleteInstance()
+        detach_ssl_contexts()
+
+    def tearDown(self):
+        detach_ssl_contexts()
+        HttpConnectionPool.TEST_DeleteInstance()
+        RestlerSettings.TEST_DeleteInstance()
+        self.server_sock.close()
+
+    def test_cached_context(self):
+        """ Test that the context of each connection settings is created once, until detached """
+        connection_settings = ConnectionSettings('127.0.0.1', 443)
+        context = get_ssl_context(connection_settings)
+        self.assertIs(get_ssl_context(connection_settings), context)
+        self.assertIsNot(get_ssl_context(ConnectionSettings('127.0.0.1', 443)), context)
+        detach_ssl_contexts()
+        self.assertIsNot(get_ssl_context(connection_settings), context)
+
+    def test_session_reuse(self):
+        """ Test that new connections resume the last TLS session established with the target """
+        connection_settings = RestlerSettings.Instance().connection_settings
+        context = FakeSslContext()
+        messaging._ssl_contexts[connection_settings] = context
+        for _ in range(3):
+            HttpSock(connection_settings).set_up_connection()
+        self.assertEqual(context.sessions, [None, 'session1', 'session2'])
+        self.assertEqual(dict(ConnectionPool().tls_stats()), {'full': 1, 'resumed': 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import unittest
+from rest.restler.engine.transport_layer.rate_limiter import RequestRateLimiter
+from rest.restler.engine.transport_layer.rate_limiter import TokenBucket
+from rest.restler.engine.transport_layer.rate_limiter import parse_retry_after
+from rest.restler.engine.transport_layer.response import HttpResponse
+
+GET_A = 'GET /a?x=1 HTTP/1.1\r\nHost: one.example\r\n\r\n'
+GET_B = 'GET /b HTTP/1.1\r\nHost: two.example\r\n\r\n'
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def test_token_bucket(self):
+        """ Test that a bucket allows a burst and then spaces out requests """
+        bucket = TokenBucket(rate=10, burst=2)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertAlmostEqual(bucket.reserve(), 0.1, delta=0.02)
+        self.assertAlmostEqual(bucket.reserve(), 0.2, delta=0.02)
+
+    def test_scope(self):
+        """ Test that the host and endpoint scopes use one bucket per key """
+        limiter = RequestRateLimiter(rate=1, burst=1, scope='host')
+        self.assertEqual(limiter.get_key(GET_A), 'one.example')
+        self.assertEqual(limiter.reserve(GET_A), 0)
+        self.assertEqual(limiter.reserve(GET_B), 0)
+        self.assertGreater(limiter.reserve(GET_A), 0)
+
+        limiter = RequestRateLimiter(rate=1, burst=1, scope='endpoint')
+        self.assertEqual(limiter.get_key(GET_A), ('GET', '/a'))
+        limiter = RequestRateLimiter(rate=1, burst=1, scope='global')
+        self.assertEqual(limiter.get_key(GET_A), limiter.get_key(GET_B))
+
+    def test_retry_after(self):
+        """ Test that Retry-After pauses the bucket and lowers its rate """
+        self.assertEqual(parse_retry_after(' 3 '), 3)
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0)
+        self.assertIsNone(parse_retry_after('soon'))
+
+        # The rate is fixed unless the limiter is adaptive
+        limiter = RequestRateLimiter(rate=100, burst=5)
+        limiter.on_response(GET_A, HttpResponse('HTTP/1.1 429 Too Many Requests\r\nRetry-After: 2\r\n\r\n'))
+        self.assertEqual(limiter.reserve(GET_A), 0)
+        self.assertEqual(limiter._get_bucket('').rate, 100)
+
+        limiter = RequestRateLimiter(rate=100, burst=5, adaptive=True)
+        limiter.on_response(GET_A, HttpResponse('HTTP/1.1 429 Too Many Requests\r\nRetry-After: 2\r\n\r\n'))
+        self.assertAlmostEqual(limiter.reserve(GET_A), 2, delta=0.1)
+        self.assertEqual(limiter._get_bucket('').rate, 50)
+        limiter.on_response(GET_A, HttpResponse('HTTP/1.1 200 OK\r\n\r\n'))
+        self.assertEqual(limiter._get_bucket('').rate, 55)
+        self.assertEqual(limiter.stats()['backpressure_responses'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import pickle
+import unittest
+
+import rest.restler.engine.transport_layer.response as response_module
+from rest.restler.engine.transport_layer.response import HttpResponse
+from rest.restler.engine.transport_layer.response import is_bug_code
+from rest.restler.restler_settings import RestlerSettings
+
+RESPONSE = 'HTTP/1.1 201 Created\r\nContent-Type: application/json\r\nLocation: /items/1\r\n\r\n' \
+           '{"id": 1, "tags": ["a"]}'
+
+
+class HttpResponseTest(unittest.TestCase):
+
+    def setUp(self):
+        RestlerSettings.TEST_DeleteInstance()
+        RestlerSettings({}, "")
+
+    def tearDown(self):
+        RestlerSettings.TEST_DeleteInstance()
+
+    def test_lazy_parsing(self):
+        """ Test that only the status code is parsed when the response is created """
+        response = HttpResponse(RESPONSE)
+        self.assertEqual(response._status_code, '201')
+        for attr in ['_header_end', '_headers', '_json_body', '_json_object']:
+            self.assertIs(getattr(response, attr), response_module._NOT_PARSED)
+
+        self.assertEqual(response.body, '{"id": 1, "tags": ["a"]}')
+        self.assertIs(response._headers, response_module._NOT_PARSED)
+        self.assertIs(response._json_object, response_module._NOT_PARSED)
+
+        # The parsed values are not pickled
+        response = pickle.loads(pickle.dumps(response))
+        self.assertEqual(response.status_code, '201')
+        self.assertIs(response._header_end, response_module._NOT_PARSED)
+        self.assertEqual(response.json_object, {'id': 1, 'tags': ['a']})
+
+    def test_memoized_values(self):
+        """ Test that the headers and the json body are parsed once """
+        response = HttpResponse(RESPONSE)
+        self.assertEqual(response.headers, ['Content-Type: application/json', 'Location: /items/1'])
+        self.assertIs(response.headers, response.headers)
+        self.assertEqual(response.json_body, '{"id": 1, "tags": ["a"]}')
+        self.assertIs(response.json_object, response.json_object)
+
+        # Invalid json is parsed once as well
+        response = HttpResponse('HTTP/1.1 200 OK\r\n\r\n{"id": ')
+        self.assertIsNone(response.json_object)
+        self.assertIsNone(response._json_object)
+
+    def test_headers_dict(self):
+        """ Test that each caller gets its own copy of the parsed headers """
+        response = HttpResponse(RESPONSE)
+        headers = response.headers_dict
+        self.assertEqual(headers, {'Content-Type': ' application/json', 'Location': ' /items/1'})
+        headers['Location'] = ' /items/2'
+        del headers['Content-Type']
+        self.assertEqual(response.headers_dict, {'Content-Type': ' application/json', 'Location': ' /items/1'})
+        self.assertIsNot(response.headers_dict, response.headers_dict)
+
+    def test_is_bug_code(self):
+        """ Test that the bug codes are memoized until the settings change """
+        self.assertTrue(is_bug_code('500'))
+        self.assertFalse(is_bug_code('404'))
+        self.assertEqual(response_module._bug_code_results, {'500': True, '404': False})
+        self.assertTrue(HttpResponse('HTTP/1.1 503 Unavailable\r\n\r\n').has_bug_code())
+        self.assertIn('503', response_module._bug_code_results)
+
+        RestlerSettings.TEST_DeleteInstance()
+        RestlerSettings({'custom_bug_codes': ['40[14]']}, "")
+        self.assertTrue(is_bug_code('404'))
+        self.assertFalse(is_bug_code('403'))
+        self.assertEqual(response_module._bug_code_results, {'404': True, '403': False})
+
+        RestlerSettings.TEST_DeleteInstance()
+        RestlerSettings({'custom_non_bug_codes': ['2.*', '404']}, "")
+        self.assertFalse(is_bug_code('404'))
+        self.assertTrue(is_bug_code('403'))
+        self.assertFalse(is_bug_code('201'))
+
+
+if __name__ == '__main__':
+    unittest.main()
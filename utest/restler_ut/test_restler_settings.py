@@ -14,6 +14,7 @@ from rest.restler.restler_settings import NewSingletonError
 from rest.restler.restler_settings import UninitializedError
 from rest.restler.restler_settings import InvalidValueError
 from rest.restler.restler_settings import OptionValidationError
+from rest.restler.restler_settings import parse_combination_strategy
 from rest.restler.restler_settings import MAX_REQUEST_EXECUTION_TIME_MAX
 from rest.restler.engine import primitives
 
@@ -507,6 +508,38 @@ class RestlerSettingsTest(unittest.TestCase):
         with self.assertRaises(OptionValidationError):
             settings.validate_options()
 
+    def test_combination_strategy(self):
+        self.assertEqual(parse_combination_strategy('product'), ('product', None))
+        self.assertEqual(parse_combination_strategy('pairwise'), ('t-wise', 2))
+        self.assertEqual(parse_combination_strategy('t-wise:3'), ('t-wise', 3))
+        self.assertEqual(parse_combination_strategy('random:0'), ('random', 0))
+        self.assertEqual(parse_combination_strategy('sample'), ('sample', None))
+
+        for strategy in ['t-wise', 't-wise:0', 'random:x', 'lexicographic']:
+            settings = RestlerSettings({'combination_strategy': strategy}, '')
+            with self.assertRaises(OptionValidationError):
+                settings.validate_options()
+            RestlerSettings.TEST_DeleteInstance()
+
+    def test_fuzzing_jobs_mode(self):
+        settings = RestlerSettings({'fuzzing_jobs': 4, 'fuzzing_jobs_mode': 'processes'}, '')
+        settings.validate_options()
+        self.assertEqual('processes', settings.fuzzing_jobs_mode)
+        RestlerSettings.TEST_DeleteInstance()
+
+        settings = RestlerSettings({'fuzzing_jobs': 4}, '')
+        self.assertFalse(settings.fuzzing_jobs_render_ahead)
+        RestlerSettings.TEST_DeleteInstance()
+
+        for user_args in [{'fuzzing_jobs_mode': 'fork'},
+                          {'fuzzing_jobs_mode': 'processes', 'run_gc_after_every_sequence': True},
+                          {'fuzzing_jobs_mode': 'processes', 'value_generator_prefetch_size': 10},
+                          {'fuzzing_jobs_mode': 'processes', 'rate_limit_settings': {'requests_per_second': 10}}]:
+            settings = RestlerSettings(user_args, '')
+            with self.assertRaises(OptionValidationError):
+                settings.validate_options()
+            RestlerSettings.TEST_DeleteInstance()
+
     def test_settings_file_upload(self):
         with open(os.path.join(os.path.dirname(__file__), "restler_user_settings.json")) as json_file:
             settings_file = json.load(json_file)
@@ -46,6 +46,18 @@ class RetryHandlerTest(unittest.TestCase):
         ## Allow for a 1 second delta - this should take about 34 seconds
         self.assertAlmostEqual(end - start, 34, delta=1)
 
+    def test_next_delay(self):
+        """ Test that the delays are computed without waiting and that
+            Retry-After replaces the delay of the strategy, up to max_delay """
+        retry_handler = RetryHandler(RetryStrategy.EXPONENTIAL, max_retries=4, delay=2, max_delay=10)
+        self.assertEqual(retry_handler.next_delay(), 2)
+        self.assertEqual(retry_handler.next_delay(), 4)
+        self.assertEqual(retry_handler.next_delay(retry_after=0.5), 0.5)
+        self.assertEqual(retry_handler.next_delay(retry_after=30), 10)
+        self.assertEqual(retry_handler.num_retries, 4)
+        with self.assertRaises(RetryLimitExceeded):
+            retry_handler.next_delay()
+
 
 if __name__ == '__main__':
     unittest.main()
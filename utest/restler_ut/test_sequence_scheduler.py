@@ -0,0 +1,144 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+from rest.restler.engine.core import renderings_monitor
+from rest.restler.engine.core.fuzzing_monitor import FuzzingMonitor
+from rest.restler.engine.core.fuzzing_monitor import Monitor
+from rest.restler.engine.core.sequence_scheduler import SchedulerStats
+from rest.restler.engine.core.sequence_scheduler import SequenceScheduler
+from rest.restler.engine.core.sequence_scheduler import is_rendering_ahead
+
+REQUESTS = ['a', 'b', 'c']
+
+
+class FakeSequence(object):
+    def __init__(self, requests):
+        self.requests = requests
+
+    @property
+    def hex_definition(self):
+        return "".join(self.requests)
+
+
+def extend(seq_collection):
+    """ Extends each sequence by every request, in the order of driver.extend """
+    return [FakeSequence(sequence.requests + [request]) for request in REQUESTS
+            for sequence in seq_collection]
+
+
+def extend_sequence(sequence, position):
+    return [((req_idx, position), FakeSequence(sequence.requests + [request]))
+            for req_idx, request in enumerate(REQUESTS)]
+
+
+class SequenceSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        FuzzingMonitor()
+        SchedulerStats.TEST_DeleteInstance()
+        self.scheduler = SequenceScheduler(3)
+        self.rendered = []
+        self.lock = threading.Lock()
+        self.checked_requests = set()
+        self.checked = []
+
+    def tearDown(self):
+        self.scheduler.close()
+        self.scheduler.join()
+        SchedulerStats.TEST_DeleteInstance()
+        FuzzingMonitor._FuzzingMonitor__instance = None
+
+    def render(self, sequence, ith, generation):
+        """ Renders a sequence as valid, slowly if it is 'a' """
+        if sequence.requests == ['a']:
+            time.sleep(0.2)
+        with self.lock:
+            self.rendered.append((generation, sequence.hex_definition, renderings_monitor.get_rendering_generation()))
+        Monitor().increment_requests_count('test')
+        Monitor().update_renderings_monitor(SimpleNamespace(hex_definition=sequence.hex_definition,
+                                                            _current_combination_id=1), True)
+        return [sequence]
+
+    def render_with_checker(self, sequence, ith, generation):
+        """ Renders a sequence and checks it, if its request was not checked before """
+        valid_renderings = self.render(sequence, ith, generation)
+        # As driver.apply_checkers
+        if not is_rendering_ahead():
+            with self.lock:
+                if sequence.requests[-1] not in self.checked_requests:
+                    self.checked_requests.add(sequence.requests[-1])
+                    self.checked.append((generation, sequence.hex_definition))
+        return valid_renderings
+
+    def assertRenderings(self, hex_definitions):
+        self.assertEqual(sorted(Monitor().renderings_monitor.get_updates()), sorted(hex_definitions))
+
+    def test_dynamic_queue(self):
+        """ Test that the workers render the other sequences while one is slow """
+        seq_collection = [FakeSequence([request]) for request in 'abcdefg']
+        result = self.scheduler.render(self.render, seq_collection, 1)
+        self.assertEqual([valid_renderings[0] for valid_renderings in result], seq_collection)
+        self.assertEqual(self.rendered[-1][1], 'a')
+        stats = SchedulerStats.Instance().to_dict()
+        self.assertEqual(stats['workers'], 3)
+        self.assertEqual(stats['sequences'], 7)
+        self.assertEqual(stats['rendered_ahead'], 0)
+
+    def test_render_ahead(self):
+        """ Test that the next generation is rendered ahead, in the order of extend """
+        self.scheduler.enable_rendering_ahead(extend_sequence, 2)
+        seq_collection = [FakeSequence([request]) for request in REQUESTS]
+        result = self.scheduler.render(self.render, seq_collection, 1)
+        Monitor().current_fuzzing_generation += 1
+
+        # Sequences of generation 2 were rendered before the slow sequence of generation 1
+        rendered = [sequence for generation, sequence, _ in self.rendered]
+        self.assertLess(rendered.index('bb'), rendered.index('a'))
+        self.assertIn((2, 'bb', 1), self.rendered)
+
+        seq_collection = extend([valid_renderings[0] for valid_renderings in result])
+        result = self.scheduler.render(self.render, seq_collection, 2)
+        self.assertEqual([valid_renderings[0].hex_definition for valid_renderings in result],
+                         [sequence.hex_definition for sequence in seq_collection])
+        self.assertEqual(len(self.rendered), 12)
+        self.assertEqual(SchedulerStats.Instance().to_dict()['rendered_ahead'], 9)
+
+        # The updates of the sequences rendered ahead were applied to their generation
+        self.assertEqual(Monitor().num_requests_sent()['test'], 12)
+        self.assertRenderings([sequence.hex_definition for sequence in seq_collection])
+
+    def test_render_ahead_mismatch(self):
+        """ Test that the sequences rendered ahead are not used for a different generation """
+        self.scheduler.enable_rendering_ahead(extend_sequence, 2)
+        self.scheduler.render(self.render, [FakeSequence(['b'])], 1)
+        Monitor().current_fuzzing_generation += 1
+        result = self.scheduler.render(self.render, [FakeSequence(['c', 'c'])], 2)
+        self.assertEqual(result[0][0].hex_definition, 'cc')
+        self.assertIn((2, 'cc', None), self.rendered)
+
+        # The updates of the cancelled sequences were dropped
+        self.assertEqual(Monitor().num_requests_sent()['test'], 2)
+        self.assertRenderings(['cc'])
+
+    def test_render_ahead_checkers(self):
+        """ Test that the checkers are not applied to the sequences rendered ahead that are cancelled """
+        self.scheduler.enable_rendering_ahead(extend_sequence, 2)
+        self.scheduler.render(self.render_with_checker, [FakeSequence(['b'])], 1)
+        Monitor().current_fuzzing_generation += 1
+        # Wait for the sequences rendered ahead
+        deadline = time.time() + 10
+        while len(self.rendered) < 4 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self.rendered), 4)
+
+        self.scheduler.render(self.render_with_checker, [FakeSequence(['b', 'c'])], 2)
+        self.assertEqual(self.checked, [(1, 'b'), (2, 'bc')])
+        self.assertFalse(is_rendering_ahead())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,246 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import copy
+import json
+import os
+import pickle
+import sys
+import unittest
+import rest.restler.engine.core.request_utilities as request_utilities
+import rest.restler.restler_settings as restler_settings
+from rest.restler.restler_settings import RestlerSettings
+from rest.restler.restler_settings import LogSetting
+from rest.restler.engine import primitives
+from rest.restler.engine.core.request_utilities import str_to_hex_def
+from rest.restler.engine.core.requests import BaseRequest
+from rest.restler.engine.core.requests import GlobalRequestCollection
+from rest.restler.engine.core.requests import Request
+from rest.restler.engine.core.requests import RequestCollection
+from rest.restler.engine.core.requests import SharedRequest
+from rest.restler.engine.core.sequences import RenderedSequenceCache
+from rest.restler.engine.core.sequences import Sequence
+from rest.restler.engine.core.sequences import SequenceMemoryStats
+
+
+def make_request(endpoint):
+    return Request([primitives.restler_static_string(f"GET /{endpoint}"),
+                    primitives.restler_static_string(" HTTP/1.1\r\n\r\n")])
+
+
+class SequenceHashTest(unittest.TestCase):
+
+    def setUp(self):
+        RestlerSettings({}, "")
+        with open(os.path.join(os.path.dirname(restler_settings.__file__), "log_settings.json")) as file_handler:
+            LogSetting().init_from_json(json.load(file_handler))
+        self.requests = [make_request(endpoint) for endpoint in ['a', 'b', 'c']]
+
+    def tearDown(self):
+        RestlerSettings.TEST_DeleteInstance()
+
+    def assertHashes(self, sequence, requests):
+        self.assertEqual(sequence.hex_definition,
+                         str_to_hex_def("".join(request.hex_definition for request in requests)))
+        self.assertEqual(sequence.methods_endpoints_hex_definition,
+                         "_".join(f"{request.method_endpoint_hex_definition}" for request in requests))
+
+    def test_extended_hash(self):
+        """ Test that the hashes of an extended sequence are derived from its prefix """
+        sequence = Sequence()
+        self.assertHashes(sequence, [])
+        for ith, request in enumerate(self.requests):
+            sequence = sequence + Sequence(request)
+            self.assertHashes(sequence, self.requests[:ith + 1])
+        self.assertHashes(Sequence(self.requests[:1]) + Sequence(self.requests[1:]), self.requests)
+        self.assertHashes(Sequence(self.requests) + Sequence(), self.requests)
+        self.assertHashes(sequence.prefix, self.requests[:-1])
+
+    def test_cached_hash(self):
+        """ Test that the cached hashes are copied, and reset when the requests change """
+        sequence = Sequence(self.requests)
+        hex_definition = sequence.hex_definition
+        self.assertHashes(copy.copy(sequence), self.requests)
+
+        unpickled = pickle.loads(pickle.dumps(sequence))
+        self.assertEqual(unpickled.hex_definition, hex_definition)
+        self.assertHashes(unpickled + Sequence(self.requests[0]), self.requests + self.requests[:1])
+
+        sequence.requests = sequence.requests[:-1]
+        self.assertHashes(sequence, self.requests[:-1])
+
+    def test_shared_request(self):
+        """ Test that a shared copy of a request only holds the attributes set on it """
+        request = self.requests[0]
+        request_copy = SharedRequest(request)
+        self.assertIsInstance(request_copy, BaseRequest)
+        self.assertEqual(request_copy.hex_definition, request.hex_definition)
+        self.assertIs(request_copy.definition, request.definition)
+        self.assertFalse(hasattr(request_copy, 'stats'))
+        self.assertFalse(hasattr(request_copy, '__dict__'))
+        self.assertEqual(request_copy.memory_size, sys.getsizeof(request_copy))
+        self.assertLess(request_copy.memory_size, copy.copy(request).memory_size)
+
+        request._current_combination_id = 2
+        request_copy._current_combination_id = 1
+        request_copy._total_feasible_combinations = 5
+        request_copy._tracked_parameters = {'id': ['1']}
+        self.assertEqual(request._current_combination_id, 2)
+        self.assertEqual(request._total_feasible_combinations, 0)
+        self.assertEqual(request._tracked_parameters, {})
+        self.assertEqual(request_copy.memory_size, sys.getsizeof(request_copy) + sys.getsizeof({'_tracked_parameters': None}))
+        for other_copy in [copy.copy(request_copy), pickle.loads(pickle.dumps(request_copy))]:
+            self.assertEqual(other_copy._current_combination_id, 1)
+            self.assertEqual(other_copy._total_feasible_combinations, 5)
+            self.assertEqual(other_copy._tracked_parameters, {'id': ['1']})
+            self.assertEqual(other_copy.hex_definition, request.hex_definition)
+            other_copy._tracked_parameters = {}
+            self.assertEqual(request_copy._tracked_parameters, {'id': ['1']})
+
+    def test_shared_request_template(self):
+        """ Test that deep copies and pickles of a shared copy refer to the same grammar request """
+        req_collection = RequestCollection()
+        for request in self.requests:
+            req_collection.add_request(request)
+        GlobalRequestCollection(req_collection)
+        try:
+            request = self.requests[1]
+            request_copy = SharedRequest(SharedRequest(request))
+            request_copy._current_combination_id = 3
+            request_copy._tracked_parameters = {'id': ['1']}
+            request_copy._render_plan = 'plan'
+            self.assertEqual(request._render_plan, 'plan')
+            self.assertLess(len(pickle.dumps(request_copy)), len(pickle.dumps(request)))
+            for other_copy in [copy.deepcopy(request_copy), pickle.loads(pickle.dumps(request_copy))]:
+                self.assertIs(other_copy._template, request)
+                self.assertEqual(other_copy._current_combination_id, 3)
+                self.assertEqual(other_copy._tracked_parameters, {'id': ['1']})
+                self.assertIsNot(other_copy._tracked_parameters, request_copy._tracked_parameters)
+
+            other_request = make_request('d')
+            self.assertIsNot(pickle.loads(pickle.dumps(SharedRequest(other_request)))._template, other_request)
+        finally:
+            GlobalRequestCollection._GlobalRequestCollection__instance = None
+
+    def test_memory_stats(self):
+        """ Test that the memory of the sequences extended with shared copies is reported """
+        SequenceMemoryStats.TEST_DeleteInstance()
+        prefix = Sequence(self.requests[0])
+        shared = [prefix + Sequence(SharedRequest(request)) for request in self.requests]
+        copied = [prefix + Sequence(copy.copy(request)) for request in self.requests]
+        self.assertLess(shared[0].memory_size, copied[0].memory_size)
+
+        SequenceMemoryStats.Instance().record(2, shared)
+        SequenceMemoryStats.Instance().record(3, [])
+        stats = SequenceMemoryStats.Instance().to_dict()
+        self.assertEqual(list(stats), [2, 3])
+        self.assertEqual(stats[2]['sequences'], 3)
+        self.assertEqual(stats[2]['bytes_per_sequence'], round(sum(seq.memory_size for seq in shared) / 3))
+        self.assertEqual(stats[3]['bytes_per_sequence'], 0)
+        SequenceMemoryStats.TEST_DeleteInstance()
+
+
+class RenderedSequenceCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        RestlerSettings({}, "")
+        with open(os.path.join(os.path.dirname(restler_settings.__file__), "log_settings.json")) as file_handler:
+            LogSetting().init_from_json(json.load(file_handler))
+        self.requests = [make_request(endpoint) for endpoint in ['a', 'b', 'c']]
+        self.cache = RenderedSequenceCache()
+
+    def tearDown(self):
+        RestlerSettings.TEST_DeleteInstance()
+
+    def make_rendering(self, combination_ids):
+        requests = [copy.copy(request) for request in self.requests[:len(combination_ids)]]
+        for request, combination_id in zip(requests, combination_ids):
+            request._current_combination_id = combination_id
+        return Sequence(requests)
+
+    def test_longest_prefix(self):
+        """ Test that the renderings of the longest cached prefix are returned, valid ones first """
+        self.assertEqual(self.cache.get_renderings(self.requests), {})
+        self.cache.add_valid_prefixes(self.make_rendering([1, 2]))
+        self.cache.add_valid_prefixes(self.make_rendering([1, 3]))
+        self.cache.add_valid_prefixes(self.make_rendering([1, 2]))
+        self.assertEqual(list(self.cache.get_prefix(self.requests, get_all_renderings=True)),
+                         [((1, 2), True), ((1, 3), True)])
+        self.assertEqual(list(self.cache.get_prefix(self.requests)), [((1, 2), True)])
+
+        self.cache.add_invalid_sequence(self.make_rendering([1, 2, 1]))
+        self.assertEqual(list(self.cache.get_prefix(self.requests, get_all_renderings=True)),
+                         [((1, 2, 1), False)])
+        self.cache.add(self.make_rendering([1, 2, 2]), True)
+        self.assertEqual(list(self.cache.get_prefix(self.requests)), [((1, 2, 2), True)])
+
+        # A prefix is only found from the first request
+        self.assertEqual(list(self.cache.get_prefix(self.requests[1:])), [])
+
+    def test_renderings(self):
+        """ Test that the renderings are copies of the requests with the cached combination ids """
+        self.cache.add_valid_prefixes(self.make_rendering([1, 2]))
+        self.cache.add_valid_prefixes(self.make_rendering([3, 4]))
+        renderings = self.cache.get_renderings(self.requests, get_all_renderings=True)
+        self.assertEqual(list(renderings), [True])
+        self.assertEqual([[request._current_combination_id for request in sequence.requests]
+                          for sequence in renderings[True]], [[1, 2], [3, 4]])
+        for sequence in renderings[True]:
+            for request, original in zip(sequence.requests, self.requests):
+                self.assertIsNot(request, original)
+                self.assertIs(request._definition, original._definition)
+        self.assertEqual([request._current_combination_id for request in self.requests], [0, 0, 0])
+
+
+class SendAheadTest(unittest.TestCase):
+
+    def setUp(self):
+        RestlerSettings({'max_inflight_requests': 4, 'ignore_dependencies': True}, "")
+        with open(os.path.join(os.path.dirname(restler_settings.__file__), "log_settings.json")) as file_handler:
+            LogSetting().init_from_json(json.load(file_handler))
+        self.sent = []
+        self.send_inflight_request_data = request_utilities.send_inflight_request_data
+        request_utilities.send_inflight_request_data = self.send
+
+    def tearDown(self):
+        request_utilities.send_inflight_request_data = self.send_inflight_request_data
+        RestlerSettings.TEST_DeleteInstance()
+
+    def send(self, rendered_data_list):
+        self.sent.extend(rendered_data_list)
+        return [f"response {rendered_data}" for rendered_data in rendered_data_list]
+
+    def test_skipped_renderings(self):
+        """ Test that the renderings to be skipped are queued without being sent """
+        request = make_request('a')
+        request._last_rendered_schema_request = (request, False)
+        sequence = Sequence(request)
+        # Combination ids are checked before being incremented, so the current
+        # rendering (id 0) is already counted
+        request._current_combination_id = 1
+        checked = []
+        def is_invalid_rendering(request, lock):
+            checked.append(request._current_combination_id)
+            return request._current_combination_id == 2
+        sequence._is_invalid_rendering = is_invalid_rendering
+
+        renderings = iter([(f"rendering {ith}", None, {}, {}, None) for ith in range(1, 5)])
+        current = sequence._send_ahead(request, ("rendering 0", None, {}, {}, None), renderings, None)
+        self.assertEqual(checked, [1, 2, 3])
+        self.assertEqual(request._current_combination_id, 1)
+        self.assertEqual(self.sent, ["rendering 0", "rendering 1", "rendering 3"])
+        self.assertEqual(current.response, "response rendering 0")
+        self.assertEqual([inflight.response for inflight in sequence._inflight_renderings],
+                         ["response rendering 1", None, "response rendering 3"])
+        self.assertEqual(next(renderings)[0], "rendering 4")
+
+        self.assertTrue(sequence._has_inflight_responses())
+        sequence._inflight_renderings.popleft()
+        sequence._inflight_renderings.popleft()
+        self.assertTrue(sequence._has_inflight_responses())
+        sequence._inflight_renderings.popleft()
+        self.assertFalse(sequence._has_inflight_responses())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import time
+import unittest
+import rest.restler.engine.core.token_manager as token_manager
+from rest.restler.engine.core.token_manager import TokenManager
+
+
+class TokenManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.refreshes = []
+        self.manager = TokenManager()
+
+    def tearDown(self):
+        self.manager.stop()
+
+    def refresh(self, token_dict):
+        self.refreshes.append(token_dict['token_refresh_interval'])
+
+    def test_background_refresh(self):
+        """ Test that the token is obtained once by the first request and then refreshed in the background """
+        self.manager.ensure_token({'token_refresh_interval': 0.2}, self.refresh)
+        self.manager.ensure_token({'token_refresh_interval': 0.2}, self.refresh)
+        self.assertEqual(len(self.refreshes), 1)
+        time.sleep(0.5)
+        self.assertGreaterEqual(len(self.refreshes), 2)
+        self.assertEqual(self.manager.stats()['refreshes'], len(self.refreshes))
+
+    def test_unauthorized_burst(self):
+        """ Test that a burst of 401 responses triggers an early refresh """
+        self.manager.ensure_token({'token_refresh_interval': 1000}, self.refresh)
+        for _ in range(token_manager.UNAUTHORIZED_BURST_SIZE):
+            self.manager.on_unauthorized()
+        time.sleep(0.1)
+        # The token was just refreshed
+        self.assertEqual(len(self.refreshes), 1)
+
+        self.manager._last_refresh -= token_manager.MIN_OUT_OF_BAND_REFRESH_INTERVAL_SEC
+        for _ in range(token_manager.UNAUTHORIZED_BURST_SIZE):
+            self.manager.on_unauthorized()
+        time.sleep(0.1)
+        self.assertEqual(len(self.refreshes), 2)
+        self.assertEqual(self.manager.stats()['out_of_band_refreshes'], 1)
+
+    def test_refresh_error(self):
+        """ Test that a failed background refresh fails the next request that needs the token """
+        def refresh(token_dict):
+            self.refreshes.append(token_dict)
+            if len(self.refreshes) > 1:
+                raise SystemExit(-1)
+
+        self.manager.ensure_token({'token_refresh_interval': 0.1}, refresh)
+        time.sleep(0.3)
+        with self.assertRaises(SystemExit):
+            self.manager.ensure_token({'token_refresh_interval': 0.1}, refresh)
+
+
+if __name__ == '__main__':
+    unittest.main()
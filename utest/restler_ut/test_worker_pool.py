@@ -0,0 +1,289 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+
+import rest.restler.restler_settings as restler_settings
+from rest.restler.restler_settings import RestlerSettings
+from rest.restler.restler_settings import LogSetting
+import rest.restler.utils.restler_logger as logger
+import rest.restler.engine.dependencies as dependencies
+from rest.restler.engine import primitives
+from rest.restler.engine.bug_bucketing import BugBuckets
+from rest.restler.engine.core.async_request_utilities import AsyncPollingStats
+from rest.restler.engine.core.fuzzing_monitor import FuzzingMonitor
+from rest.restler.engine.core.fuzzing_monitor import Monitor
+from rest.restler.engine.core.retry_handler import RetryStats
+from rest.restler.engine.core.renderings_monitor import RenderingsMonitor
+from rest.restler.engine.core.requests import Request
+from rest.restler.engine.core.requests import SmokeTestStats
+from rest.restler.engine.core.status_codes_monitor import RequestExecutionStatus
+from rest.restler.engine.core.status_codes_monitor import StatusCodesMonitor
+from rest.restler.engine.core.worker_pool import WorkerPool
+from rest.restler.engine.transport_layer.connection_pool import PoolStats
+
+
+def make_sequence(seq_hash, request_hex):
+    return SimpleNamespace(length=1, executed_requests_count=1, definition=[request_hex],
+                           hex_definition=seq_hash, last_request=SimpleNamespace(request_id=request_hex))
+
+
+def make_status(request_hex, status_code):
+    return RequestExecutionStatus(0, request_hex, status_code, True, False)
+
+
+def render(sequence, ith):
+    """ Renders a sequence in a worker process, updating the state of the fuzzing run """
+    Monitor().update_status_codes_monitor(sequence, [make_status(sequence.definition[0], '200')])
+    request = SimpleNamespace(hex_definition=sequence.definition[0], _current_combination_id=ith + 1)
+    Monitor().update_renderings_monitor(request, True)
+    dependencies.set_variable('_item_id', f'item{ith}')
+    BugBuckets.Instance().update_bug_buckets(sequence, '500')
+    return [os.getpid()] * (ith % 2)
+
+
+class OnceChecker(object):
+    """ Checks the last request of each sequence once """
+    def __init__(self):
+        self.checked_requests = set()
+
+    def get_state(self):
+        return {'checked_requests': self.checked_requests}
+
+    def merge_state(self, state):
+        self.checked_requests.update(state['checked_requests'])
+
+    def apply(self, sequence):
+        if sequence.last_request.request_id in self.checked_requests:
+            return []
+        self.checked_requests.add(sequence.last_request.request_id)
+        return [sequence.hex_definition]
+
+
+once_checker = OnceChecker()
+
+
+def render_with_checker(sequence, ith):
+    """ Renders a sequence in a worker process, applying the checker """
+    return once_checker.apply(sequence)
+
+
+def make_request(endpoint):
+    request = Request([primitives.restler_static_string(f"GET /{endpoint}"),
+                       primitives.restler_static_string(" HTTP/1.1\r\n\r\n")])
+    request.stats = SmokeTestStats()
+    return request
+
+
+def render_with_coverage(sequence, ith):
+    """ Renders a sequence in a worker process, logging the spec coverage of its request """
+    request = make_request(sequence.hex_definition)
+    logger.SpecCoverageLog.Instance().log_request_coverage_incremental(request=request, log_rendered_hash=False)
+    return []
+
+
+# Released by the workers once they have taken the locks
+locks_taken = multiprocessing.get_context('fork').Semaphore(0)
+
+
+def render_with_locks(sequence, ith):
+    """ Renders a sequence in a worker process, taking the locks shared with the threads of the main process """
+    logger.write_to_main(f"Rendering {sequence.hex_definition}", True)
+    dependencies.start_saving_local_dyn_objects()
+    dependencies.stop_saving_local_dyn_objects()
+    RetryStats.Instance().record('GET /item', 0)
+    locks_taken.release()
+    return [ith]
+
+
+class WorkerPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        RestlerSettings.TEST_DeleteInstance()
+        RestlerSettings({}, "")
+        with open(os.path.join(os.path.dirname(restler_settings.__file__), "log_settings.json")) as file_handler:
+            LogSetting().init_from_json(json.load(file_handler))
+        self.logs_dir = tempfile.TemporaryDirectory()
+        self.network_logs = logger.NETWORK_LOGS
+        logger.NETWORK_LOGS = os.path.join(self.logs_dir.name, 'network.txt')
+        self.coverage_dir = tempfile.TemporaryDirectory()
+        self.logs_dir_path = logger.LOGS_DIR
+        logger.LOGS_DIR = self.coverage_dir.name
+        FuzzingMonitor()
+        BugBuckets()
+        logger.SpecCoverageLog()
+
+    def tearDown(self):
+        logger.NETWORK_LOGS = self.network_logs
+        logger.LOGS_DIR = self.logs_dir_path
+        self.logs_dir.cleanup()
+        self.coverage_dir.cleanup()
+        logger.SpecCoverageLog._SpecCoverageLog__instance = None
+        dependencies.dyn_objects_cache.clear()
+        FuzzingMonitor._FuzzingMonitor__instance = None
+        BugBuckets._BugBuckets__instance = None
+        RestlerSettings.TEST_DeleteInstance()
+
+    def test_status_codes_updates(self):
+        """ Test that the updates since a checkpoint are merged into another monitor """
+        monitor = StatusCodesMonitor(0)
+        monitor.update(make_sequence('s1', 'r1'), [make_status('r1', '200')], None)
+        merged = StatusCodesMonitor(0)
+        merged.merge_updates(monitor.get_updates_since(merged.checkpoint()))
+
+        checkpoint = monitor.checkpoint()
+        monitor.update(make_sequence('s1', 'r1'), [make_status('r1', '404')], None)
+        monitor.update(make_sequence('s2', 'r2'), [make_status('r2', '200')], None)
+        monitor.increment_requests_count('gc')
+        merged.merge_updates(monitor.get_updates_since(checkpoint))
+
+        self.assertEqual(merged.num_requests_sent(), monitor.num_requests_sent())
+        for seq_hash, statuses in monitor.sequence_statuses.items():
+            self.assertEqual({code: [status.request_hex for status in request_statuses]
+                              for code, request_statuses in merged.sequence_statuses[seq_hash].request_statuses.items()},
+                             {code: [status.request_hex for status in request_statuses]
+                              for code, request_statuses in statuses.request_statuses.items()})
+        self.assertEqual(monitor.get_updates_since(monitor.checkpoint()), ({}, {}))
+
+    def test_renderings_updates(self):
+        """ Test that the renderings of the current generation are merged """
+        monitor = RenderingsMonitor()
+        monitor.update(SimpleNamespace(hex_definition='r1', _current_combination_id=1), True)
+        merged = RenderingsMonitor()
+        merged.update(SimpleNamespace(hex_definition='r1', _current_combination_id=2), False)
+        merged.merge_updates(monitor.get_updates())
+        self.assertEqual(merged.get_updates(), {'r1': {'valid': {0}, 'invalid': {1}}})
+
+    def test_deferred_bug_bucket_updates(self):
+        """ Test that bug bucket updates are recorded instead of applied """
+        BugBuckets.Instance().defer_updates()
+        sequence = make_sequence('s1', 'r1')
+        BugBuckets.Instance().update_bug_buckets(sequence, '500', origin='checker')
+        self.assertEqual(BugBuckets.Instance().num_bug_buckets(), {})
+        updates = BugBuckets.Instance().pop_deferred_updates()
+        self.assertEqual([(update['sequence'], update['bug_code'], update['origin']) for update in updates],
+                         [(sequence, '500', 'checker')])
+        self.assertEqual(BugBuckets.Instance().pop_deferred_updates(), [])
+
+    def test_stats_updates(self):
+        """ Test that the stats of a worker are reset when returned, and merged into the main process' stats """
+        worker_stats = AsyncPollingStats()
+        worker_stats.record('item', 'succeeded', 1.0, 2)
+        worker_stats.record('item', 'timed_out', 3.0, 4)
+        merged = AsyncPollingStats()
+        merged.record('item', 'succeeded', 2.0, 1)
+        merged.merge(worker_stats.pop_counts())
+        self.assertEqual(worker_stats.to_dict(), {})
+        self.assertEqual(dict(merged.to_dict()['item']),
+                         {'operations': 3, 'succeeded': 2, 'failed': 0, 'timed_out': 1, 'polls': 7,
+                          'avg_sec': 2.0, 'max_sec': 3.0})
+
+        pool_stats = PoolStats()
+        pool_stats.hits = 2
+        other_stats = PoolStats()
+        other_stats.hits = 1
+        other_stats.full_tls_handshakes = 3
+        pool_stats.merge(other_stats)
+        self.assertEqual((pool_stats.hits, pool_stats.misses, pool_stats.full_tls_handshakes), (3, 0, 3))
+
+    def test_render(self):
+        """ Test that the sequences are rendered in worker processes and their state is merged """
+        seq_collection = [make_sequence(f's{ith}', f'r{ith % 3}') for ith in range(7)]
+        object_creations = dependencies.object_creations
+        applied_updates = []
+        main_pid = os.getpid()
+        bug_buckets = BugBuckets.Instance()
+        update_bug_buckets = bug_buckets.update_bug_buckets
+
+        def apply_update(sequence, bug_code, **kwargs):
+            if os.getpid() != main_pid:
+                return update_bug_buckets(sequence, bug_code, **kwargs)
+            applied_updates.append(sequence.hex_definition)
+        bug_buckets.update_bug_buckets = apply_update
+
+        result = WorkerPool(3).render(render, seq_collection)
+
+        self.assertEqual([len(valid_renderings) for valid_renderings in result], [ith % 2 for ith in range(7)])
+        self.assertNotIn(os.getpid(), [pid for valid_renderings in result for pid in valid_renderings])
+        self.assertLessEqual(len({pid for valid_renderings in result for pid in valid_renderings}), 3)
+        self.assertEqual(Monitor().num_requests_sent()['main_driver'], 7)
+        self.assertEqual(sorted(Monitor().sequence_statuses), sorted(f's{ith}' for ith in range(7)))
+        self.assertEqual(Monitor().renderings_monitor.get_updates()['r1']['valid'], {1, 4})
+        self.assertEqual(sorted(dependencies.dyn_objects_cache['_item_id']), sorted(f'item{ith}' for ith in range(7)))
+        self.assertEqual(dependencies.object_creations - object_creations, 7)
+        self.assertEqual(applied_updates, [f's{ith}' for ith in range(7)])
+        self.assertEqual(len(os.listdir(self.logs_dir.name)), 3)
+
+    def test_checker_state(self):
+        """ Test that each request is checked once, on its first sequence, and the checker state is merged """
+        once_checker.checked_requests = {'r0'}
+        seq_collection = [make_sequence(f's{ith}', f'r{ith % 4}') for ith in range(10)]
+        result = WorkerPool(3).render(render_with_checker, seq_collection, checkers=[once_checker])
+        self.assertEqual([checked for checked_sequences in result for checked in checked_sequences], ['s1', 's2', 's3'])
+        self.assertEqual(once_checker.checked_requests, {'r0', 'r1', 'r2', 'r3'})
+
+        result = WorkerPool(3).render(render_with_checker, seq_collection, checkers=[once_checker])
+        self.assertEqual(result, [[]] * 10)
+
+    def test_spec_coverage(self):
+        """ Test that the spec coverage of the workers is written by the main process, in order """
+        seq_collection = [make_sequence(f's{ith}', f'r{ith % 3}') for ith in range(7)]
+        WorkerPool(3).render(render_with_coverage, seq_collection)
+        for file_name in ['speccov-all-combinations.json', 'speccov-min.json']:
+            with open(os.path.join(self.coverage_dir.name, file_name)) as file_handler:
+                coverage = json.load(file_handler)
+            self.assertEqual(list(coverage),
+                             [make_request(f's{ith}').method_endpoint_hex_definition for ith in range(7)])
+        self.assertEqual(len(logger.SpecCoverageLog.Instance()._renderings_logged), 7)
+
+    def test_render_with_held_locks(self):
+        """ Test that the workers do not wait for locks held by the main process when they were forked """
+        main_logs = logger.MAIN_LOGS
+        logger.MAIN_LOGS = os.path.join(self.logs_dir.name, 'main.txt')
+        retry_stats_lock = RetryStats.Instance()._lock
+        retries = RetryStats.Instance().to_dict().get('GET /item', {}).get('retries', 0)
+        held_locks = [logger.main_lock, dependencies.main_lock, retry_stats_lock]
+        result = []
+        for lock in held_locks:
+            lock.acquire()
+        try:
+            render_thread = threading.Thread(
+                target=lambda: result.extend(WorkerPool(2).render(render_with_locks, [make_sequence('s0', 'r0'),
+                                                                                      make_sequence('s1', 'r1')])),
+                daemon=True)
+            render_thread.start()
+            # The main process then waits for the retry stats lock to merge the stats of the workers
+            for _ in range(2):
+                self.assertTrue(locks_taken.acquire(timeout=60))
+        finally:
+            for lock in held_locks:
+                lock.release()
+            render_thread.join(60)
+            logger.MAIN_LOGS = main_logs
+        self.assertFalse(render_thread.is_alive())
+        self.assertEqual(result, [[0], [1]])
+        self.assertIs(RetryStats.Instance()._lock, retry_stats_lock)
+        self.assertEqual(RetryStats.Instance().to_dict()['GET /item']['retries'], retries + 2)
+
+    def test_worker_initialization_error(self):
+        """ Test that an error initializing a worker is raised in the main process """
+        create_worker_network_log = logger.create_worker_network_log
+
+        def raise_error(log_type):
+            raise OSError("Cannot create the network log")
+        logger.create_worker_network_log = raise_error
+        try:
+            with self.assertRaises(OSError):
+                WorkerPool(2).render(render, [make_sequence('s0', 'r0')])
+        finally:
+            logger.create_worker_network_log = create_worker_network_log
+
+
+if __name__ == '__main__':
+    unittest.main()